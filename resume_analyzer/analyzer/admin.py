@@ -1,3 +1,15 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Resume, StoredAnalysis
+
+
+@admin.register(StoredAnalysis)
+class StoredAnalysisAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'created_at', 'expires_at')
+    list_filter = ('kind',)
+
+
+@admin.register(Resume)
+class ResumeAdmin(admin.ModelAdmin):
+    list_display = ('file_name', 'name', 'email', 'ingested_at')
+    search_fields = ('file_name', 'name', 'email', 'content_hash')
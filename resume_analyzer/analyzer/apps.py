@@ -1,6 +1,26 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AnalyzerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analyzer'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from . import search_index, tfidf_index
+        from .models import Resume
+
+        # Keep the search and TF-IDF indexes in step with saves and deletes; bulk ingestion indexes its own batches
+        post_save.connect(search_index.on_resume_saved, sender=Resume, dispatch_uid='analyzer.search_index.save')
+        post_delete.connect(search_index.on_resume_deleted, sender=Resume,
+                            dispatch_uid='analyzer.search_index.delete')
+        post_save.connect(tfidf_index.on_resume_saved, sender=Resume, dispatch_uid='analyzer.tfidf_index.save')
+        post_delete.connect(tfidf_index.on_resume_deleted, sender=Resume,
+                            dispatch_uid='analyzer.tfidf_index.delete')
+
+        # Opt-in so management commands and tests don't pay for model loading
+        if getattr(settings, 'ANALYZER_WARMUP_ON_READY', False):
+            from . import model_registry
+            model_registry.warmup()
@@ -0,0 +1,208 @@
+"""
+Async variants of the analysis views for the ASGI entry point.
+
+LLM calls go through the pooled async HTTP client, extraction runs in the
+extraction sandbox and database work is offloaded with sync_to_async, so
+a single uvicorn worker can keep hundreds of analyses in flight.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.shortcuts import render
+
+from . import bot, execution, extraction_cache, llm, sandbox, scoring, views
+from .cache import analysis_cache, analysis_cache_key
+from .models import StoredAnalysis
+from .sandbox import ExtractionError
+from .storage import load_analysis
+from .views import (
+    StreamTimer, analysis_cache_version, cacheable, combine_resume_analyses,
+    comparison_form_error, extraction_error_response, failed_insights, insight_candidates,
+    insights_messages, parse_insights_response, prescreen, readable_extractions, shortlisted,
+    sse_event, sse_response, store_comparison, store_single_analysis,
+)
+
+
+async def analyze_resume_job_match_cached(resume_text, job_text):
+    """Async counterpart of views.analyze_resume_job_match_cached, sharing its cache"""
+    backend = scoring.get_backend()
+    key = analysis_cache_key(resume_text, job_text, analysis_cache_version(backend))
+    analysis = await analysis_cache.aget(key)
+    if analysis is None:
+        analysis = await scoring.aanalyze(resume_text, job_text, backend)
+        if cacheable(analysis):
+            await analysis_cache.aset(key, analysis)
+    return analysis
+
+
+async def generate_comparative_insights(resume_analyses, job_description):
+    """Generate comparative insights for multiple resumes without blocking the event loop"""
+    try:
+        result = await llm.achat_completion(insights_messages(resume_analyses, job_description), temperature=0.7)
+    except Exception as e:
+        return failed_insights(str(e))
+    return parse_insights_response(result)
+
+
+async def extract_uploads(resume_files):
+    """Extract every uploaded file straight from the upload bytes, parsing cache misses in the pool"""
+    read = sync_to_async(lambda resume_file: resume_file.read(), thread_sensitive=False)
+    contents = [await read(resume_file) for resume_file in resume_files]
+    return await extraction_cache.aextract_many(contents, execution.amap_extraction)
+
+
+async def upload_and_analyze(request):
+    """Async variant of views.upload_and_analyze"""
+    if request.method == 'POST':
+        resume_file = request.FILES.get('resume')
+        if not resume_file:
+            return JsonResponse({'error': 'No resume file provided'}, status=400)
+
+        job_description_text = request.POST.get('job_description', '')
+        if not job_description_text:
+            return JsonResponse({'error': 'No job description provided'}, status=400)
+
+        try:
+            sandbox.check_upload_size(resume_file.size)
+        except ExtractionError as e:
+            return extraction_error_response(e.code, e.message)
+        extraction, = await extract_uploads([resume_file])
+        if not extraction.ok:
+            return extraction_error_response(extraction.code, extraction.error)
+        if extraction.value is None:
+            return JsonResponse({'error': 'Unsupported file format. Please use PDF or DOCX'}, status=400)
+
+        analysis = await analyze_resume_job_match_cached(extraction.value, job_description_text)
+
+        context = await sync_to_async(store_single_analysis)(job_description_text, analysis)
+        return render(request, 'analyzer/results.html', context)
+
+    return render(request, 'analyzer/index.html')
+
+
+async def bot_question(request):
+    """Async variant of views.bot_question"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    analysis_id, question = data.get('analysis_id'), data.get('question')
+    stored_result = await sync_to_async(load_analysis)(analysis_id, kind=StoredAnalysis.KIND_SINGLE)
+    if stored_result is None:
+        return JsonResponse({'error': 'Analysis not found'}, status=404)
+
+    history = await sync_to_async(bot.get_history)(request.session, analysis_id)
+    bot_response = await sync_to_async(bot.lookup_answer, thread_sensitive=False)(analysis_id, question, history)
+    cached = bot_response is not None
+
+    if not cached:
+        context = await sync_to_async(bot.get_context, thread_sensitive=False)(analysis_id, stored_result)
+        try:
+            bot_response = await llm.achat_completion(
+                bot.bot_messages(context, history, question), max_tokens=300, temperature=0.7
+            )
+        except Exception as api_error:
+            return JsonResponse({
+                'error': f'OpenAI API error: {str(api_error)}',
+                'details': str(api_error)
+            }, status=500)
+        await sync_to_async(bot.remember_answer, thread_sensitive=False)(analysis_id, question, bot_response, history)
+
+    await sync_to_async(bot.record_turn)(request.session, analysis_id, question, bot_response)
+    return JsonResponse({'response': bot_response, 'cached': cached})
+
+
+async def stream_answer(pieces, on_complete=None):
+    """Async views.stream_answer; on_complete is a coroutine function"""
+    timer = StreamTimer()
+    answer = []
+    try:
+        async for piece in pieces:
+            timer.token()
+            answer.append(piece)
+            yield sse_event({'token': piece})
+    except Exception as api_error:
+        yield sse_event({'error': f'OpenAI API error: {str(api_error)}'}, event='error')
+        return
+    if on_complete:
+        await on_complete(''.join(answer))
+    yield timer.done_event()
+
+
+async def stream_cached_answer(answer):
+    for event in views.stream_cached_answer(answer):
+        yield event
+
+
+async def bot_question_stream(request):
+    """Async variant of views.bot_question_stream"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    analysis_id, question = data.get('analysis_id'), data.get('question')
+    stored_result = await sync_to_async(load_analysis)(analysis_id, kind=StoredAnalysis.KIND_SINGLE)
+    if stored_result is None:
+        return JsonResponse({'error': 'Analysis not found'}, status=404)
+
+    history = await sync_to_async(bot.get_history)(request.session, analysis_id)
+    request.session.modified = True  # See views.bot_question_stream
+
+    def record(answer, remember):
+        if remember:
+            bot.remember_answer(analysis_id, question, answer, history)
+        bot.record_turn(request.session, analysis_id, question, answer)
+        request.session.save()
+
+    async def finish(answer, remember=True):
+        await sync_to_async(record)(answer, remember)
+
+    cached_answer = await sync_to_async(bot.lookup_answer, thread_sensitive=False)(analysis_id, question, history)
+    if cached_answer is not None:
+        await finish(cached_answer, remember=False)
+        return sse_response(stream_cached_answer(cached_answer))
+
+    context = await sync_to_async(bot.get_context, thread_sensitive=False)(analysis_id, stored_result)
+    return sse_response(stream_answer(
+        llm.astream_chat_completion(bot.bot_messages(context, history, question), max_tokens=300, temperature=0.7),
+        on_complete=finish,
+    ))
+
+
+async def compare_resumes(request):
+    """Async variant of views.compare_resumes"""
+    if request.method == 'POST':
+        resume_files = request.FILES.getlist('resumes')
+        job_description_text = request.POST.get('job_description', '')
+
+        error = comparison_form_error(resume_files, job_description_text)
+        if error:
+            return render(request, 'analyzer/compare_form.html', {'error': error})
+
+        extracted = readable_extractions(await extract_uploads(resume_files))
+        screened_out = await asyncio.to_thread(prescreen, extracted, job_description_text)
+        llm_results = await execution.amap_llm(analyze_resume_job_match_cached, [
+            (extraction.value, job_description_text) for _idx, extraction in shortlisted(extracted, screened_out)
+        ])
+        resume_analyses = combine_resume_analyses(
+            [resume_file.name for resume_file in resume_files], extracted, llm_results, screened_out
+        )
+
+        comparative_insights = await generate_comparative_insights(
+            insight_candidates(resume_analyses), job_description_text
+        )
+
+        context = await sync_to_async(store_comparison)(job_description_text, resume_analyses, comparative_insights)
+        return render(request, 'analyzer/compare_results.html', context)
+
+    return render(request, 'analyzer/compare_form.html')
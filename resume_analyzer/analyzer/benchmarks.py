@@ -0,0 +1,688 @@
+"""
+Micro-benchmarks for the analysis pipeline, run with `manage.py benchmark`.
+
+Each stage returns a JSON-serializable dict so runs can be compared between
+commits.
+"""
+import os
+import random
+import re
+import time
+from io import BytesIO
+from tempfile import NamedTemporaryFile
+
+from . import model_registry
+from .skills import DEFAULT_TAXONOMY_PATH, SkillMatcher, load_taxonomy
+
+SAMPLE_RESUME = """Jane Doe
+jane.doe@example.com | +1 (555) 123-4567
+
+Summary
+Backend engineer with seven years of experience building data platforms in Python
+and Java. Comfortable across the stack with React and Node.js, and passionate about
+machine learning, data analysis and clear communication.
+
+Skills
+Python, Django, Flask, SQL, MongoDB, Docker, Kubernetes, Terraform, AWS, Git, Jenkins,
+Agile/Scrum, Jira, statistics, deep learning, problem solving, leadership
+
+Experience
+Senior Software Engineer, Acme Analytics (2019 - present)
+- Led a team of five building a streaming ingestion platform on AWS and Kubernetes.
+- Designed REST APIs in Django and Flask serving two million requests per day.
+- Introduced CI pipelines with Jenkins and Git-based release workflows.
+
+Software Engineer, Initech (2016 - 2019)
+- Built reporting dashboards in React backed by SQL and MongoDB.
+- Worked in an Agile team using Scrum and Kanban with Jira and Confluence.
+
+Education
+B.Sc. Computer Science, State University
+"""
+
+SAMPLE_JOB = """Senior Backend Engineer
+We are looking for an engineer with strong Python and SQL skills and hands-on
+experience with Django, Docker, Kubernetes and AWS. Knowledge of machine learning,
+Terraform and CI with Jenkins is a plus. You will work in an Agile team, mentor
+junior engineers and show leadership and communication skills.
+Education: a degree in computer science or equivalent experience. Certification in AWS preferred.
+"""
+
+_SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'ta', 'vo', 'zen', 'dex', 'fyr', 'qua', 'sol']
+
+
+def time_call(func, *args, repeat=5, number=20):
+    """Best-of-repeat wall time per call, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(*args)
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings)
+
+
+def synthetic_taxonomy(base, size, seed=0):
+    """Pad a taxonomy with made-up one to three word skills up to size entries"""
+    rng = random.Random(seed)
+    taxonomy = dict(base)
+    while len(taxonomy) < size:
+        words = [rng.choice(_SYLLABLES) + rng.choice(_SYLLABLES) + rng.choice(_SYLLABLES)
+                 for _ in range(rng.randint(1, 3))]
+        taxonomy.setdefault(' '.join(words), [])
+    return taxonomy
+
+
+def legacy_find_skills(skills_db, text):
+    """The original per-skill regex loop, kept as the reference implementation"""
+    text = text.lower()
+    return [skill for skill in skills_db if re.search(r'\b' + re.escape(skill) + r'\b', text)]
+
+
+def reference_find_skills(taxonomy, text):
+    """
+    The regex loop extended to aliases: one \\b...\\b pattern per term, where
+    single words do not match as the tail of a dotted name like node.js
+    """
+    text = text.lower()
+    found = []
+    for skill, aliases in taxonomy.items():
+        for term in [skill, *aliases]:
+            tail_guard = r'(?<!\w\.)' if re.fullmatch(r'\w+', term) else ''
+            if re.search(tail_guard + r'\b' + re.escape(term) + r'\b', text):
+                found.append(skill)
+                break
+    return found
+
+
+# Texts the matcher must agree with the reference on, aliases and dotted names included
+PARITY_TEXTS = [
+    SAMPLE_RESUME,
+    SAMPLE_JOB,
+    "Built services in node.js and react",
+    "Frontend work in Vue.js and React.js; backend in NodeJS, some JS and k8s on Google Cloud",
+    "ML and AI research. Shipped a js. widget and a mongo.db migration",
+]
+
+
+def bench_skills(sizes=(45, 1000, 10000, 50000)):
+    """Per-document matching cost as the taxonomy grows, against the regex loop"""
+    base = load_taxonomy(DEFAULT_TAXONOMY_PATH)
+    matcher = SkillMatcher(base)
+    mismatches = [
+        {'text': text[:60], 'matcher': matcher.find(text), 'reference': reference_find_skills(base, text)}
+        for text in PARITY_TEXTS
+        if matcher.find(text) != reference_find_skills(base, text)
+    ]
+    results = {
+        'matches_reference': not mismatches,
+        'mismatches': mismatches,
+        'sizes': [],
+    }
+    for size in sizes:
+        taxonomy = synthetic_taxonomy(base, size)
+        start = time.perf_counter()
+        matcher = SkillMatcher(taxonomy)
+        compile_seconds = time.perf_counter() - start
+        row = {
+            'taxonomy_size': len(taxonomy),
+            'compile_seconds': round(compile_seconds, 4),
+            'matcher_ms_per_doc': round(time_call(matcher.find, SAMPLE_RESUME) * 1000, 4),
+        }
+        # The regex loop gets slow quickly; only time it where it finishes in reasonable time
+        if size <= 10000:
+            row['legacy_ms_per_doc'] = round(
+                time_call(legacy_find_skills, list(taxonomy), SAMPLE_RESUME, repeat=3, number=3) * 1000, 4
+            )
+        results['sizes'].append(row)
+    return results
+
+
+def legacy_preprocess_text(text):
+    """The original NLTK word_tokenize + uncached WordNet preprocessing"""
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    from nltk.tokenize import word_tokenize
+
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\d+', ' ', text)
+    tokens = word_tokenize(text)
+    stop_words = set(stopwords.words('english'))
+    tokens = [token for token in tokens if token not in stop_words]
+    lemmatizer = WordNetLemmatizer()
+    return ' '.join(lemmatizer.lemmatize(token) for token in tokens)
+
+
+def bench_preprocess():
+    """TextNormalizer against the original preprocessing, single and batched"""
+    from .nlp_processor import TextNormalizer
+
+    model_registry.warmup(['stopwords', 'lemmatizer', 'punkt'])
+    texts = [SAMPLE_RESUME, SAMPLE_RESUME.upper(), "I cannot wait, gonna ship it! 42 times.", ""]
+    normalizer = TextNormalizer()
+    batch = [SAMPLE_RESUME] * 50
+    return {
+        'identical_output': all(normalizer.normalize(text) == legacy_preprocess_text(text) for text in texts),
+        'legacy_ms_per_doc': round(time_call(legacy_preprocess_text, SAMPLE_RESUME) * 1000, 4),
+        'normalizer_ms_per_doc': round(time_call(normalizer.normalize, SAMPLE_RESUME) * 1000, 4),
+        'normalize_many_ms_per_doc': round(
+            time_call(normalizer.normalize_many, batch, number=2) * 1000 / len(batch), 4
+        ),
+        'lemma_cache': normalizer.cache_info()._asdict(),
+    }
+
+
+def synthetic_resumes(count, seed=0):
+    """Variations of the sample resume with a random subset of its lines"""
+    rng = random.Random(seed)
+    lines = SAMPLE_RESUME.splitlines()
+    return ['\n'.join(line for line in lines if rng.random() < 0.7) for _ in range(count)]
+
+
+def bench_ranking(count=1000, top_k=10):
+    """Batch ranking of already-extracted resumes against one job description"""
+    from .nlp_processor import DocumentAnalysis, rank_resumes
+
+    resumes = [DocumentAnalysis(text) for text in synthetic_resumes(count)]
+    job = DocumentAnalysis(SAMPLE_JOB)
+    start = time.perf_counter()
+    for document in resumes + [job]:
+        document.skills, document.normalized_text, document.vector_doc
+    extraction_seconds = time.perf_counter() - start
+
+    return {
+        'resumes': count,
+        'extraction_seconds': round(extraction_seconds, 3),
+        'rank_seconds': round(time_call(rank_resumes, job, resumes, top_k, repeat=3, number=1), 4),
+    }
+
+
+def _temp_file_extract(data):
+    """The old upload path: copy to a NamedTemporaryFile, extract from its path, delete it"""
+    from .nlp_processor import extract_text_from_pdf
+
+    with NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
+        temp_file.write(data)
+        temp_path = temp_file.name
+    try:
+        return extract_text_from_pdf(temp_path)
+    finally:
+        os.remove(temp_path)
+
+
+def _in_memory_extract(data):
+    """The current upload path: extract straight from the upload bytes"""
+    from .nlp_processor import extract_text_from_pdf
+
+    return extract_text_from_pdf(BytesIO(data))
+
+
+def process_io():
+    """This process's I/O counters from /proc/self/io, or None where it does not exist"""
+    try:
+        with open('/proc/self/io') as io_file:
+            return {name: int(value) for name, value in (line.split(':') for line in io_file)}
+    except OSError:
+        return None
+
+
+def _io_per_call(func, data, calls=5):
+    """Bytes passed to write() and bytes sent to storage per call of func, or None without /proc"""
+    before = process_io()
+    for _ in range(calls):
+        func(data)
+    after = process_io()
+    if before is None or after is None:
+        return None
+    return {name: (after[name] - before[name]) // calls for name in ('wchar', 'write_bytes')}
+
+
+def bench_upload_io(page_counts=(1, 20, 100)):
+    """Extracting uploaded PDFs through a temp file against extracting them from memory"""
+    rows = []
+    for pages in page_counts:
+        data = synthetic_pdf(SAMPLE_RESUME, pages)
+        rows.append({
+            'pages': pages,
+            'upload_kb': round(len(data) / 1024, 1),
+            'temp_file_ms': round(time_call(_temp_file_extract, data, repeat=3, number=3) * 1000, 3),
+            'in_memory_ms': round(time_call(_in_memory_extract, data, repeat=3, number=3) * 1000, 3),
+            # wchar counts write() calls, write_bytes what reached the block layer
+            'temp_file_io': _io_per_call(_temp_file_extract, data),
+            'in_memory_io': _io_per_call(_in_memory_extract, data),
+        })
+    return {'sizes': rows}
+
+
+def synthetic_pdf(text, pages):
+    """A text-layer PDF repeating the given text on every page"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    for _page in range(pages):
+        y = 750
+        for line in text.splitlines():
+            pdf.drawString(50, y, line)
+            y -= 14
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def text_fidelity(source, extracted):
+    """Share of the source words that survive extraction"""
+    words = set(re.findall(r'\w+', source.lower()))
+    found = set(re.findall(r'\w+', extracted.lower()))
+    return len(words & found) / len(words) if words else 1.0
+
+
+def bench_pdf_backends(page_counts=(1, 5, 20), documents=5):
+    """Throughput and text fidelity of each PDF backend over a synthetic corpus"""
+    from .pdf_backends import BACKENDS, extract_pdf_text
+
+    rows = []
+    for pages in page_counts:
+        sources = synthetic_resumes(documents, seed=pages)
+        corpus = [synthetic_pdf(source, pages) for source in sources]
+        extractors = {name: lambda data, backend=backend: backend.read(data)[0] for name, backend in BACKENDS.items()}
+        extractors['auto'] = extract_pdf_text
+        for name, extract in extractors.items():
+            start = time.perf_counter()
+            texts = [extract(data) for data in corpus]
+            seconds = time.perf_counter() - start
+            rows.append({
+                'backend': name,
+                'pages': pages,
+                'pages_per_second': round(pages * documents / seconds, 1),
+                'fidelity': round(sum(map(text_fidelity, sources, texts)) / documents, 4),
+            })
+    return {'documents': documents, 'results': rows}
+
+
+def noisy_extraction(text, pages=3, seed=0):
+    """text as a multi-page PDF extraction: running headers, page numbers, whitespace runs, repeats"""
+    rng = random.Random(seed)
+    lines = text.splitlines()
+    per_page = -(-len(lines) // pages)
+    noisy = []
+    for page in range(pages):
+        noisy.append('Jane Doe - Curriculum Vitae')
+        for line in lines[page * per_page:(page + 1) * per_page]:
+            line = re.sub(' ', lambda _match: ' ' * rng.randint(1, 4), line)
+            noisy.extend([line, line] if rng.random() < 0.2 else [line])
+        noisy.extend([f'Page {page + 1} of {pages}', '', ''])
+    return '\n'.join(noisy)
+
+
+def prompt_fixtures(count=20, seed=0):
+    """Fixed noisy resume/job pairs, half of them padded past the default token budget"""
+    rng = random.Random(seed)
+    fixtures = []
+    for index, resume in enumerate(synthetic_resumes(count, seed=seed)):
+        filler = ' '.join(''.join(rng.choice(_SYLLABLES) for _ in range(3)) for _ in range(12))
+        padding = '\nPublications\n' + '\n'.join(f'{filler} ({year})' for year in range(index * 20))
+        fixtures.append((noisy_extraction(resume + padding, seed=index), noisy_extraction(SAMPLE_JOB, 1, index)))
+    return fixtures
+
+
+def bench_prompts(count=20):
+    """Token savings of prompt compaction, and local scores on raw vs compacted text as a quality check"""
+    from .nlp_processor import analyze_resume_job_match
+    from .prompts import compact_pair, estimate_tokens
+
+    tokens_before = tokens_after = 0
+    score_drift, skill_recall = [], []
+    start = time.perf_counter()
+    for resume, job in prompt_fixtures(count):
+        compact_resume, compact_job = compact_pair(resume, job)
+        tokens_before += estimate_tokens(resume) + estimate_tokens(job)
+        tokens_after += estimate_tokens(compact_resume) + estimate_tokens(compact_job)
+
+        raw = analyze_resume_job_match(resume, job)
+        compacted = analyze_resume_job_match(compact_resume, compact_job)
+        score_drift.append(abs(raw['match_percentage'] - compacted['match_percentage']))
+        raw_skills = set(raw['matched_skills'])
+        skill_recall.append(len(raw_skills & set(compacted['matched_skills'])) / len(raw_skills) if raw_skills else 1.0)
+
+    return {
+        'fixtures': count,
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_after,
+        'token_reduction': round(1 - tokens_after / tokens_before, 4),
+        'mean_score_drift': round(sum(score_drift) / count, 2),
+        'max_score_drift': round(max(score_drift), 2),
+        'matched_skill_recall': round(sum(skill_recall) / count, 4),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def bench_scoring(count=10, latency=0.05):
+    """Latency of each scoring backend and its conformance to the common result schema"""
+    from django.test.utils import override_settings
+
+    from .llm_stub import StubLLMServer
+    from .scoring import BACKENDS, analyze, contract_errors
+
+    resumes = synthetic_resumes(count)
+    rows = []
+    with StubLLMServer(latency=latency) as server, \
+            override_settings(ANALYZER_LLM_BASE_URL=server.base_url, OPENAI_API_KEY='stub'):
+        for backend in BACKENDS:
+            start = time.perf_counter()
+            results = [analyze(resume, SAMPLE_JOB, backend) for resume in resumes]
+            seconds = time.perf_counter() - start
+            rows.append({
+                'backend': backend,
+                'ms_per_pair': round(seconds / count * 1000, 2),
+                'contract_errors': sorted({error for result in results for error in contract_errors(result)}),
+                'failed_calls': sum('error' in result or 'llm_error' in result for result in results),
+            })
+    return {'pairs': count, 'stub_latency': latency, 'backends': rows}
+
+
+def bench_bot_stream(runs=5, latency=0.3, chunk_delay=0.02):
+    """Time to first token of a streamed bot answer against waiting for the whole reply, on the stub"""
+    from django.test.utils import override_settings
+
+    from . import llm
+    from .llm_stub import StubLLMServer
+
+    messages = [{'role': 'user', 'content': 'Is the candidate a good fit for this role?'}]
+    first_token, streamed, blocking = [], [], []
+    with StubLLMServer(latency=latency, chunk_delay=chunk_delay) as server, \
+            override_settings(ANALYZER_LLM_BASE_URL=server.base_url, OPENAI_API_KEY='stub'):
+        for _run in range(runs):
+            start = time.perf_counter()
+            for index, _piece in enumerate(llm.stream_chat_completion(messages, max_tokens=300)):
+                if index == 0:
+                    first_token.append(time.perf_counter() - start)
+            streamed.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            llm.chat_completion(messages, max_tokens=300)
+            blocking.append(time.perf_counter() - start)
+
+    return {
+        'runs': runs,
+        'stream_first_token_ms': round(min(first_token) * 1000, 1),
+        'stream_total_ms': round(min(streamed) * 1000, 1),
+        'blocking_ms': round(min(blocking) * 1000, 1),
+    }
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def bench_extraction(page_counts=(1, 4, 16), documents=4):
+    """extract_text_from_pdf and extract_text_from_docx on synthetic resumes of growing length"""
+    from .corpus import generate_corpus
+    from .nlp_processor import extract_text_from_docx, extract_text_from_pdf
+
+    rows = []
+    for file_format, extract in (('pdf', extract_text_from_pdf), ('docx', extract_text_from_docx)):
+        for pages in page_counts:
+            corpus = generate_corpus(documents, pages=(pages,), formats=(file_format,), seed=pages)
+            start = time.perf_counter()
+            texts = [extract(BytesIO(resume['data'])) for resume in corpus['resumes']]
+            seconds = time.perf_counter() - start
+            rows.append({
+                'format': file_format,
+                'pages': pages,
+                'kb_per_doc': round(sum(len(resume['data']) for resume in corpus['resumes']) / documents / 1024, 1),
+                'ms_per_doc': round(seconds / documents * 1000, 2),
+                'fidelity': round(
+                    sum(text_fidelity(resume['text'], text) for resume, text in zip(corpus['resumes'], texts))
+                    / documents, 4
+                ),
+            })
+    return {'documents': documents, 'results': rows}
+
+
+def bench_nlp_stages(count=12, overlaps=(0.25, 0.5, 0.75)):
+    """
+    Per-document cost of each NLP step on extracted text, and whether the
+    results track the corpus: planted contact details and shared skills are
+    found, and match scores rise with skill overlap.
+    """
+    from .corpus import generate_corpus
+    from .nlp_processor import analyze_resume_job_match, extract_contact_info, extract_skills, preprocess_text
+
+    model_registry.warmup()
+    corpora = [generate_corpus(count, overlap=overlap, seed=index, render=False)
+               for index, overlap in enumerate(overlaps)]
+    texts = [resume['text'] for corpus in corpora for resume in corpus['resumes']]
+
+    stages = {}
+    for name, step in (('preprocess_text', preprocess_text), ('extract_skills', extract_skills),
+                       ('extract_contact_info', extract_contact_info)):
+        start = time.perf_counter()
+        for text in texts:
+            step(text)
+        stages[name] = round((time.perf_counter() - start) / len(texts) * 1000, 3)
+
+    rows, emails_found, match_seconds = [], 0, 0.0
+    for overlap, corpus in zip(overlaps, corpora):
+        scores, recall = [], []
+        for resume in corpus['resumes']:
+            start = time.perf_counter()
+            analysis = analyze_resume_job_match(resume['text'], corpus['job'])
+            match_seconds += time.perf_counter() - start
+            scores.append(analysis['match_percentage'])
+            found = set(analysis['matched_skills'])
+            recall.append(sum(skill in found for skill in resume['shared_skills']) / len(resume['shared_skills'])
+                          if resume['shared_skills'] else 1.0)
+            emails_found += extract_contact_info(resume['text'])['email'] == resume['contact']['email']
+        rows.append({
+            'overlap': overlap,
+            'mean_match_percentage': round(sum(scores) / count, 2),
+            'shared_skill_recall': round(sum(recall) / count, 4),
+        })
+    stages['analyze_resume_job_match'] = round(match_seconds / len(texts) * 1000, 3)
+
+    return {
+        'documents': len(texts),
+        'ms_per_doc': stages,
+        'email_accuracy': round(emails_found / len(texts), 4),
+        'by_overlap': rows,
+    }
+
+
+def _post_timings(client, path, payloads):
+    """(seconds, status code) of each POST; payload factories build fresh upload objects"""
+    timings = []
+    for make_payload in payloads:
+        start = time.perf_counter()
+        response = client.post(path, make_payload())
+        timings.append((time.perf_counter() - start, response.status_code))
+    return timings
+
+
+def _throughput(timings, resumes_per_request=1):
+    seconds = [elapsed for elapsed, _status in timings]
+    return {
+        'requests': len(timings),
+        'ok': sum(status == 200 for _elapsed, status in timings),
+        'resumes_per_second': round(len(timings) * resumes_per_request / sum(seconds), 2),
+        'p50_ms': round(percentile(seconds, 0.5) * 1000, 1),
+        'p95_ms': round(percentile(seconds, 0.95) * 1000, 1),
+    }
+
+
+def bench_end_to_end(single=6, comparisons=3, resumes_per_comparison=5, latency=0.05):
+    """
+    Throughput of the analyze/ and compare/ views through the Django test
+    client, against a throwaway test database, private caches and the stub
+    LLM. The cold pass sees every file for the first time; the warm pass
+    repeats it and is served from the extraction and analysis caches.
+    """
+    import tempfile
+    from unittest import mock
+
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+    from django.urls import reverse
+
+    from . import extraction_cache, scoring
+    from .corpus import generate_corpus
+    from .llm_stub import StubLLMServer
+
+    def upload(resume):
+        return SimpleUploadedFile(resume['file_name'], resume['data'])
+
+    single_corpus = generate_corpus(single, seed=101)
+    analyze_payloads = [
+        lambda resume=resume: {'resume': upload(resume), 'job_description': single_corpus['job']}
+        for resume in single_corpus['resumes']
+    ]
+    compare_payloads = []
+    for index in range(comparisons):
+        corpus = generate_corpus(resumes_per_comparison, seed=201 + index)
+        compare_payloads.append(lambda corpus=corpus: {
+            'resumes': [upload(resume) for resume in corpus['resumes']],
+            'job_description': corpus['job'],
+        })
+
+    private_caches = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-default'},
+        'analysis': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-analysis'},
+    }
+    setup_test_environment()
+    old_database = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir, StubLLMServer(latency=latency) as server, \
+                override_settings(ANALYZER_LLM_BASE_URL=server.base_url, OPENAI_API_KEY='stub', CACHES=private_caches,
+                                  ANALYZER_BACKGROUND_JOBS=False, ANALYZER_PRERENDER_REPORTS=False), \
+                mock.patch.object(extraction_cache, '_cache', extraction_cache.ExtractionCache(cache_dir, 256 * 2**20)):
+            model_registry.warmup()
+            client = Client()
+            results = {'stub_latency': latency, 'scoring_backend': scoring.get_backend()}
+            for name, path, payloads, per_request in (
+                    ('analyze', reverse('analyze'), analyze_payloads, 1),
+                    ('compare', reverse('compare_resumes'), compare_payloads, resumes_per_comparison)):
+                results[name] = {
+                    'cold': _throughput(_post_timings(client, path, payloads), per_request),
+                    'warm': _throughput(_post_timings(client, path, payloads), per_request),
+                }
+            return results
+    finally:
+        connection.creation.destroy_test_db(old_database, verbosity=0)
+        teardown_test_environment()
+
+
+def bench_search(documents=100000, distinct=500, queries=50, top_k=10):
+    """
+    BM25 search over an index of `documents` resumes in a temporary
+    directory: build time, size on disk, query latency with and without
+    required skills, and the cost of incremental adds and deletes. The
+    documents reuse `distinct` preprocessed corpus texts, each with its own
+    random skills.
+    """
+    import shutil
+    import tempfile
+
+    from .corpus import generate_corpus, skill_names, synthetic_job
+    from .nlp_processor import preprocess_text
+    from .search_index import SearchIndex, query_terms
+
+    model_registry.warmup()
+    rng = random.Random(0)
+    skills = skill_names()
+    texts = [preprocess_text(resume['text']) for resume in generate_corpus(distinct, render=False)['resumes']]
+
+    def batch(first, count):
+        return [(pk, texts[pk % distinct], rng.sample(skills, 8)) for pk in range(first, first + count)]
+
+    jobs = [synthetic_job(rng, skills) for _ in range(queries)]
+    job_terms = [query_terms(text) for text, _skills in jobs]
+
+    directory = tempfile.mkdtemp(prefix='search-bench-')
+    try:
+        index = SearchIndex(directory)
+        start = time.perf_counter()
+        index.rebuild(batch(first, 10000) for first in range(0, documents, 10000))
+        build_seconds = time.perf_counter() - start
+        index_bytes = sum(entry.stat().st_size for entry in os.scandir(directory))
+
+        latencies = {}
+        for name, required in (('any', lambda job_skills: ()), ('required_2', lambda job_skills: job_skills[:2])):
+            timings = []
+            for terms, (_text, job_skills) in zip(job_terms, jobs):
+                start = time.perf_counter()
+                index.search(terms, required(job_skills), top_k)
+                timings.append((time.perf_counter() - start) * 1000)
+            latencies[name] = {'p50_ms': round(percentile(timings, 0.5), 2),
+                               'p95_ms': round(percentile(timings, 0.95), 2)}
+
+        start = time.perf_counter()
+        index.add(batch(documents, 100))
+        add_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        index.delete(range(0, 100))
+        delete_ms = (time.perf_counter() - start) * 1000
+        # A fresh reader sees the added and deleted resumes
+        consistent = len(SearchIndex(directory)) == documents
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        'documents': documents,
+        'build_seconds': round(build_seconds, 2),
+        'index_mb': round(index_bytes / 2**20, 1),
+        'query': latencies,
+        'add_100_ms': round(add_ms, 1),
+        'delete_100_ms': round(delete_ms, 1),
+        'consistent': consistent,
+    }
+
+
+def numeric_leaves(results, prefix=''):
+    """{'stage.key.0.key': number} for every number in nested results"""
+    if isinstance(results, bool):
+        return {}
+    if isinstance(results, (int, float)):
+        return {prefix: results}
+    if isinstance(results, dict):
+        items = results.items()
+    elif isinstance(results, list):
+        items = enumerate(results)
+    else:
+        return {}
+    leaves = {}
+    for key, value in items:
+        leaves.update(numeric_leaves(value, f'{prefix}.{key}' if prefix else str(key)))
+    return leaves
+
+
+def compare_results(baseline, current):
+    """Relative change of every metric present in both runs, largest first"""
+    before, after = numeric_leaves(baseline), numeric_leaves(current)
+    changes = [
+        {'metric': metric, 'baseline': before[metric], 'current': after[metric],
+         'change': round(after[metric] / before[metric] - 1, 4)}
+        for metric in sorted(before.keys() & after.keys()) if before[metric]
+    ]
+    return sorted(changes, key=lambda change: -abs(change['change']))
+
+
+STAGES = {
+    'skills': bench_skills,
+    'preprocess': bench_preprocess,
+    'ranking': bench_ranking,
+    'upload_io': bench_upload_io,
+    'pdf_backends': bench_pdf_backends,
+    'prompts': bench_prompts,
+    'scoring': bench_scoring,
+    'bot_stream': bench_bot_stream,
+    'extraction': bench_extraction,
+    'nlp_stages': bench_nlp_stages,
+    'end_to_end': bench_end_to_end,
+    'search': bench_search,
+}
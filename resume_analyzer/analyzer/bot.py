@@ -0,0 +1,168 @@
+"""
+Context, history and answer caching for the HR assistant bot.
+
+The job description and analysis are compacted into a context block once per
+analysis and reused by every question about it. Each browser session keeps
+the last ANALYZER_BOT_HISTORY_TURNS exchanges so follow-up questions make
+sense. Answers to standalone questions are memoized per analysis and
+normalized question, and a standalone question whose spaCy vector is at least
+ANALYZER_BOT_SIMILARITY_THRESHOLD similar to one already answered, and which
+shares at least ANALYZER_BOT_MIN_WORD_OVERLAP of its content words, gets the
+same answer. Cache hits make no API call. Follow-ups are never looked up or
+memoized: "why?" only means something in its conversation.
+"""
+import re
+
+import numpy as np
+from django.conf import settings
+
+from . import model_registry, prompts
+from .cache import CountingCache, content_key
+
+# Bump whenever the bot prompt changes so cached contexts and answers are not reused
+BOT_PROMPT_VERSION = 'bot-v1'
+
+SYSTEM_PROMPT = "You are an AI HR assistant providing expert insights on candidate evaluation."
+
+# Near-duplicate matching compares against at most this many answered questions per analysis
+MAX_REMEMBERED_QUESTIONS = 50
+
+context_cache = CountingCache('analysis', 'bot-context')
+answer_cache = CountingCache('analysis', 'bot-answer')
+question_index = CountingCache('analysis', 'bot-questions')
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+
+def normalize_question(question):
+    """Lowercase the question and drop punctuation and extra whitespace"""
+    return ' '.join(_PUNCTUATION_RE.sub(' ', (question or '').lower()).split())
+
+
+def build_context(job_description, analysis):
+    """The compact description of the job and the analysis every question is answered from"""
+    job_description = prompts.compact_text(job_description, getattr(settings, 'ANALYZER_BOT_CONTEXT_TOKENS', 800))
+    return f"""Context:
+- Job Description: {job_description}
+- Resume Analysis:
+  * Overall Match: {analysis.get('match_percentage', 0)}%
+  * Skills Match: {analysis.get('skill_match_percentage', 0)}%
+  * Semantic Match: {analysis.get('semantic_match_percentage', 0)}%
+  * Matched Skills: {', '.join(analysis.get('matched_skills', []))}
+  * Missing Skills: {', '.join(analysis.get('missing_skills', []))}
+  * Summary: {analysis.get('summary', '')}"""
+
+
+def get_context(analysis_id, stored_result):
+    key = content_key(BOT_PROMPT_VERSION, str(analysis_id))
+    context = context_cache.get(key)
+    if context is None:
+        context = build_context(stored_result['job_description'], stored_result['analysis'])
+        context_cache.set(key, context)
+    return context
+
+
+def bot_messages(context, history, question):
+    """Chat messages for an HR question: the shared context, earlier turns, then the question"""
+    messages = [{"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{context}"}]
+    for previous_question, previous_answer in history:
+        messages.append({"role": "user", "content": previous_question})
+        messages.append({"role": "assistant", "content": previous_answer})
+    messages.append({"role": "user", "content": (
+        f"Candidate Question: {question}\n\n"
+        "Provide a short and concise, professional, and insightful response that helps an HR "
+        "professional understand the candidate's fit."
+    )})
+    return messages
+
+
+def _history_key(analysis_id):
+    return f'bot-history:{analysis_id}'
+
+
+def get_history(session, analysis_id):
+    """(question, answer) pairs this session already asked about the analysis"""
+    return [tuple(turn) for turn in session.get(_history_key(analysis_id), [])]
+
+
+def record_turn(session, analysis_id, question, answer):
+    turns = session.get(_history_key(analysis_id), []) + [[question, answer]]
+    session[_history_key(analysis_id)] = turns[-getattr(settings, 'ANALYZER_BOT_HISTORY_TURNS', 4):]
+
+
+def _answer_key(analysis_id, normalized):
+    return content_key(BOT_PROMPT_VERSION, str(analysis_id), normalized)
+
+
+def _similarity_threshold():
+    return getattr(settings, 'ANALYZER_BOT_SIMILARITY_THRESHOLD', 0.95)
+
+
+def _min_word_overlap():
+    return getattr(settings, 'ANALYZER_BOT_MIN_WORD_OVERLAP', 0.8)
+
+
+def question_vector(normalized):
+    # Static word vectors straight from the tokenizer, as in DocumentAnalysis.vector_doc
+    return model_registry.get_nlp().make_doc(normalized).vector
+
+
+def content_words(normalized):
+    return {token.text for token in model_registry.get_nlp().make_doc(normalized) if not token.is_stop}
+
+
+def word_overlap(normalized_a, normalized_b):
+    """
+    Jaccard overlap of the content words of two questions. Mean word vectors
+    barely move when one word changes, so "senior enough" and "junior enough"
+    look alike to them; their content words do not.
+    """
+    words_a, words_b = content_words(normalized_a), content_words(normalized_b)
+    if not words_a and not words_b:
+        return 1.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def lookup_answer(analysis_id, question, history=()):
+    """A cached answer to this standalone question or a near-duplicate of it, or None"""
+    if history:
+        return None
+    normalized = normalize_question(question)
+    answer = answer_cache.get(_answer_key(analysis_id, normalized))
+    if answer is not None or not _similarity_threshold():
+        return answer
+
+    asked = question_index.get(str(analysis_id))
+    if not asked:
+        return None
+    vector = question_vector(normalized)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return None
+    matrix = np.array([asked_vector for _question, asked_vector in asked], dtype=np.float32)
+    similarities = matrix @ vector / (np.linalg.norm(matrix, axis=1) * norm + 1e-9)
+    best = int(np.argmax(similarities))
+    if similarities[best] < _similarity_threshold():
+        return None
+    if word_overlap(normalized, asked[best][0]) < _min_word_overlap():
+        return None
+    return answer_cache.get(_answer_key(analysis_id, asked[best][0]))
+
+
+def remember_answer(analysis_id, question, answer, history=()):
+    """
+    Memoize an answer. Follow-ups asked with history may only make sense in
+    their conversation, so only standalone questions are remembered.
+    """
+    if history or not answer:
+        return
+    normalized = normalize_question(question)
+    answer_cache.set(_answer_key(analysis_id, normalized), answer)
+
+    if _similarity_threshold():
+        vector = question_vector(normalized)
+        if np.linalg.norm(vector) == 0:
+            return
+        asked = [entry for entry in question_index.get(str(analysis_id)) or [] if entry[0] != normalized]
+        asked.append((normalized, vector.astype(np.float32).tolist()))
+        question_index.set(str(analysis_id), asked[-MAX_REMEMBERED_QUESTIONS:])
@@ -0,0 +1,154 @@
+"""
+Content-addressed caches shared between worker processes.
+
+Entries live in a Django cache backend (DiskLRUCacheBackend by default, see
+CACHES in settings), so they survive restarts and are visible to every
+gunicorn worker. Values are pickled on write and unpickled on every read,
+which makes each hit a private copy the caller is free to mutate.
+"""
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .disk_cache import DiskLRUCache
+
+
+def normalize_for_key(text):
+    """Collapse whitespace so cosmetic differences don't defeat the cache"""
+    return ' '.join((text or '').split())
+
+
+def content_key(*parts):
+    """SHA-256 over the given parts, unambiguous regardless of their content"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class DiskLRUCacheBackend(BaseCache):
+    """
+    Django cache backend over a DiskLRUCache. Entries expire after their
+    timeout, and once LOCATION grows past OPTIONS['MAX_BYTES'] the least
+    recently used ones are deleted, whatever their count.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+        self.store = DiskLRUCache(location, params.get('OPTIONS', {}).get('MAX_BYTES', 256 * 2**20))
+
+    def _entry_key(self, key, version):
+        # Hex digests make safe file names whatever the cache key contains
+        return content_key(self.make_and_validate_key(key, version=version))
+
+    def _read(self, entry_key):
+        """The unexpired (expiry, value) of an entry, or None"""
+        data = self.store.read(entry_key)
+        if data is None:
+            return None
+        expires_at, value = pickle.loads(data)
+        if expires_at is not None and expires_at <= time.time():
+            self.store.delete(entry_key)
+            return None
+        return expires_at, value
+
+    def _write(self, entry_key, value, expires_at):
+        self.store.write(entry_key, pickle.dumps((expires_at, value), pickle.HIGHEST_PROTOCOL))
+
+    def get(self, key, default=None, version=None):
+        entry = self._read(self._entry_key(key, version))
+        return default if entry is None else entry[1]
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        entry_key = self._entry_key(key, version)
+        expires_at = self.get_backend_timeout(timeout)
+        if expires_at is not None and expires_at <= time.time():
+            self.store.delete(entry_key)
+            return
+        self._write(entry_key, value, expires_at)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self._read(self._entry_key(key, version)) is not None:
+            return False
+        self.set(key, value, timeout, version)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        entry_key = self._entry_key(key, version)
+        entry = self._read(entry_key)
+        if entry is None:
+            return False
+        self._write(entry_key, entry[1], self.get_backend_timeout(timeout))
+        return True
+
+    def delete(self, key, version=None):
+        entry_key = self._entry_key(key, version)
+        existed = os.path.exists(self.store.path(entry_key))
+        self.store.delete(entry_key)
+        return existed
+
+    def clear(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+
+
+class CountingCache:
+    """A named Django cache that keeps hit/miss counters for this process"""
+
+    def __init__(self, alias, prefix):
+        self.alias = alias
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        value = self.backend.get(f'{self.prefix}:{key}')
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.backend.set(f'{self.prefix}:{key}', value, timeout)
+
+    async def aget(self, key):
+        return await sync_to_async(self.get, thread_sensitive=False)(key)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT):
+        await sync_to_async(self.set, thread_sensitive=False)(key, value, timeout)
+
+    def delete(self, key):
+        self.backend.delete(f'{self.prefix}:{key}')
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+analysis_cache = CountingCache('analysis', 'analysis')
+
+
+def analysis_cache_key(resume_text, job_text, version):
+    """Key for an analysis of this resume/job pair under a given model and prompt version"""
+    return content_key(version, normalize_for_key(resume_text), normalize_for_key(job_text))
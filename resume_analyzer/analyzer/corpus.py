@@ -0,0 +1,161 @@
+"""
+Deterministic synthetic resumes and job descriptions for benchmarks.
+
+Every document is generated from a seed, so two runs on different commits
+see the same documents. Resumes come as PDF or DOCX at a chosen length in
+pages, and each job description shares a controlled fraction of its required
+skills with every resume, so match scores and skill recall can be checked as
+well as timed. `manage.py make_corpus` writes a corpus to disk.
+"""
+import os
+import random
+from io import BytesIO
+
+from .skills import DEFAULT_TAXONOMY_PATH, load_taxonomy
+
+FIRST_NAMES = ['Alice', 'Bruno', 'Chen', 'Dana', 'Elif', 'Farah', 'Goran', 'Hana', 'Ivan', 'Julia',
+               'Kofi', 'Lena', 'Mateo', 'Nadia', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sven', 'Tariq']
+LAST_NAMES = ['Anders', 'Baker', 'Costa', 'Dubois', 'Eriksen', 'Fischer', 'Garcia', 'Haddad', 'Ito',
+              'Jensen', 'Kowalski', 'Larsen', 'Moreau', 'Novak', 'Okafor', 'Petrov', 'Rossi', 'Silva']
+COMPANIES = ['Acme Analytics', 'Initech', 'Globex', 'Umbrella Labs', 'Hooli', 'Vandelay Industries',
+             'Stark Logistics', 'Wayne Retail', 'Cyberdyne Health', 'Soylent Foods']
+
+# Titles and filler prose; none of these words is a taxonomy skill or alias
+TITLES = ['Software Engineer', 'Senior Software Engineer', 'Backend Developer', 'Data Engineer',
+          'Platform Engineer', 'Full Stack Developer']
+_VERBS = ['Built', 'Designed', 'Maintained', 'Migrated', 'Owned', 'Improved', 'Automated', 'Delivered']
+_OBJECTS = ['the billing service', 'an internal reporting portal', 'the order pipeline',
+            'a customer onboarding flow', 'the search backend', 'nightly batch jobs',
+            'the payments integration', 'a partner API']
+_OUTCOMES = ['cutting latency by a third', 'for two million daily users', 'with zero downtime',
+             'ahead of schedule', 'reducing support tickets', 'across four regions',
+             'saving hours of manual work each week', 'together with the product team']
+
+LINES_PER_PAGE = 48
+
+
+def skill_names(taxonomy=None):
+    """Canonical skills documents are built from"""
+    return list(taxonomy if taxonomy is not None else load_taxonomy(DEFAULT_TAXONOMY_PATH))
+
+
+def synthetic_job(rng, skills, required=8):
+    """(text, required skills) of a job description asking for `required` skills"""
+    wanted = rng.sample(skills, min(required, len(skills)))
+    title = rng.choice(TITLES)
+    text = '\n'.join([
+        title,
+        f"We are hiring a {title.lower()} to join a growing product team.",
+        'Requirements',
+        *[f"- Hands-on experience with {skill}" for skill in wanted],
+        'Responsibilities',
+        *[f"- {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}" for _ in range(4)],
+    ])
+    return text, wanted
+
+
+def synthetic_resume(rng, skills, job_skills, overlap, pages=1):
+    """
+    A resume dict with 'text', 'skills' and 'contact'. round(overlap * len(job_skills))
+    of the job's skills are listed, plus a few unrelated ones, and experience
+    bullets pad the text to roughly `pages` pages.
+    """
+    shared = job_skills[:round(overlap * len(job_skills))]
+    others = rng.sample([skill for skill in skills if skill not in job_skills], 3)
+    listed = shared + others
+
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    contact = {
+        'name': f"{first} {last}",
+        'email': f"{first}.{last}{rng.randint(1, 99)}@example.com".lower(),
+        'phone': f"+1 (555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+    }
+    lines = [
+        contact['name'],
+        f"{contact['email']} | {contact['phone']}",
+        'Summary',
+        f"{rng.choice(TITLES)} with {rng.randint(2, 15)} years of experience shipping production systems.",
+        'Skills',
+        ', '.join(listed),
+        'Experience',
+    ]
+    year = 2024
+    while len(lines) < pages * LINES_PER_PAGE - 3:
+        start = year - rng.randint(1, 4)
+        lines.append(f"{rng.choice(TITLES)}, {rng.choice(COMPANIES)} ({start} - {year})")
+        lines.extend(
+            f"- {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} {rng.choice(_OUTCOMES)}."
+            for _ in range(rng.randint(3, 6))
+        )
+        # Very long resumes wrap around rather than reach back centuries
+        year = start if start > 1990 else 2024
+    # The last role can run past the page budget; cut it so the PDF has exactly `pages` pages
+    del lines[pages * LINES_PER_PAGE - 2:]
+    lines.extend(['Education', 'B.Sc. Computer Science, State University'])
+    return {'text': '\n'.join(lines), 'skills': listed, 'shared_skills': shared, 'contact': contact}
+
+
+def render_pdf(text):
+    """A text-layer PDF of the text, LINES_PER_PAGE lines per page"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    # invariant fixes the timestamps and ids, so the same text renders to the same bytes
+    pdf = canvas.Canvas(buffer, pagesize=letter, invariant=1)
+    lines = text.splitlines()
+    for start in range(0, len(lines), LINES_PER_PAGE):
+        y = 750
+        for line in lines[start:start + LINES_PER_PAGE]:
+            pdf.drawString(50, y, line[:110])
+            y -= 15
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def render_docx(text):
+    """A DOCX with one paragraph per line of the text"""
+    import docx
+
+    document = docx.Document()
+    for line in text.splitlines():
+        document.add_paragraph(line)
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+RENDERERS = {'pdf': render_pdf, 'docx': render_docx}
+
+
+def generate_corpus(count, overlap=0.5, pages=(1, 2, 4), formats=('pdf', 'docx'), seed=0, render=True):
+    """
+    A job description and `count` resumes against it, cycling through the
+    given page lengths and formats. Returns {'job', 'job_skills', 'resumes'};
+    each resume also has 'file_name', 'format', 'pages' and, when render is
+    true, the file bytes in 'data'.
+    """
+    rng = random.Random(seed)
+    skills = skill_names()
+    job_text, job_skills = synthetic_job(rng, skills)
+    resumes = []
+    for index in range(count):
+        resume = synthetic_resume(rng, skills, job_skills, overlap, pages[index % len(pages)])
+        resume['format'] = formats[index % len(formats)]
+        resume['pages'] = pages[index % len(pages)]
+        resume['file_name'] = f"resume_{index:05d}.{resume['format']}"
+        if render:
+            resume['data'] = RENDERERS[resume['format']](resume['text'])
+        resumes.append(resume)
+    return {'job': job_text, 'job_skills': job_skills, 'resumes': resumes}
+
+
+def write_corpus(directory, corpus):
+    """Write the resume files and job.txt of a rendered corpus into directory"""
+    os.makedirs(directory, exist_ok=True)
+    for resume in corpus['resumes']:
+        with open(os.path.join(directory, resume['file_name']), 'wb') as output:
+            output.write(resume['data'])
+    with open(os.path.join(directory, 'job.txt'), 'w') as output:
+        output.write(corpus['job'] + '\n')
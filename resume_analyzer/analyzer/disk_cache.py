@@ -0,0 +1,129 @@
+"""
+Size-bounded on-disk LRU store shared by all processes on a host.
+
+Each entry is one file named after its key. Reads refresh the file's mtime,
+and when the directory grows past max_bytes the least recently used files are
+deleted until it is back under the low-water mark. Writes go through a
+temporary file and os.replace, so readers never see partial entries.
+"""
+import os
+import tempfile
+import threading
+import time
+
+# Evict down to this fraction of max_bytes so we don't rescan on every write
+LOW_WATER_MARK = 0.9
+
+
+class DiskLRUCache:
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._approx_bytes = None  # Estimated size, corrected by every eviction scan
+        self._measured_at = 0.0  # time.monotonic() of the last scan
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get_path(self, key):
+        """Path of a cached entry, marking it recently used, or None on a miss"""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def read(self, key):
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as entry:
+                return entry.read()
+        except FileNotFoundError:  # Evicted by another process in between
+            return None
+
+    def write(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as entry:
+                entry.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self.size()
+                self._measured_at = time.monotonic()
+            else:
+                self._approx_bytes += len(data)
+            over_budget = self._approx_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+        return path
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def _entries(self):
+        """(mtime, size, path) of every entry"""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith('.tmp-'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        return sum(size for _mtime, size, _path in self._entries())
+
+    def approx_size(self, max_age=60):
+        """
+        The running size estimate, rescanned with size() when it is older than
+        max_age seconds. Other processes' writes only show up after a rescan.
+        """
+        with self._lock:
+            if self._approx_bytes is not None and time.monotonic() - self._measured_at < max_age:
+                return self._approx_bytes
+        size = self.size()
+        with self._lock:
+            self._approx_bytes = size
+            self._measured_at = time.monotonic()
+        return size
+
+    def evict(self):
+        """Delete least recently used entries until the store is under the low-water mark"""
+        entries = sorted(self._entries())
+        total = sum(size for _mtime, size, _path in entries)
+        target = self.max_bytes * LOW_WATER_MARK
+        for _mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        with self._lock:
+            self._approx_bytes = total
+            self._measured_at = time.monotonic()
+        return total
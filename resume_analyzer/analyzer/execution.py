@@ -0,0 +1,154 @@
+"""
+Execution engine for batches of resume files.
+
+Text extraction is CPU bound and runs in the sandbox process pool (see
+sandbox.py), handed over by one dispatch thread per worker. LLM analyses wait
+on the network and run in a bounded thread pool. Results are returned in
+submission order, one task failing never aborts the batch, and every task
+records how long it took.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TaskResult:
+    """Outcome of one task: its value or error message and its wall time"""
+
+    def __init__(self, ok, value, seconds, code=None):
+        self.ok = ok
+        self.value = value if ok else None
+        self.error = None if ok else value
+        self.code = code  # e.g. the ExtractionError code of a failed task
+        self.seconds = seconds
+
+    def __repr__(self):
+        state = 'ok' if self.ok else f'error={self.error!r}'
+        return f'<TaskResult {state} {self.seconds:.3f}s>'
+
+
+def error_message(func, e):
+    """Message of a failed task for users; the exception type only goes to the log"""
+    logger.warning("%s failed: %s: %s", getattr(func, '__name__', func), type(e).__name__, e)
+    return str(e) or type(e).__name__
+
+
+def _timed_call(func, *args):
+    """Run func in the worker and report (ok, value or error, seconds, error code)"""
+    start = time.perf_counter()
+    try:
+        return True, func(*args), time.perf_counter() - start, None
+    except Exception as e:
+        return False, error_message(func, e), time.perf_counter() - start, getattr(e, 'code', None)
+
+
+_lock = threading.Lock()
+_dispatch_pool = None
+_thread_pool = None
+
+
+def extraction_workers():
+    workers = getattr(settings, 'ANALYZER_EXTRACTION_WORKERS', None)
+    if workers is None:
+        return os.cpu_count() or 1
+    return workers
+
+
+def llm_concurrency():
+    return max(1, getattr(settings, 'ANALYZER_LLM_CONCURRENCY', 4))
+
+
+def get_dispatch_pool():
+    """Threads that hand files to the extraction sandbox, or None when extracting inline"""
+    global _dispatch_pool
+    if extraction_workers() <= 0:
+        return None
+    with _lock:
+        if _dispatch_pool is None:
+            _dispatch_pool = ThreadPoolExecutor(max_workers=extraction_workers(),
+                                                thread_name_prefix='analyzer-extract')
+        return _dispatch_pool
+
+
+def get_thread_pool():
+    """Shared LLM pool; its size is the per-process concurrency limit"""
+    global _thread_pool
+    with _lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=llm_concurrency(), thread_name_prefix='analyzer-llm')
+        return _thread_pool
+
+
+def run_tasks(executor, func, arg_tuples, on_result=None):
+    """
+    Run func(*args) for each args tuple and return TaskResults in the same order.
+    on_result(index, result) is called in the calling thread as each task finishes.
+    """
+    if executor is None:
+        results = []
+        for index, args in enumerate(arg_tuples):
+            results.append(TaskResult(*_timed_call(func, *args)))
+            if on_result:
+                on_result(index, results[-1])
+        return results
+
+    futures = {executor.submit(_timed_call, func, *args): index for index, args in enumerate(arg_tuples)}
+    results = [None] * len(futures)
+    for future in as_completed(futures):
+        index = futures[future]
+        try:
+            results[index] = TaskResult(*future.result())
+        except BrokenExecutor as e:
+            results[index] = TaskResult(False, error_message(func, e), 0.0)
+        if on_result:
+            on_result(index, results[index])
+    return results
+
+
+def map_extraction(func, arg_tuples, on_result=None):
+    """Run an extraction function such as sandbox.extract for each file from the dispatch threads"""
+    return run_tasks(get_dispatch_pool(), func, arg_tuples, on_result)
+
+
+def map_llm(func, arg_tuples, on_result=None):
+    """Run a network-bound function over the bounded thread pool"""
+    return run_tasks(get_thread_pool(), func, arg_tuples, on_result)
+
+
+async def _await_task(future, func):
+    try:
+        return TaskResult(*await asyncio.wrap_future(future))
+    except BrokenExecutor as e:
+        return TaskResult(False, error_message(func, e), 0.0)
+
+
+async def amap_extraction(func, arg_tuples):
+    """Async map_extraction: awaits the dispatch threads without blocking the event loop"""
+    pool = get_dispatch_pool()
+    if pool is None:
+        return [TaskResult(*await asyncio.to_thread(_timed_call, func, *args)) for args in arg_tuples]
+    return list(await asyncio.gather(*[
+        _await_task(pool.submit(_timed_call, func, *args), func) for args in arg_tuples
+    ]))
+
+
+async def amap_llm(coroutine_func, arg_tuples):
+    """Run a coroutine function over arg_tuples, at most llm_concurrency() at a time"""
+    semaphore = asyncio.Semaphore(llm_concurrency())
+
+    async def run(args):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                return TaskResult(True, await coroutine_func(*args), time.perf_counter() - start)
+            except Exception as e:
+                return TaskResult(False, error_message(coroutine_func, e), time.perf_counter() - start)
+
+    return list(await asyncio.gather(*[run(args) for args in arg_tuples]))
@@ -0,0 +1,142 @@
+"""
+Content-addressed cache of extracted resume text.
+
+Recruiters upload the same resume against many job descriptions, so the text
+extracted from a file is stored zlib-compressed under the SHA-256 of the file
+bytes plus EXTRACTOR_VERSION. Repeat uploads skip PDF/DOCX parsing entirely.
+"""
+import asyncio
+import os
+import threading
+import zlib
+
+from django.conf import settings
+
+from .cache import content_key
+from .disk_cache import DiskLRUCache
+from .execution import TaskResult
+from .sandbox import extract as extract_sandboxed
+
+# Bump whenever extraction output changes so stale text is not served
+EXTRACTOR_VERSION = 'extract-v2'
+
+
+class ExtractionCache:
+    """Compressed extracted text on disk, with this process's hit statistics"""
+
+    def __init__(self, directory, max_bytes):
+        self.store = DiskLRUCache(directory, max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0  # Input bytes that did not have to be parsed
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(data):
+        return content_key(EXTRACTOR_VERSION, data)
+
+    def get(self, data):
+        compressed = self.store.read(self.key(data))
+        with self._lock:
+            if compressed is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.bytes_saved += len(data)
+        if compressed is None:
+            return None
+        return zlib.decompress(compressed).decode('utf-8')
+
+    def put(self, data, text):
+        self.store.write(self.key(data), zlib.compress(text.encode('utf-8')))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'bytes_saved': self.bytes_saved,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """The process-wide cache, or None when ANALYZER_EXTRACTION_CACHE_MAX_BYTES is 0"""
+    global _cache
+    max_bytes = getattr(settings, 'ANALYZER_EXTRACTION_CACHE_MAX_BYTES', 512 * 2**20)
+    if not max_bytes:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            directory = getattr(settings, 'ANALYZER_EXTRACTION_CACHE_DIR',
+                                os.path.join(settings.BASE_DIR, 'cache', 'extraction'))
+            _cache = ExtractionCache(directory, max_bytes)
+        return _cache
+
+
+def _store(cache, data, text):
+    # Empty text usually means a failed parse; don't pin it
+    if cache is not None and text:
+        cache.put(data, text)
+
+
+def extract_text(data):
+    """
+    Extract text from file bytes, parsing only on a cache miss. Returns None
+    for unsupported formats and raises sandbox.ExtractionError for bad files.
+    """
+    cache = get_extraction_cache()
+    text = cache.get(data) if cache is not None else None
+    if text is None:
+        text = extract_sandboxed(data)
+        _store(cache, data, text)
+    return text
+
+
+def extract_file(file_path):
+    """extract_text for a file on disk"""
+    with open(file_path, 'rb') as stream:
+        return extract_text(stream.read())
+
+
+def extract_many(contents, run_extraction):
+    """
+    Extract a batch of file contents, returning TaskResults in order. Hits are
+    served here; only misses are handed to run_extraction, e.g.
+    execution.map_extraction, and their results are stored in this process.
+    """
+    cache = get_extraction_cache()
+    results = [None] * len(contents)
+    misses = []
+    for index, data in enumerate(contents):
+        text = cache.get(data) if cache is not None else None
+        if text is None:
+            misses.append(index)
+        else:
+            results[index] = TaskResult(True, text, 0.0)
+
+    for index, result in zip(misses, run_extraction(extract_sandboxed, [(contents[i],) for i in misses])):
+        results[index] = result
+        if result.ok:
+            _store(cache, contents[index], result.value)
+    return results
+
+
+async def aextract_many(contents, arun_extraction):
+    """Async extract_many; cache file I/O runs in a thread"""
+    cache = get_extraction_cache()
+    hits = await asyncio.gather(*[
+        asyncio.to_thread(cache.get, data) if cache is not None else asyncio.sleep(0) for data in contents
+    ])
+    misses = [index for index, text in enumerate(hits) if text is None]
+    results = [None if text is None else TaskResult(True, text, 0.0) for text in hits]
+
+    for index, result in zip(misses, await arun_extraction(extract_sandboxed, [(contents[i],) for i in misses])):
+        results[index] = result
+        if result.ok:
+            await asyncio.to_thread(_store, cache, contents[index], result.value)
+    return results
@@ -0,0 +1,219 @@
+"""
+Bulk ingestion of resume files into the Resume table.
+
+Files are hashed in this process and skipped when their content is already
+stored, so an interrupted run can simply be started again. New files are
+extracted and analyzed (normalized text, skills, contact details) in a
+memory-limited sandbox pool with a per-file timeout, and the results are
+written in batches, one transaction per batch. Each written batch is added
+to the search index as one segment and to the TF-IDF resume matrix.
+"""
+import hashlib
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import transaction
+
+from . import model_registry, search_index, tfidf_index
+from .execution import extraction_workers
+from .models import Resume
+from .nlp_processor import DocumentAnalysis
+from .sandbox import ExtractionError, Sandbox, max_upload_bytes, parse_document
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = ('.pdf', '.docx')
+
+
+def find_files(directory, extensions=EXTENSIONS):
+    """Paths of the files under directory with one of the extensions, in a stable order"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for file_name in sorted(files):
+            if file_name.lower().endswith(extensions):
+                yield os.path.join(root, file_name)
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as stream:
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def analyze_file(path, max_pages):
+    """Text, normalized text, skills and contact details of a resume file; runs in a sandbox worker"""
+    with open(path, 'rb') as stream:
+        text = parse_document(stream.read(), max_pages)
+    if text is None:
+        return None
+    document = DocumentAnalysis(text)
+    contact_info = document.contact_info
+    return {
+        'text': text,
+        'normalized_text': document.normalized_text,
+        'skills': document.skills,
+        'name': (contact_info['name'] or '')[:255],
+        'email': (contact_info['email'] or '')[:254],
+        'phone': (contact_info['phone'] or '')[:32],
+    }
+
+
+class IngestStats:
+    """Counts of a run, and its documents per second"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            **self.counts,
+            'seconds': round(self.seconds, 1),
+            'docs_per_second': round(self.counts['ingested'] / self.seconds, 2) if self.seconds else 0.0,
+        }
+
+
+class Ingestor:
+    """
+    Ingest files through a sandbox pool of `workers` processes, keeping at
+    most a few files per worker in flight and writing every batch_size
+    results in one transaction.
+    """
+
+    def __init__(self, workers=None, batch_size=500, timeout=None, on_progress=None):
+        self.workers = extraction_workers() if workers is None else workers
+        self.batch_size = batch_size
+        self.timeout = timeout or getattr(settings, 'ANALYZER_EXTRACTION_TIMEOUT', 30)
+        self.max_pages = getattr(settings, 'ANALYZER_PDF_MAX_PAGES', 50)
+        self.on_progress = on_progress
+        self.stats = IngestStats()
+        self._batch = []
+        self._seen = set()
+
+    def new_files(self, paths):
+        """(path, content hash) of the files whose content is not stored or queued yet"""
+        candidates = []
+        for path in paths:
+            try:
+                if os.path.getsize(path) > max_upload_bytes():
+                    self.stats.counts['too_large'] += 1
+                    continue
+                digest = file_hash(path)
+            except OSError as e:
+                logger.warning("Cannot read %s: %s", path, e)
+                self.stats.counts['unreadable'] += 1
+                continue
+            if digest in self._seen:
+                self.stats.counts['duplicates'] += 1
+                continue
+            self._seen.add(digest)
+            candidates.append((path, digest))
+
+        stored = set(Resume.objects.filter(
+            content_hash__in=[digest for _path, digest in candidates]
+        ).values_list('content_hash', flat=True))
+        self.stats.counts['already_stored'] += len(stored)
+        return [(path, digest) for path, digest in candidates if digest not in stored]
+
+    def handle_result(self, path, digest, future):
+        try:
+            result = future.result()
+        except ExtractionError as e:
+            logger.warning("Skipping %s: %s", path, e)
+            self.stats.counts[f'failed_{e.code}'] += 1
+            return
+        except Exception as e:  # Analysis errors when running without the sandbox
+            logger.warning("Skipping %s: %s", path, e)
+            self.stats.counts['failed'] += 1
+            return
+        if result is None:
+            self.stats.counts['unsupported'] += 1
+            return
+        self._batch.append(Resume(
+            content_hash=digest, file_name=os.path.basename(path)[:255], source_path=path[:1000], **result
+        ))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._batch:
+            return
+        with transaction.atomic():
+            # Another run may have stored the same content since new_files checked
+            stored = set(Resume.objects.filter(
+                content_hash__in=[resume.content_hash for resume in self._batch]
+            ).values_list('content_hash', flat=True))
+            batch = [resume for resume in self._batch if resume.content_hash not in stored]
+            # ignore_conflicts still covers a row stored between the check and the insert
+            Resume.objects.bulk_create(batch, ignore_conflicts=True)
+        # bulk_create sends no post_save signals, and with ignore_conflicts SQLite does not set the
+        # primary keys, so the stored rows are read back to index them
+        inserted = list(Resume.objects.filter(
+            content_hash__in=[resume.content_hash for resume in batch]
+        ).only('id', 'normalized_text', 'skills'))
+        search_index.index_resumes(inserted)
+        tfidf_index.index_resumes(inserted)
+        self.stats.counts['already_stored'] += len(stored)
+        self.stats.counts['ingested'] += len(batch)
+        self._batch = []
+        if self.on_progress is not None:
+            self.on_progress(self.stats)
+
+    def run(self, paths):
+        # Load the models once so forked workers share them instead of each loading a copy
+        model_registry.warmup()
+        sandbox = None
+        if self.workers > 0:
+            sandbox = Sandbox(
+                self.workers,
+                memory_limit=getattr(settings, 'ANALYZER_EXTRACTION_MEMORY_LIMIT', 1024 * 2**20),
+                timeout=self.timeout,
+                max_tasks_per_child=getattr(settings, 'ANALYZER_EXTRACTION_MAX_TASKS_PER_CHILD', 100),
+            )
+        call = sandbox.call if sandbox is not None else lambda func, *args: func(*args)
+
+        pending = {}
+        try:
+            # One dispatch thread per worker; each blocks on its file's sandbox call
+            with ThreadPoolExecutor(max_workers=max(1, self.workers)) as dispatch:
+                chunk = []
+                for path in paths:
+                    chunk.append(path)
+                    if len(chunk) < self.batch_size:
+                        continue
+                    self._submit(dispatch, call, chunk, pending)
+                    chunk = []
+                self._submit(dispatch, call, chunk, pending)
+                self._drain(pending, 0)
+            self.flush()
+        finally:
+            if sandbox is not None:
+                sandbox.close()
+        return self.stats
+
+    def _submit(self, dispatch, call, chunk, pending):
+        for path, digest in self.new_files(chunk):
+            pending[dispatch.submit(call, analyze_file, path, self.max_pages)] = (path, digest)
+            self._drain(pending, self.workers * 4)
+
+    def _drain(self, pending, limit):
+        """Handle finished files until at most limit are in flight"""
+        while len(pending) > limit:
+            done, _not_done = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                self.handle_result(*pending.pop(future), future)
+
+
+def ingest_directory(directory, **options):
+    """Ingest every resume file under directory, returning the run's IngestStats"""
+    return Ingestor(**options).run(find_files(directory))
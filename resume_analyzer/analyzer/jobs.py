@@ -0,0 +1,158 @@
+"""
+Durable background queue for analyses.
+
+Jobs are AnalysisJob rows in the project database, so no external broker is
+needed. Views enqueue a job and return immediately; worker processes started
+with `manage.py run_analysis_workers` claim queued jobs, record progress as
+files are extracted and scored, and store the result like the synchronous
+views do.
+"""
+import logging
+import os
+import shutil
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from . import execution, extraction_cache, metrics
+from .models import AnalysisJob, StoredAnalysis
+
+logger = logging.getLogger(__name__)
+
+
+def get_upload_root():
+    return getattr(settings, 'ANALYZER_JOB_UPLOAD_DIR', os.path.join(settings.MEDIA_ROOT, 'job_uploads'))
+
+
+def background_enabled(request):
+    """Whether this analysis should be queued instead of run inside the request"""
+    return request.POST.get('background') == '1' or getattr(settings, 'ANALYZER_BACKGROUND_JOBS', False)
+
+
+def enqueue_analysis(kind, job_description, resume_files):
+    """Persist the uploads and queue an analysis job for them"""
+    job = AnalysisJob(kind=kind, job_description=job_description)
+    job.upload_dir = os.path.join(get_upload_root(), str(job.id))
+    os.makedirs(job.upload_dir, exist_ok=True)
+
+    for idx, resume_file in enumerate(resume_files):
+        # The format is detected from the file contents when the job runs
+        path = os.path.join(job.upload_dir, str(idx))
+        with metrics.timer('upload_write'), open(path, 'wb') as stored_file:
+            for chunk in resume_file.chunks():
+                stored_file.write(chunk)
+        job.files.append({'name': resume_file.name, 'path': path})
+
+    job.save()
+    return job
+
+
+def job_status_data(job):
+    """JSON-serializable status and progress of a job"""
+    data = {
+        'id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'files_total': job.files_total,
+        'files_extracted': job.files_extracted,
+        'files_scored': job.files_scored,
+        'error': job.error,
+        'result_url': None,
+    }
+    if job.kind == StoredAnalysis.KIND_COMPARISON:
+        data['insights_generated'] = job.insights_generated
+    if job.status == AnalysisJob.STATUS_DONE and job.result_id:
+        data['result_url'] = reverse('view_result', args=[job.result_id])
+    return data
+
+
+def claim_next_job(worker_name):
+    """Atomically move the oldest queued job to running and return it, or None"""
+    queued = AnalysisJob.objects.filter(status=AnalysisJob.STATUS_QUEUED).values_list('pk', flat=True)
+    for job_id in queued[:10]:
+        claimed = AnalysisJob.objects.filter(pk=job_id, status=AnalysisJob.STATUS_QUEUED).update(
+            status=AnalysisJob.STATUS_RUNNING, worker=worker_name, started_at=timezone.now()
+        )
+        if claimed:
+            return AnalysisJob.objects.get(pk=job_id)
+    return None
+
+
+def requeue_stale_jobs():
+    """Put back jobs whose worker died mid-run (running for longer than ANALYZER_JOB_TIMEOUT)"""
+    timeout = getattr(settings, 'ANALYZER_JOB_TIMEOUT', 1800)
+    return AnalysisJob.objects.filter(
+        status=AnalysisJob.STATUS_RUNNING, started_at__lt=timezone.now() - timedelta(seconds=timeout)
+    ).update(status=AnalysisJob.STATUS_QUEUED, worker='', files_extracted=0, files_scored=0,
+             insights_generated=False)
+
+
+def _progress(job, **fields):
+    AnalysisJob.objects.filter(pk=job.pk).update(**fields)
+
+
+def run_job(job):
+    """Process a claimed job to completion, recording progress and the result"""
+    # Imported here because views imports this module to enqueue jobs
+    from . import views
+
+    try:
+        extractions = execution.run_tasks(
+            None, extraction_cache.extract_file, [(stored['path'],) for stored in job.files],
+            on_result=lambda _idx, _result: _progress(job, files_extracted=F('files_extracted') + 1),
+        )
+        extracted = views.readable_extractions(extractions)
+        screened_out = {}
+        if job.kind == StoredAnalysis.KIND_COMPARISON:
+            screened_out = views.prescreen(extracted, job.job_description)
+            _progress(job, files_scored=len(screened_out))
+        llm_results = execution.map_llm(
+            views.analyze_resume_job_match_cached,
+            [(extraction.value, job.job_description) for _idx, extraction in views.shortlisted(extracted, screened_out)],
+            on_result=lambda _idx, _result: _progress(job, files_scored=F('files_scored') + 1),
+        )
+
+        if job.kind == StoredAnalysis.KIND_COMPARISON:
+            resume_analyses = views.combine_resume_analyses(
+                [stored['name'] for stored in job.files], extracted, llm_results, screened_out
+            )
+            comparative_insights = views.generate_comparative_insights(
+                views.insight_candidates(resume_analyses), job.job_description
+            )
+            _progress(job, insights_generated=True)
+            context = views.store_comparison(job.job_description, resume_analyses, comparative_insights)
+        else:
+            if extracted and not extracted[0][1].ok:
+                raise RuntimeError(f"Could not extract text: {extracted[0][1].error}")
+            if not llm_results:
+                raise ValueError('Unsupported file format. Please use PDF or DOCX')
+            analysis = llm_results[0].value if llm_results[0].ok else views.failed_analysis(llm_results[0].error)
+            context = views.store_single_analysis(job.job_description, analysis)
+
+        _progress(job, status=AnalysisJob.STATUS_DONE, result_id=context['analysis_id'],
+                  finished_at=timezone.now())
+    except Exception as e:
+        logger.exception("Analysis job %s failed", job.pk)
+        _progress(job, status=AnalysisJob.STATUS_FAILED, error=f"{type(e).__name__}: {e}",
+                  finished_at=timezone.now())
+    finally:
+        shutil.rmtree(job.upload_dir, ignore_errors=True)
+
+
+def work(worker_name, poll_interval=1.0, should_stop=lambda: False):
+    """Claim and run jobs until should_stop() returns True"""
+    while not should_stop():
+        try:
+            job = claim_next_job(worker_name)
+        except OperationalError:  # SQLite is busy with another writer
+            job = None
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        logger.info("Worker %s running job %s", worker_name, job.pk)
+        run_job(job)
@@ -0,0 +1,194 @@
+"""
+Chat completion clients for the OpenAI-compatible LLM endpoint.
+
+The synchronous client uses the openai package. Under ASGI the asynchronous
+client keeps one pooled httpx.AsyncClient per event loop so async views can
+hold many requests in flight on a single worker; elsewhere, e.g. async views
+served through WSGI where every request runs in a new event loop, each call
+opens and closes its own client. The stream_* variants yield the reply
+piece by piece as the server sends it. Both talk to ANALYZER_LLM_BASE_URL, so
+they can be pointed at a local stub (`manage.py llm_stub`) for testing.
+"""
+import asyncio
+import json
+import threading
+import weakref
+from contextlib import asynccontextmanager
+
+import httpx
+import openai
+from django.conf import settings
+
+from . import metrics
+from .prompts import estimate_tokens
+
+LLM_MODEL = "gpt-4-turbo"
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+
+def get_base_url():
+    return getattr(settings, 'ANALYZER_LLM_BASE_URL', None) or DEFAULT_BASE_URL
+
+
+def get_api_key():
+    return getattr(settings, 'OPENAI_API_KEY', None) or openai.api_key
+
+
+def get_timeout():
+    return getattr(settings, 'ANALYZER_LLM_TIMEOUT', 120)
+
+
+def strip_code_fence(content):
+    """Remove the ```json ... ``` wrapper models sometimes put around JSON"""
+    content = content.strip()
+    if content.startswith('```json'):
+        content = content[7:]
+    if content.endswith('```'):
+        content = content[:-3]
+    return content
+
+
+def _count_streamed_tokens(messages, pieces):
+    """Streamed replies carry no usage, so estimate it from the text"""
+    metrics.count('analyzer_llm_tokens_total',
+                  sum(estimate_tokens(message['content']) for message in messages), kind='prompt')
+    metrics.count('analyzer_llm_tokens_total', estimate_tokens(''.join(pieces)), kind='completion')
+
+
+def chat_completion(messages, model=LLM_MODEL, **params):
+    """Blocking chat completion, returning the message content"""
+    with metrics.timer('llm_call'):
+        try:
+            response = openai.ChatCompletion.create(
+                model=model,
+                messages=messages,
+                api_key=get_api_key(),
+                api_base=get_base_url(),
+                request_timeout=get_timeout(),
+                **params
+            )
+        except Exception:
+            metrics.count('analyzer_llm_errors_total')
+            raise
+    metrics.record_usage(response)
+    return response["choices"][0]["message"]["content"].strip()
+
+
+def _delta_content(chunk):
+    """The text carried by one chat.completion.chunk, if any"""
+    choices = chunk.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ''
+
+
+def stream_chat_completion(messages, model=LLM_MODEL, **params):
+    """Blocking streamed chat completion, yielding content pieces as they arrive"""
+    pieces = []
+    with metrics.timer('llm_call'):
+        try:
+            response = openai.ChatCompletion.create(
+                model=model,
+                messages=messages,
+                api_key=get_api_key(),
+                api_base=get_base_url(),
+                request_timeout=get_timeout(),
+                stream=True,
+                **params
+            )
+            for chunk in response:
+                content = _delta_content(chunk)
+                if content:
+                    pieces.append(content)
+                    yield content
+        except Exception:
+            metrics.count('analyzer_llm_errors_total')
+            raise
+    _count_streamed_tokens(messages, pieces)
+
+
+_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+_pooled = False
+
+
+def use_pooled_clients(enabled=True):
+    """
+    Keep one client per event loop instead of one per call. Only safe when
+    loops live as long as the process, so the ASGI entry point turns it on:
+    pooled clients are never closed.
+    """
+    global _pooled
+    _pooled = enabled
+
+
+def new_async_client():
+    max_connections = getattr(settings, 'ANALYZER_LLM_MAX_CONNECTIONS', 100)
+    return httpx.AsyncClient(
+        base_url=get_base_url(),
+        headers={'Authorization': f'Bearer {get_api_key()}'},
+        timeout=get_timeout(),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
+
+
+def get_async_client():
+    """The pooled HTTP client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None:
+            client = _clients[loop] = new_async_client()
+    return client
+
+
+@asynccontextmanager
+async def async_client():
+    """The pooled client when pooling is on, otherwise a client closed when the block ends"""
+    if _pooled:
+        yield get_async_client()
+        return
+    async with new_async_client() as client:
+        yield client
+
+
+async def achat_completion(messages, model=LLM_MODEL, **params):
+    """Non-blocking chat completion, returning the message content"""
+    with metrics.timer('llm_call'):
+        try:
+            async with async_client() as client:
+                response = await client.post(
+                    '/chat/completions',
+                    json={'model': model, 'messages': messages, **params},
+                )
+            response.raise_for_status()
+        except Exception:
+            metrics.count('analyzer_llm_errors_total')
+            raise
+    result = response.json()
+    metrics.record_usage(result)
+    return result["choices"][0]["message"]["content"].strip()
+
+
+async def astream_chat_completion(messages, model=LLM_MODEL, **params):
+    """Non-blocking streamed chat completion, yielding content pieces as they arrive"""
+    pieces = []
+    with metrics.timer('llm_call'):
+        try:
+            async with async_client() as client, client.stream(
+                'POST', '/chat/completions', json={'model': model, 'messages': messages, 'stream': True, **params},
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        break
+                    content = _delta_content(json.loads(data))
+                    if content:
+                        pieces.append(content)
+                        yield content
+        except Exception:
+            metrics.count('analyzer_llm_errors_total')
+            raise
+    _count_streamed_tokens(messages, pieces)
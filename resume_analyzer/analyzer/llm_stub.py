@@ -0,0 +1,149 @@
+"""
+A local OpenAI-compatible chat completion server for tests and benchmarks.
+
+It answers /chat/completions after a configurable delay with canned but
+well-formed replies: an analysis JSON for analysis prompts, an insights JSON
+for comparison prompts and plain text otherwise. Requests with "stream": true
+get the reply as server-sent chunk events, one word at a time. With a status
+other than 200 every request fails with an OpenAI-style error body. Point
+ANALYZER_LLM_BASE_URL at it (`manage.py llm_stub`) to exercise the views
+without a real API.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_ANALYSIS = {
+    "match_percentage": 72,
+    "matched_skills": ["python", "django", "sql"],
+    "missing_skills": ["kubernetes"],
+    "skill_match_percentage": 75,
+    "semantic_match_percentage": 68,
+    "summary": "Solid backend profile that covers most of the required stack.",
+    "recommendations": ["Highlight any container orchestration experience."],
+    "contact_info": {"name": "Jane Doe", "email": "jane.doe@example.com", "phone": None},
+}
+
+STUB_INSIGHTS = {
+    "overall_comparison": "All candidates cover the core stack; the top candidate has the broadest experience.",
+    "top_candidate_analysis": "The top-ranked candidate matches the most required skills.",
+    "interview_recommendations": "Interview candidates in ranked order.",
+    "skill_distribution": "Python and SQL are common to every candidate; cloud skills vary.",
+}
+
+STUB_ANSWER = "The candidate is a reasonable fit: most required skills are present and the gaps can be trained."
+
+
+def stub_reply(messages):
+    """Canned reply matching what the calling prompt expects"""
+    system = next((message['content'] for message in messages if message.get('role') == 'system'), '')
+    if 'resume-job matching' in system:
+        return json.dumps(STUB_ANALYSIS)
+    if 'comparative analysis' in system:
+        return json.dumps(STUB_INSIGHTS)
+    return STUB_ANSWER
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(self.server.latency)
+
+        if self.server.status != 200:
+            self.send_json(self.server.status, {'error': {'message': 'Stub failure', 'type': 'server_error'}})
+            return
+
+        content = stub_reply(request.get('messages', []))
+        if request.get('stream'):
+            self.send_stream(request.get('model', 'stub'), content)
+            return
+
+        self.send_json(200, {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        })
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self, model, content):
+        """Send content as chat.completion.chunk events, closing the connection at the end"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for piece in re.findall(r'\S+\s*', content):
+            chunk = json.dumps({
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}],
+            })
+            self.wfile.write(f'data: {chunk}\n\n'.encode())
+            self.wfile.flush()
+            time.sleep(self.server.chunk_delay)
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.close_connection = True
+
+
+class StubLLMServer:
+    """Run the stub in a background thread; port 0 picks a free port"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, chunk_delay=0.0, status=200):
+        self.httpd = ThreadingHTTPServer((host, port), StubHandler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+        self.configure(latency=latency, chunk_delay=chunk_delay, status=status)
+
+    def configure(self, **options):
+        """Change latency, chunk_delay or status for the requests that follow"""
+        for name, value in options.items():
+            if name not in ('latency', 'chunk_delay', 'status'):
+                raise TypeError(f"Unknown stub option {name!r}")
+            setattr(self.httpd, name, value)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,59 @@
+import json
+import platform
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from analyzer.benchmarks import STAGES, compare_results
+
+
+def git_revision():
+    """The commit being benchmarked, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Run analysis pipeline benchmarks and print the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('stages', nargs='*', choices=sorted(STAGES),
+                            help="Stages to benchmark (default: all)")
+        parser.add_argument('--output', help="Also write the JSON results to this file")
+        parser.add_argument('--baseline',
+                            help="Results of an earlier run to compare against; changes are printed to stderr")
+
+    def handle(self, *args, **options):
+        results = {
+            'meta': {
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            },
+        }
+        for stage in options['stages'] or STAGES:
+            self.stderr.write(f"Running {stage} benchmark...")
+            results[stage] = STAGES[stage]()
+
+        output = json.dumps(results, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output + '\n')
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+            baseline.pop('meta', None)
+            current = {stage: value for stage, value in results.items() if stage != 'meta'}
+            for change in compare_results(baseline, current):
+                self.stderr.write(
+                    f"{change['metric']}: {change['baseline']} -> {change['current']} ({change['change']:+.1%})"
+                )
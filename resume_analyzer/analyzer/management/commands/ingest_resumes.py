@@ -0,0 +1,34 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.ingestion import Ingestor, find_files
+
+
+class Command(BaseCommand):
+    help = "Extract, analyze and store every PDF/DOCX resume under a directory; files already stored are skipped"
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Sandbox worker processes (default: ANALYZER_EXTRACTION_WORKERS; 0 runs inline)")
+        parser.add_argument('--batch-size', type=int, default=500, help="Resumes written per transaction")
+        parser.add_argument('--timeout', type=float, default=None,
+                            help="Seconds allowed per file (default: ANALYZER_EXTRACTION_TIMEOUT)")
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options['directory']):
+            raise CommandError(f"{options['directory']} is not a directory")
+        if options['batch_size'] <= 0:
+            raise CommandError("--batch-size must be positive")
+
+        def report(stats):
+            self.stderr.write(
+                f"{stats.counts['ingested']} ingested, {stats.counts['already_stored']} already stored "
+                f"({stats.counts['ingested'] / stats.seconds:.1f} docs/s)"
+            )
+
+        ingestor = Ingestor(options['workers'], options['batch_size'], options['timeout'], on_progress=report)
+        stats = ingestor.run(find_files(options['directory']))
+        self.stdout.write(json.dumps(stats.as_dict(), indent=2))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analyzer.llm_stub import StubLLMServer
+
+
+class Command(BaseCommand):
+    help = "Serve a local OpenAI-compatible stub for testing (set ANALYZER_LLM_BASE_URL to its URL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds to wait before each reply")
+        parser.add_argument('--chunk-delay', type=float, default=0.0,
+                            help="Seconds between the chunks of a streamed reply")
+
+    def handle(self, *args, **options):
+        server = StubLLMServer(options['host'], options['port'], options['latency'], options['chunk_delay']).start()
+        self.stdout.write(f"LLM stub listening on {server.base_url} (latency {options['latency']}s)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.stop()
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.corpus import generate_corpus, write_corpus
+
+
+class Command(BaseCommand):
+    help = "Write a deterministic synthetic corpus of PDF/DOCX resumes and a job description to a directory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--count', type=int, default=100)
+        parser.add_argument('--overlap', type=float, default=0.5,
+                            help="Share of the job's required skills every resume lists")
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 2, 4],
+                            help="Resume lengths in pages, cycled through")
+        parser.add_argument('--formats', nargs='+', choices=['pdf', 'docx'], default=['pdf', 'docx'])
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        corpus = generate_corpus(options['count'], options['overlap'], tuple(options['pages']),
+                                 tuple(options['formats']), options['seed'])
+        write_corpus(options['directory'], corpus)
+        self.stdout.write(f"Wrote {options['count']} resumes and job.txt to {options['directory']}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer import model_registry
+
+
+class Command(BaseCommand):
+    help = "Load the spaCy/NLTK resources from local storage and report load time and memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('resources', nargs='*', choices=sorted(model_registry.LOADERS),
+                            help="Resources to load (default: all)")
+
+    def handle(self, *args, **options):
+        try:
+            stats = model_registry.warmup(options['resources'] or None)
+        except model_registry.ResourceUnavailable as e:
+            raise CommandError(str(e))
+
+        for name, resource_stats in stats.items():
+            self.stdout.write(
+                f"{name:<12} {resource_stats['load_seconds']:>8.2f}s "
+                f"{resource_stats['rss_bytes'] / 2**20:>8.1f} MiB"
+            )
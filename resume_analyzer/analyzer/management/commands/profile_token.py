@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.profiling import HEADER, MODES, sign_token
+
+
+class Command(BaseCommand):
+    help = "Print a signed header value that turns on profiling for requests that send it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=MODES, default='cpu',
+                            help="cpu for cProfile, memory for tracemalloc, all for both")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{HEADER}: {sign_token(options['mode'])}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.storage import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete stored analysis results whose TTL has expired"
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired analyses"))
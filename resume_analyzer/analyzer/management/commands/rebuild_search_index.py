@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.models import Resume
+from analyzer.search_index import SearchIndex, get_index_dir
+
+
+class Command(BaseCommand):
+    help = "Rebuild the BM25 search index from every stored resume"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help="Resumes per index segment")
+        parser.add_argument('--index-dir', default=None, help=f"Index directory (default: {get_index_dir()})")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError("--batch-size must be positive")
+        start = time.perf_counter()
+        rows = Resume.objects.order_by('pk').values_list('pk', 'normalized_text', 'skills')
+
+        def batches():
+            batch = []
+            for row in rows.iterator(chunk_size=options['batch_size']):
+                batch.append(row)
+                if len(batch) == options['batch_size']:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        index = SearchIndex(options['index_dir'])
+        index.rebuild(batches())
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(index)} resumes in {index.directory} in {time.perf_counter() - start:.1f}s"
+        ))
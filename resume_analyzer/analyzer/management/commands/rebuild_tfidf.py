@@ -0,0 +1,75 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.models import Resume
+from analyzer.nlp_processor import extract_text_from_docx, extract_text_from_pdf, preprocess_text
+from analyzer.sandbox import ExtractionError
+from analyzer.tfidf_index import TfidfIndex, get_index_dir
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt')
+
+
+def read_documents(directory, on_error=None):
+    """Yield (relative path, text) for every readable supported file under directory"""
+    for root, _dirs, files in os.walk(directory):
+        for file_name in sorted(files):
+            path = os.path.join(root, file_name)
+            extension = os.path.splitext(file_name)[1].lower()
+            try:
+                if extension == '.pdf':
+                    text = extract_text_from_pdf(path)
+                elif extension == '.docx':
+                    text = extract_text_from_docx(path)
+                elif extension == '.txt':
+                    with open(path, encoding='utf-8', errors='ignore') as text_file:
+                        text = text_file.read()
+                else:
+                    continue
+            except ExtractionError as e:
+                # An unreadable file is left out rather than fitted on as an empty document
+                if on_error is not None:
+                    on_error(path, e)
+                continue
+            yield os.path.relpath(path, directory), text
+
+
+class Command(BaseCommand):
+    help = "Fit the corpus TF-IDF model on reference resumes/job descriptions and reindex the stored resumes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', help="Directory of reference resumes and job descriptions to fit on")
+        parser.add_argument('--reindex-only', action='store_true',
+                            help="Keep the saved vectorizer and only reindex the stored resumes")
+        parser.add_argument('--index-dir', default=None, help=f"Output directory (default: {get_index_dir()})")
+
+    def skipped(self, path, error):
+        self.stderr.write(f"Skipped {path}: {error}")
+
+    def handle(self, *args, **options):
+        index_dir = options['index_dir'] or get_index_dir()
+        start = time.perf_counter()
+
+        if options['reindex_only']:
+            index = TfidfIndex.load(index_dir)
+            if index is None:
+                raise CommandError(f"No fitted model in {index_dir}; run without --reindex-only first")
+        else:
+            if not options['corpus']:
+                raise CommandError("--corpus is required to fit the model")
+            corpus = [preprocess_text(text) for _path, text in read_documents(options['corpus'], self.skipped)]
+            if not corpus:
+                raise CommandError(f"No {', '.join(SUPPORTED_EXTENSIONS)} files found in {options['corpus']}")
+            index = TfidfIndex.fit(corpus, index_dir)
+            self.stdout.write(f"Fitted on {len(corpus)} documents, {len(index.vectorizer.vocabulary_)} terms")
+
+        # Vectors from another model are meaningless, so every stored resume is transformed again
+        rows = list(Resume.objects.order_by('pk').values_list('pk', 'normalized_text'))
+        index.reindex([pk for pk, _text in rows], [text for _pk, text in rows])
+        self.stdout.write(f"Indexed {len(rows)} stored resumes")
+
+        index.save()
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved TF-IDF index to {index_dir} in {time.perf_counter() - start:.1f}s"
+        ))
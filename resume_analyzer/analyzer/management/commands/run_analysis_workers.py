@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from analyzer import jobs
+
+
+def _worker_main(worker_name, poll_interval, stop_event):
+    # Let the parent handle Ctrl+C and stop workers through the event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    jobs.work(worker_name, poll_interval, should_stop=stop_event.is_set)
+
+
+class Command(BaseCommand):
+    help = "Run background analysis worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Number of worker processes")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait between polls when the queue is empty")
+
+    def handle(self, *args, **options):
+        requeued = jobs.requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale jobs")
+
+        # Children must not share the parent's database connection
+        connections.close_all()
+
+        stop_event = multiprocessing.Event()
+        host = socket.gethostname()
+        processes = []
+        for number in range(options['workers']):
+            worker_name = f"{host}:{os.getpid()}:{number}"
+            process = multiprocessing.Process(
+                target=_worker_main, args=(worker_name, options['poll_interval'], stop_event), name=worker_name
+            )
+            process.start()
+            processes.append(process)
+        self.stdout.write(self.style.SUCCESS(f"Started {len(processes)} analysis workers"))
+
+        signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+        try:
+            while not stop_event.is_set() and any(process.is_alive() for process in processes):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop_event.set()
+            self.stdout.write("Waiting for workers to finish their current job...")
+            for process in processes:
+                process.join()
@@ -0,0 +1,198 @@
+"""
+Per-stage latency histograms and counters, exported on /metrics in the
+Prometheus text format.
+
+Instrumented code wraps each stage in `with metrics.timer('ner'):` and
+reports LLM token usage with metrics.count(). With ANALYZER_METRICS_ENABLED
+off, timer() returns a shared no-op context manager and count() returns at
+once, so the cost is one settings lookup per call. Cache hit/miss counters
+and store sizes are read from their owners when /metrics is scraped; store
+sizes are running estimates, rescanned from disk at most once a minute. Like
+the cache counters, all numbers are per worker process.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+STAGES = {
+    'upload_write': 'Writing uploads to the job upload directory',
+    'extraction': 'Text extraction from PDF/DOCX bytes, sandbox round trip included',
+    'preprocessing': 'Text normalization (tokenize, stopwords, lemmatize)',
+    'ner': 'spaCy named entity recognition',
+    'similarity': 'TF-IDF and vector similarity',
+    'llm_call': 'Chat completion requests, until the last piece of a streamed reply',
+    'json_parse': 'Parsing LLM replies into result dicts',
+    'pdf_render': 'Rendering PDF reports with xhtml2pdf',
+}
+
+# Upper bounds in seconds; spans spaCy on a short text up to a slow LLM reply
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+COUNTERS = {
+    'analyzer_llm_tokens_total': 'LLM tokens by kind; estimated from the text for streamed replies',
+    'analyzer_llm_errors_total': 'Chat completion requests that raised',
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+_histograms = {}  # stage -> [count per bucket..., +Inf count, sum]
+_counters = {}  # (name, ((label, value), ...)) -> value
+
+
+def enabled():
+    try:
+        return getattr(settings, 'ANALYZER_METRICS_ENABLED', False)
+    except ImproperlyConfigured:  # nlp_processor used outside Django
+        return False
+
+
+def observe(stage, seconds):
+    """Record one duration of a stage"""
+    index = bisect_left(BUCKETS, seconds)
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = [0] * (len(BUCKETS) + 1) + [0.0]
+        histogram[index] += 1
+        histogram[-1] += seconds
+
+
+class _Timer:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.stage, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(stage):
+    """Context manager recording how long its block takes as one observation of stage"""
+    return _Timer(stage) if enabled() else _NULL_TIMER
+
+
+def count(name, amount=1, **labels):
+    """Add amount to a counter from COUNTERS"""
+    if not enabled() or not amount:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def record_usage(response):
+    """Count the tokens of a chat completion response that reports usage"""
+    usage = response.get('usage') or {}
+    for kind in ('prompt', 'completion'):
+        count('analyzer_llm_tokens_total', usage.get(f'{kind}_tokens') or 0, kind=kind)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _cache_samples():
+    """(labels, hits, misses) of every cache with hit counters"""
+    from . import bot
+    from .cache import analysis_cache
+    from .extraction_cache import get_extraction_cache
+
+    samples = [
+        ((('cache', cache.prefix),), cache.hits, cache.misses)
+        for cache in (analysis_cache, bot.context_cache, bot.answer_cache, bot.question_index)
+    ]
+    extraction = get_extraction_cache()
+    if extraction is not None:
+        samples.append(((('cache', 'extraction'),), extraction.hits, extraction.misses))
+    return samples
+
+
+def _store_samples():
+    """(labels, bytes) of the on-disk stores, from their running estimates so a scrape does not walk them"""
+    from .extraction_cache import get_extraction_cache
+    from .reports import get_report_store
+
+    samples = []
+    extraction = get_extraction_cache()
+    if extraction is not None:
+        samples.append(((('store', 'extraction'),), extraction.store.approx_size()))
+    reports = get_report_store()
+    if reports is not None:
+        samples.append(((('store', 'reports'),), reports.approx_size()))
+    return samples
+
+
+def render():
+    """Every metric of this process in the Prometheus text exposition format"""
+    from .models import AnalysisJob, StoredAnalysis
+
+    with _lock:
+        histograms = {stage: list(values) for stage, values in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = [
+        '# HELP analyzer_stage_seconds Time spent in each analysis stage',
+        '# TYPE analyzer_stage_seconds histogram',
+    ]
+    empty = [0] * (len(BUCKETS) + 1) + [0.0]
+    for stage in sorted(set(STAGES) | set(histograms)):
+        values = histograms.get(stage, empty)
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS + ('+Inf',), values):
+            cumulative += bucket_count
+            lines.append(f'analyzer_stage_seconds_bucket{_labels((("stage", stage), ("le", bound)))} {cumulative}')
+        lines.append(f'analyzer_stage_seconds_sum{_labels((("stage", stage),))} {_format_number(values[-1])}')
+        lines.append(f'analyzer_stage_seconds_count{_labels((("stage", stage),))} {cumulative}')
+
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (counter, labels), value in sorted(counters.items()):
+            if counter == name:
+                lines.append(f'{name}{_labels(labels)} {_format_number(value)}')
+
+    lines += ['# HELP analyzer_cache_requests_total Cache lookups by result',
+              '# TYPE analyzer_cache_requests_total counter']
+    for labels, hits, misses in _cache_samples():
+        lines.append(f'analyzer_cache_requests_total{_labels(labels + (("result", "hit"),))} {hits}')
+        lines.append(f'analyzer_cache_requests_total{_labels(labels + (("result", "miss"),))} {misses}')
+
+    lines += ['# HELP analyzer_store_bytes Size of the on-disk caches', '# TYPE analyzer_store_bytes gauge']
+    lines += [f'analyzer_store_bytes{_labels(labels)} {size}' for labels, size in _store_samples()]
+
+    lines += [
+        '# HELP analyzer_stored_analyses Stored analysis results, expired ones included',
+        '# TYPE analyzer_stored_analyses gauge',
+        f'analyzer_stored_analyses {StoredAnalysis.objects.count()}',
+        '# HELP analyzer_queued_jobs Background analysis jobs waiting for a worker',
+        '# TYPE analyzer_queued_jobs gauge',
+        f'analyzer_queued_jobs {AnalysisJob.objects.filter(status=AnalysisJob.STATUS_QUEUED).count()}',
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:00
+
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0003_delete_analysisresult_delete_jobdescription'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredAnalysis',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('single', 'Single resume'), ('comparison', 'Resume comparison')], default='single', max_length=20)),
+                ('payload', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
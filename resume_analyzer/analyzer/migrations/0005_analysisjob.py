@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:30
+
+import django.db.models.deletion
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0004_storedanalysis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('single', 'Single resume'), ('comparison', 'Resume comparison')], default='single', max_length=20)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='queued', max_length=10)),
+                ('job_description', models.TextField()),
+                ('upload_dir', models.CharField(max_length=500)),
+                ('files', models.JSONField(default=list)),
+                ('files_extracted', models.PositiveIntegerField(default=0)),
+                ('files_scored', models.PositiveIntegerField(default=0)),
+                ('insights_generated', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('result', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='analyzer.storedanalysis')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
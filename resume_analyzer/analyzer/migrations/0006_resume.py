@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0005_analysisjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Resume',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('file_name', models.CharField(max_length=255)),
+                ('source_path', models.CharField(blank=True, max_length=1000)),
+                ('text', models.TextField()),
+                ('normalized_text', models.TextField()),
+                ('skills', models.JSONField(default=list)),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('email', models.CharField(blank=True, max_length=254)),
+                ('phone', models.CharField(blank=True, max_length=32)),
+                ('ingested_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
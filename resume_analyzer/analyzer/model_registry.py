@@ -0,0 +1,172 @@
+"""
+Lazy registry for the spaCy and NLTK resources used by the analyzer.
+
+Resources are loaded on first use from the locally installed packages or from
+ANALYZER_NLP_DATA_DIR and are never downloaded at runtime. Call warmup() from
+AppConfig.ready or a gunicorn preload hook to pay the load cost up front.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPACY_MODEL = 'en_core_web_md'
+
+
+class ResourceUnavailable(RuntimeError):
+    """Raised when a spaCy model or NLTK corpus is not installed locally"""
+
+
+_lock = threading.RLock()
+_resources = {}
+_stats = {}
+
+
+def _setting(name, default):
+    """Read an analyzer setting, falling back to the default outside Django"""
+    try:
+        return getattr(settings, name, default)
+    except ImproperlyConfigured:
+        return default
+
+
+def get_data_dir():
+    """Directory holding the offline copies of the NLTK corpora and spaCy models"""
+    return _setting('ANALYZER_NLP_DATA_DIR', None) or os.environ.get('ANALYZER_NLP_DATA_DIR')
+
+
+def _rss_bytes():
+    """Current resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError:
+            return 0
+
+
+def _configure_nltk():
+    """Point NLTK at the local data directory before any corpus is touched"""
+    import nltk
+    data_dir = get_data_dir()
+    if data_dir and data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+
+
+def _load_spacy():
+    import spacy
+    model = _setting('ANALYZER_SPACY_MODEL', DEFAULT_SPACY_MODEL)
+    data_dir = get_data_dir()
+    local_path = os.path.join(data_dir, model) if data_dir else None
+    try:
+        if local_path and os.path.isdir(local_path):
+            return spacy.load(local_path)
+        return spacy.load(model)
+    except OSError as e:
+        raise ResourceUnavailable(
+            f"spaCy model '{model}' is not installed. Install the model package "
+            f"or copy it into the NLP data directory ({data_dir})."
+        ) from e
+
+
+def _load_stopwords():
+    _configure_nltk()
+    from nltk.corpus import stopwords
+    try:
+        return frozenset(stopwords.words('english'))
+    except LookupError as e:
+        raise ResourceUnavailable(f"NLTK 'stopwords' corpus is not installed: {e}") from e
+
+
+def _load_lemmatizer():
+    _configure_nltk()
+    from nltk.stem import WordNetLemmatizer
+    lemmatizer = WordNetLemmatizer()
+    try:
+        # WordNet is a lazy corpus; lemmatize once so the load happens here
+        lemmatizer.lemmatize('skills')
+    except LookupError as e:
+        raise ResourceUnavailable(f"NLTK 'wordnet' corpus is not installed: {e}") from e
+    return lemmatizer
+
+
+def _load_punkt():
+    _configure_nltk()
+    import nltk
+    try:
+        nltk.data.find('tokenizers/punkt_tab/english/')
+    except LookupError as e:
+        raise ResourceUnavailable(f"NLTK 'punkt_tab' tokenizer is not installed: {e}") from e
+    return True
+
+
+# punkt is only needed by the legacy word_tokenize path used in benchmarks
+DEFAULT_RESOURCES = ('spacy', 'stopwords', 'lemmatizer')
+
+LOADERS = {
+    'spacy': _load_spacy,
+    'stopwords': _load_stopwords,
+    'lemmatizer': _load_lemmatizer,
+    'punkt': _load_punkt,
+}
+
+
+def get(name):
+    """Return a loaded resource, loading it on first use"""
+    resource = _resources.get(name)
+    if resource is not None:
+        return resource
+
+    with _lock:
+        if name not in _resources:
+            rss_before = _rss_bytes()
+            start = time.perf_counter()
+            _resources[name] = LOADERS[name]()
+            _stats[name] = {
+                'load_seconds': round(time.perf_counter() - start, 4),
+                'rss_bytes': max(0, _rss_bytes() - rss_before),
+            }
+            logger.info(
+                "Loaded NLP resource %s in %.2fs (+%.1f MiB RSS)",
+                name, _stats[name]['load_seconds'], _stats[name]['rss_bytes'] / 2**20,
+            )
+    return _resources[name]
+
+
+def get_nlp():
+    """The shared spaCy pipeline"""
+    return get('spacy')
+
+
+def get_stopwords():
+    """English stopwords as a frozenset"""
+    return get('stopwords')
+
+
+def get_lemmatizer():
+    """A WordNet lemmatizer with its corpus already loaded"""
+    return get('lemmatizer')
+
+
+def is_loaded(name):
+    return name in _resources
+
+
+def load_stats():
+    """Load time and resident memory delta of every resource loaded so far"""
+    return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def warmup(names=None):
+    """Load resources up front so the first request does not pay for it"""
+    for name in names or DEFAULT_RESOURCES:
+        get(name)
+    return load_stats()
@@ -0,0 +1,82 @@
+import uuid
+
+from django.db import models
+
+
+class StoredAnalysis(models.Model):
+    """A single or multi-resume analysis result, kept until expires_at"""
+    KIND_SINGLE = 'single'
+    KIND_COMPARISON = 'comparison'
+    KIND_CHOICES = [
+        (KIND_SINGLE, 'Single resume'),
+        (KIND_COMPARISON, 'Resume comparison'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_SINGLE)
+    payload = models.TextField()  # Compact JSON of the stored result
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.id}"
+
+
+class AnalysisJob(models.Model):
+    """A queued single or multi-resume analysis, processed by `manage.py run_analysis_workers`"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=StoredAnalysis.KIND_CHOICES, default=StoredAnalysis.KIND_SINGLE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    job_description = models.TextField()
+    upload_dir = models.CharField(max_length=500)
+    files = models.JSONField(default=list)  # [{'name': original name, 'path': stored path}, ...]
+
+    # Progress
+    files_extracted = models.PositiveIntegerField(default=0)
+    files_scored = models.PositiveIntegerField(default=0)
+    insights_generated = models.BooleanField(default=False)
+
+    result = models.ForeignKey(StoredAnalysis, null=True, blank=True, on_delete=models.SET_NULL)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} job {self.id} ({self.status})"
+
+    @property
+    def files_total(self):
+        return len(self.files)
+
+
+class Resume(models.Model):
+    """A resume ingested by `manage.py ingest_resumes`, with its text analysis done once up front"""
+    content_hash = models.CharField(max_length=64, unique=True)  # SHA-256 of the file bytes
+    file_name = models.CharField(max_length=255)
+    source_path = models.CharField(max_length=1000, blank=True)
+    text = models.TextField()
+    normalized_text = models.TextField()  # preprocess_text output
+    skills = models.JSONField(default=list)  # extract_skills output, canonical names
+    name = models.CharField(max_length=255, blank=True)
+    email = models.CharField(max_length=254, blank=True)
+    phone = models.CharField(max_length=32, blank=True)
+    ingested_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name or self.file_name
@@ -1,42 +1,148 @@
+import logging
+import os
 import re
-import nltk
-import spacy
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-from sklearn.feature_extraction.text import TfidfVectorizer
+import threading
+from io import BytesIO
+from functools import cached_property, lru_cache
 from sklearn.metrics.pairwise import cosine_similarity
-from pdfminer.high_level import extract_text
 import docx
+import numpy as np
+import scipy.sparse as sp
 
-# Download necessary NLTK data
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('wordnet')
+from . import metrics, model_registry
+from .pdf_backends import extract_pdf_text
+from .skills import get_skill_matcher
+from .tfidf_index import build_vectorizer, get_tfidf_index
 
-# Load spaCy medium model for improved semantic similarity
-nlp = spacy.load('en_core_web_md')
+logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(pdf_path):
-    """Extract text from PDF file"""
+# Pipeline components each consumer actually needs. Similarity only uses the
+# static word vectors, which are available straight from the tokenizer.
+NER_PIPES = ('tok2vec', 'ner')
+CONTACT_NER_CHARS = 500  # The name is almost always in the first 500 characters
+
+
+def _parse(text, keep_pipes):
+    """Run the shared spaCy pipeline with everything outside keep_pipes disabled"""
+    nlp = model_registry.get_nlp()
+    disabled = [name for name in nlp.pipe_names if name not in keep_pipes]
+    with metrics.timer('ner'):
+        return nlp(text, disable=disabled)
+
+
+class DocumentAnalysis:
+    """
+    Parse a document once and share the results between the analysis steps.
+    Every attribute is computed lazily on first access and then reused.
+    """
+    resume_id = None  # Resume.pk when the document is a stored resume
+
+    def __init__(self, text):
+        self.text = text or ""
+
+    @classmethod
+    def from_resume(cls, resume):
+        """Analysis of a stored Resume that reuses what ingestion computed"""
+        analysis = cls(resume.text)
+        analysis.resume_id = resume.pk
+        analysis.normalized_text = resume.normalized_text
+        analysis.skills = list(resume.skills)
+        analysis.contact_info = {'name': resume.name or None, 'email': resume.email or None,
+                                 'phone': resume.phone or None}
+        return analysis
+
+    @cached_property
+    def ner_doc(self):
+        return _parse(self.text, NER_PIPES)
+
+    @cached_property
+    def normalized_text(self):
+        return preprocess_text(self.text)
+
+    @cached_property
+    def vector_doc(self):
+        # Tokenizer only: Doc.vector averages the static token vectors
+        return model_registry.get_nlp().make_doc(self.normalized_text)
+
+    @cached_property
+    def contact_info(self):
+        return extract_contact_info(self.text, analysis=self)
+
+    @cached_property
+    def skills(self):
+        return extract_skills(self.text, analysis=self)
+
+
+def _as_analysis(text, analysis):
+    return analysis if analysis is not None else DocumentAnalysis(text)
+
+def _extraction_failed(file_format, e):
+    """ExtractionError for a file that could not be read, logged with its cause"""
+    # Imported here because sandbox imports this module
+    from .sandbox import ExtractionError
+
+    logger.warning("Error extracting text from %s: %s", file_format, e)
+    return ExtractionError(ExtractionError.FAILED, f"The file could not be read: {e}")
+
+def extract_text_from_pdf(pdf_file):
+    """Extract text from a PDF file path or binary file-like object; raises ExtractionError if it cannot be read"""
     try:
-        text = extract_text(pdf_path)
-        return text
+        if isinstance(pdf_file, (str, os.PathLike)):
+            with open(pdf_file, 'rb') as stream:
+                data = stream.read()
+        else:
+            data = pdf_file.read()
+        return extract_pdf_text(data)
     except Exception as e:
-        print(f"Error extracting text from PDF: {e}")
-        return ""
+        raise _extraction_failed('PDF', e) from e
+
+def read_docx_text(docx_file):
+    """Text of a DOCX file path or binary file-like object; raises if it cannot be read"""
+    doc = docx.Document(docx_file)
+    return "\n".join([paragraph.text for paragraph in doc.paragraphs])
 
-def extract_text_from_docx(docx_path):
-    """Extract text from DOCX file"""
+def extract_text_from_docx(docx_file):
+    """Extract text from a DOCX file path or binary file-like object; raises ExtractionError if it cannot be read"""
     try:
-        doc = docx.Document(docx_path)
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-        return text
+        return read_docx_text(docx_file)
     except Exception as e:
-        print(f"Error extracting text from DOCX: {e}")
-        return ""
+        raise _extraction_failed('DOCX', e) from e
+
+def detect_format(head):
+    """'pdf' or 'docx' from the first bytes of a file, or None if unsupported"""
+    # PDF readers accept junk before the header, so look a little further than byte 0
+    if b'%PDF-' in head[:1024]:
+        return 'pdf'
+    # DOCX files are ZIP containers
+    if head.startswith(b'PK\x03\x04'):
+        return 'docx'
+    return None
+
+def extract_text_from_stream(stream):
+    """
+    Extract text from a seekable binary stream (e.g. a Django upload) without
+    copying it to disk, or return None for unsupported formats. Raises
+    ExtractionError if the file cannot be read.
+    """
+    stream.seek(0)
+    file_format = detect_format(stream.read(1024))
+    stream.seek(0)
+    if file_format == 'pdf':
+        return extract_text_from_pdf(stream)
+    elif file_format == 'docx':
+        return extract_text_from_docx(stream)
+    return None
 
-def extract_contact_info(text):
+def extract_text_from_bytes(data):
+    """Extract text from the bytes of a PDF/DOCX file, or None for unsupported formats"""
+    return extract_text_from_stream(BytesIO(data))
+
+def extract_text_from_file(file_path):
+    """Extract text from a PDF or DOCX file on disk, or None for unsupported formats"""
+    with open(file_path, 'rb') as stream:
+        return extract_text_from_stream(stream)
+
+def extract_contact_info(text, analysis=None):
     """Extract name, email, and phone number from resume text"""
     contact_info = {
         'name': None,
@@ -62,9 +168,14 @@ def extract_contact_info(text):
         if len(phone) >= 10:
             contact_info['phone'] = phone
     
-    # Try to extract name using spaCy NER
-    doc = nlp(text[:500])  # Limit to first 500 chars where name likely appears
-    person_entities = [ent.text for ent in doc.ents if ent.label_ == 'PERSON']
+    # Try to extract name using spaCy NER, limited to the first 500 chars where name likely appears
+    if analysis is None:
+        analysis = DocumentAnalysis(text[:CONTACT_NER_CHARS])
+    doc = analysis.ner_doc
+    person_entities = [
+        ent.text for ent in doc.ents
+        if ent.label_ == 'PERSON' and ent.end_char <= CONTACT_NER_CHARS
+    ]
     
     # If spaCy found person entities, use the first one as the name
     if person_entities:
@@ -84,59 +195,111 @@ def extract_contact_info(text):
     
     return contact_info
 
+class TextNormalizer:
+    """
+    Reusable text normalizer: lowercase, strip punctuation and digits, drop
+    stopwords and lemmatize. Regexes and the stopword set are built once and
+    lemmas are memoized, since resume vocabulary is highly repetitive.
+    """
+    CLEAN_RE = re.compile(r'[^\w\s]|\d+')
+    # Once punctuation and digits are gone, NLTK's word_tokenize only differs from
+    # str.split() by splitting these informal contractions. The patterns are its
+    # own: 'wanna' is only split before whitespace.
+    CONTRACTIONS = [re.compile(pattern) for pattern in (
+        r'\b(can)(not)\b',
+        r'\b(gim)(me)\b',
+        r'\b(gon)(na)\b',
+        r'\b(got)(ta)\b',
+        r'\b(lem)(me)\b',
+        r'\b(wan)(na)(?=\s)',
+    )]
+
+    def __init__(self, stop_words=None, lemmatizer=None, lemma_cache_size=50000):
+        if stop_words is None:
+            stop_words = model_registry.get_stopwords()
+        if lemmatizer is None:
+            lemmatizer = model_registry.get_lemmatizer()
+        self.stop_words = frozenset(stop_words)
+        self._lemmatize = lru_cache(maxsize=lemma_cache_size)(lemmatizer.lemmatize)
+
+    def tokenize(self, text):
+        # word_tokenize pads the text with a space on each side before applying the patterns
+        text = ' ' + self.CLEAN_RE.sub(' ', text.lower()) + ' '
+        for pattern in self.CONTRACTIONS:
+            text = pattern.sub(r' \1 \2 ', text)
+        return text.split()
+
+    def normalize(self, text):
+        stop_words = self.stop_words
+        lemmatize = self._lemmatize
+        return ' '.join(lemmatize(token) for token in self.tokenize(text) if token not in stop_words)
+
+    def normalize_many(self, texts):
+        return [self.normalize(text) for text in texts]
+
+    def cache_info(self):
+        return self._lemmatize.cache_info()
+
+
+_normalizer = None
+_normalizer_lock = threading.Lock()
+
+
+def get_normalizer():
+    """The process-wide TextNormalizer"""
+    global _normalizer
+    if _normalizer is None:
+        with _normalizer_lock:
+            if _normalizer is None:
+                _normalizer = TextNormalizer()
+    return _normalizer
+
 def preprocess_text(text):
     """Clean and preprocess text"""
-    text = text.lower()
-    text = re.sub(r'[^\w\s]', ' ', text)
-    text = re.sub(r'\d+', ' ', text)
-    
-    tokens = word_tokenize(text)
-    stop_words = set(stopwords.words('english'))
-    tokens = [token for token in tokens if token not in stop_words]
-    
-    lemmatizer = WordNetLemmatizer()
-    tokens = [lemmatizer.lemmatize(token) for token in tokens]
-    
-    preprocessed_text = ' '.join(tokens)
-    return preprocessed_text
-
-def extract_skills(text):
-    """Extract skills from text using a predefined skills database and spaCy NER"""
-    skills_db = [
-        'python', 'java', 'javascript', 'html', 'css', 'sql', 'nosql', 'mongodb',
-        'react', 'angular', 'vue', 'node', 'express', 'django', 'flask', 'spring',
-        'aws', 'azure', 'gcp', 'docker', 'kubernetes', 'terraform', 'jenkins',
-        'git', 'agile', 'scrum', 'kanban', 'jira', 'confluence', 'bitbucket',
-        'machine learning', 'artificial intelligence', 'data science', 'nlp',
-        'deep learning', 'computer vision', 'statistics', 'data analysis',
-        'leadership', 'communication', 'teamwork', 'problem solving', 'critical thinking'
-        
-    ]
-    
-    text = text.lower()
-    found_skills = []
-    for skill in skills_db:
-        if re.search(r'\b' + re.escape(skill) + r'\b', text):
-            found_skills.append(skill)
+    normalizer = get_normalizer()
+    with metrics.timer('preprocessing'):
+        return normalizer.normalize(text)
+
+def extract_skills(text, analysis=None):
+    """Extract skills from text using the skills taxonomy and spaCy NER"""
+    matcher = get_skill_matcher()
+    found_skills = matcher.find(text)
     
-    doc = nlp(text)
+    doc = _as_analysis(text, analysis).ner_doc
     for ent in doc.ents:
-        if ent.label_ in ['ORG', 'PRODUCT'] and ent.text.lower() not in found_skills:
-            if len(ent.text) > 2 and not ent.text.isdigit():
-                found_skills.append(ent.text.lower())
+        if ent.label_ in ['ORG', 'PRODUCT'] and len(ent.text) > 2 and not ent.text.isdigit():
+            # Entities that are taxonomy aliases are reported under their canonical name
+            skill = matcher.canonical(ent.text) or ent.text.lower()
+            if skill not in found_skills:
+                found_skills.append(skill)
     
     return found_skills
 
+def tfidf_similarity(preprocessed_resume, preprocessed_job):
+    """TF-IDF cosine similarity, using the corpus model when one has been fitted"""
+    index = get_tfidf_index()
+    if index is not None:
+        return index.similarity(preprocessed_resume, preprocessed_job)
+
+    # No corpus model yet: fall back to fitting on the pair itself
+    tfidf_vectorizer = build_vectorizer()
+    try:
+        tfidf_matrix = tfidf_vectorizer.fit_transform([preprocessed_resume, preprocessed_job])
+    except ValueError:  # Empty vocabulary
+        return 0.0
+    return cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
+
 def analyze_resume_job_match(resume_text, job_text):
     """Match resume to job description and provide detailed analysis"""
-    # Extract contact information from resume
-    contact_info = extract_contact_info(resume_text)
-    
-    preprocessed_resume = preprocess_text(resume_text)
-    preprocessed_job = preprocess_text(job_text)
+    # Each text is parsed once and shared by every step below
+    resume = DocumentAnalysis(resume_text)
+    job = DocumentAnalysis(job_text)
+
+    preprocessed_resume = resume.normalized_text
+    preprocessed_job = job.normalized_text
     
-    resume_skills = extract_skills(resume_text)
-    job_skills = extract_skills(job_text)
+    resume_skills = resume.skills
+    job_skills = job.skills
     
     matched_skills = [skill for skill in resume_skills if skill in job_skills]
     missing_skills = [skill for skill in job_skills if skill not in resume_skills]
@@ -146,20 +309,26 @@ def analyze_resume_job_match(resume_text, job_text):
     else:
         skill_match_percentage = 0
     
-    # TF–IDF semantic similarity using bi-grams
-    tfidf_vectorizer = TfidfVectorizer(ngram_range=(1,2), stop_words='english')
-    tfidf_matrix = tfidf_vectorizer.fit_transform([preprocessed_resume, preprocessed_job])
-    cosine_sim = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-    tfidf_sim_percentage = cosine_sim * 100
+    resume_vector, job_vector = resume.vector_doc, job.vector_doc
+    with metrics.timer('similarity'):
+        # TF–IDF semantic similarity using bi-grams
+        tfidf_sim_percentage = tfidf_similarity(preprocessed_resume, preprocessed_job) * 100
 
-    # spaCy semantic similarity
-    doc_resume = nlp(preprocessed_resume)
-    doc_job = nlp(preprocessed_job)
-    spacy_sim_percentage = doc_resume.similarity(doc_job) * 100
+        # spaCy semantic similarity
+        spacy_sim_percentage = resume_vector.similarity(job_vector) * 100
 
     # Combined semantic similarity (weighted equally here)
     semantic_match_percentage = (tfidf_sim_percentage + spacy_sim_percentage) / 2
     
+    # Final match percentage: 60% skills, 40% semantic (you can tune these weights)
+    return _match_result(resume, job, matched_skills, missing_skills,
+                         skill_match_percentage, semantic_match_percentage)
+
+def _match_result(resume, job, matched_skills, missing_skills, skill_match_percentage, semantic_match_percentage):
+    """Build the analysis result dict shared by single and batch matching"""
+    preprocessed_resume = resume.normalized_text
+    preprocessed_job = job.normalized_text
+
     recommendations = []
     if missing_skills:
         recommendations.append(f"Consider adding these skills to your resume: {', '.join(missing_skills)}")
@@ -170,17 +339,109 @@ def analyze_resume_job_match(resume_text, job_text):
     if 'certification' in preprocessed_job and 'certification' not in preprocessed_resume:
         recommendations.append("The job posting mentions certifications. Consider adding relevant certifications to your resume.")
     
-    # Final match percentage: 60% skills, 40% semantic (you can tune these weights)
     final_match_percentage = (skill_match_percentage * 0.6) + (semantic_match_percentage * 0.4)
     
     result = {
-        'match_percentage': round(final_match_percentage, 2),
-        'skill_match_percentage': round(skill_match_percentage, 2),
-        'semantic_match_percentage': round(semantic_match_percentage, 2),
+        'match_percentage': round(float(final_match_percentage), 2),
+        'skill_match_percentage': round(float(skill_match_percentage), 2),
+        'semantic_match_percentage': round(float(semantic_match_percentage), 2),
         'matched_skills': matched_skills,
         'missing_skills': missing_skills,
         'recommendations': recommendations,
-        'contact_info': contact_info  # Add contact info to the result
+        'contact_info': resume.contact_info  # Add contact info to the result
     }
     
-    return result
\ No newline at end of file
+    return result
+
+def top_k_indices(scores, k=None):
+    """Indices of the k highest scores, best first, without a full sort when k is small"""
+    scores = np.asarray(scores, dtype=float)
+    if k is None or k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.zeros(0, dtype=int)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best], kind='stable')]
+
+def _as_documents(texts):
+    return [text if isinstance(text, DocumentAnalysis) else DocumentAnalysis(text) for text in texts]
+
+def _cosine_rows(matrix, vector):
+    """Cosine similarity of every row of a dense matrix with a vector, 0 for zero vectors"""
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+    dots = matrix @ vector
+    return np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+
+def rank_resumes(job_text, resumes, top_k=None):
+    """
+    Score one job description against many resumes with matrix operations and
+    return [(position in resumes, analysis result), ...] for the top_k best, best first.
+    Resumes and the job may be raw texts or already-extracted DocumentAnalysis objects;
+    stored resumes (DocumentAnalysis.from_resume) are scored with their indexed TF-IDF rows.
+    """
+    job = job_text if isinstance(job_text, DocumentAnalysis) else DocumentAnalysis(job_text)
+    resumes = _as_documents(resumes)
+    if not resumes:
+        return []
+
+    # Skill overlap: binary resumes x job-skills matrix, row sums are the matched counts
+    job_skills = job.skills
+    job_skill_index = {skill: column for column, skill in enumerate(job_skills)}
+    rows, columns = [], []
+    for row, resume in enumerate(resumes):
+        for skill in resume.skills:
+            column = job_skill_index.get(skill)
+            if column is not None:
+                rows.append(row)
+                columns.append(column)
+    skill_matrix = sp.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)), shape=(len(resumes), len(job_skills))
+    )
+    skill_matrix.data[:] = 1  # A skill can be reported twice (taxonomy and NER)
+    if job_skills:
+        skill_scores = np.asarray(skill_matrix.sum(axis=1)).ravel() / len(job_skills) * 100
+    else:
+        skill_scores = np.zeros(len(resumes))
+
+    # Normalize outside the timer so it measures only the similarity math
+    resume_texts = [resume.normalized_text for resume in resumes]
+    normalized_job = job.normalized_text
+    resume_docs = [resume.vector_doc for resume in resumes]
+    job_doc = job.vector_doc
+    with metrics.timer('similarity'):
+        # TF-IDF cosine: one sparse matrix-vector product; stored resumes use their indexed rows
+        index = get_tfidf_index()
+        if index is not None:
+            resume_vectors = index.vectors([resume.resume_id for resume in resumes], resume_texts)
+            job_vector = index.transform([normalized_job])
+        else:
+            vectorizer = build_vectorizer()
+            try:
+                vectorizer.fit(resume_texts + [normalized_job])
+                resume_vectors = vectorizer.transform(resume_texts)
+                job_vector = vectorizer.transform([normalized_job])
+            except ValueError:  # Empty vocabulary
+                resume_vectors = job_vector = None
+        if resume_vectors is not None:
+            tfidf_scores = np.asarray((resume_vectors @ job_vector.T).todense()).ravel() * 100
+        else:
+            tfidf_scores = np.zeros(len(resumes))
+
+        # spaCy vector similarity: stacked document vectors against the job vector
+        resume_matrix = np.vstack([doc.vector for doc in resume_docs])
+        spacy_scores = _cosine_rows(resume_matrix, job_doc.vector) * 100
+
+    semantic_scores = (tfidf_scores + spacy_scores) / 2
+    final_scores = skill_scores * 0.6 + semantic_scores * 0.4
+
+    ranked = []
+    for position in top_k_indices(final_scores, top_k):
+        resume = resumes[position]
+        resume_skills = resume.skills
+        matched_skills = [skill for skill in resume_skills if skill in job_skill_index]
+        missing_skills = [skill for skill in job_skills if skill not in resume_skills]
+        ranked.append((int(position), _match_result(
+            resume, job, matched_skills, missing_skills,
+            skill_scores[position], semantic_scores[position],
+        )))
+    return ranked
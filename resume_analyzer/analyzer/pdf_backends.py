@@ -0,0 +1,103 @@
+"""
+PDF text extraction backends.
+
+pypdf is tried first because it is several times faster than pdfminer's
+layout analysis, and the page count comes from the same parse. pdfminer is
+only used when the fast result looks empty or garbled; for long documents the
+sandbox splits its pages into ranges across the extraction workers (see
+pdfminer_pages). Every page is extracted: uploads with more than
+ANALYZER_PDF_MAX_PAGES pages are rejected by the sandbox before they get here.
+"""
+import logging
+import re
+from io import BytesIO
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PypdfBackend:
+    name = 'pypdf'
+
+    def read(self, data, max_pages=None):
+        """(text, page count) from a single parse; the text is None past max_pages"""
+        from pypdf import PdfReader
+        pages = PdfReader(BytesIO(data)).pages
+        if max_pages is not None and len(pages) > max_pages:
+            return None, len(pages)
+        return '\n'.join(page.extract_text() or '' for page in pages), len(pages)
+
+
+class PdfminerBackend:
+    name = 'pdfminer'
+
+    def page_count(self, data):
+        from pdfminer.pdfpage import PDFPage
+        return sum(1 for _page in PDFPage.get_pages(BytesIO(data)))
+
+    def read(self, data, max_pages=None):
+        page_count = self.page_count(data)
+        if max_pages is not None and page_count > max_pages:
+            return None, page_count
+        return self.extract(data), page_count
+
+    def extract(self, data, page_numbers=None):
+        """Text of the given zero-based pages, or every page; each page ends with a form feed"""
+        from pdfminer.high_level import extract_text
+        return extract_text(BytesIO(data), page_numbers=page_numbers)
+
+
+BACKENDS = {backend.name: backend for backend in (PypdfBackend(), PdfminerBackend())}
+
+# Signs of a failed text layer: unmapped glyphs and replacement characters
+_GARBAGE_RE = re.compile(r'\(cid:\d+\)|\ufffd|[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def looks_garbled(text, page_count):
+    """Whether extracted text is too sparse or noisy to trust"""
+    stripped = text.strip()
+    if len(stripped) < 10 * max(page_count, 1):  # Well under a line of text per page
+        return True
+    garbage = sum(len(match) for match in _GARBAGE_RE.findall(stripped))
+    letters = sum(char.isalpha() for char in stripped)
+    return garbage / len(stripped) > 0.05 or letters / len(stripped) < 0.4
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def fast_extract(data, max_pages=None):
+    """
+    (text, page count) from one parse with the fast backend. The text is None
+    past max_pages or when it looks garbled, and both are None when the fast
+    backend cannot parse the file.
+    """
+    try:
+        text, page_count = BACKENDS[_setting('ANALYZER_PDF_FAST_BACKEND', 'pypdf')].read(data, max_pages)
+    except Exception as e:
+        logger.warning("Fast PDF backend failed, falling back to pdfminer: %s", e)
+        return None, None
+    if text is not None and looks_garbled(text, page_count):
+        return None, page_count
+    return text, page_count
+
+
+def pdfminer_pages(data, page_numbers=None):
+    """pdfminer text of some pages; the texts of consecutive page ranges join with ''"""
+    return BACKENDS['pdfminer'].extract(data, page_numbers)
+
+
+def page_ranges(page_count, chunks):
+    """Split page numbers into at most `chunks` consecutive ranges"""
+    size = -(-page_count // max(1, chunks))
+    return [list(range(start, min(start + size, page_count))) for start in range(0, page_count, size)]
+
+
+def extract_pdf_text(data):
+    """Extract text from PDF bytes with the fast backend, falling back to pdfminer"""
+    text, _page_count = fast_extract(data)
+    if text is not None:
+        return text
+    return pdfminer_pages(data)
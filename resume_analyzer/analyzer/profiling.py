@@ -0,0 +1,195 @@
+"""
+Opt-in request profiling for the running service.
+
+With ANALYZER_PROFILING_ENABLED on, ProfilingMiddleware profiles a request
+when it carries a valid X-Analyzer-Profile header (minted by
+`manage.py profile_token`), when a staff user adds ?profile=cpu, memory or
+all, or at random for ANALYZER_PROFILING_SAMPLE_RATE of the traffic. CPU
+profiles are cProfile .prof files and memory profiles tracemalloc snapshots,
+kept in ANALYZER_PROFILING_DIR up to ANALYZER_PROFILING_MAX_FILES. Only one
+request is profiled at a time per process; others run unprofiled. The
+profile covers the thread that runs the view until it returns, so the body
+of a streaming response and async views under ASGI are not included.
+"""
+import cProfile
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core import signing
+
+HEADER = 'X-Analyzer-Profile'
+QUERY_PARAM = 'profile'
+MODES = ('cpu', 'memory', 'all')
+SIGNING_SALT = 'analyzer.profiling'
+
+CPU_SUFFIX = '.prof'
+MEMORY_SUFFIX = '.tracemalloc'
+
+# Code the profile view shows by default; other frames are hidden unless asked for
+FOCUS_MODULES = ('analyzer/nlp_processor.py', 'analyzer/views.py')
+
+_active = threading.Lock()
+_NAME_RE = re.compile(r'[^A-Za-z0-9_-]+')
+
+
+def enabled():
+    return getattr(settings, 'ANALYZER_PROFILING_ENABLED', False)
+
+
+def get_profile_dir():
+    return getattr(settings, 'ANALYZER_PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def sign_token(mode='cpu'):
+    """Header value that turns on profiling for a request until it expires"""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(mode)
+
+
+def token_mode(token):
+    """The mode a header token asks for, or None if it is forged or expired"""
+    max_age = getattr(settings, 'ANALYZER_PROFILING_TOKEN_MAX_AGE', 3600)
+    try:
+        mode = signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    return mode if mode in MODES else None
+
+
+def requested_mode(request):
+    """'cpu', 'memory' or 'all' if this request should be profiled, else None"""
+    token = request.headers.get(HEADER)
+    if token:
+        return token_mode(token)
+
+    mode = request.GET.get(QUERY_PARAM)
+    if mode:
+        user = getattr(request, 'user', None)
+        is_staff = user is not None and user.is_active and user.is_staff
+        return mode if is_staff and mode in MODES else None
+
+    sample_rate = getattr(settings, 'ANALYZER_PROFILING_SAMPLE_RATE', 0.0)
+    if sample_rate and random.random() < sample_rate:
+        mode = getattr(settings, 'ANALYZER_PROFILING_SAMPLE_MODE', 'cpu')
+        return mode if mode in MODES else None
+    return None
+
+
+def profile_name(request, seconds):
+    """Sortable file name stem: start time, method, path and duration"""
+    path = _NAME_RE.sub('_', request.path.strip('/')) or 'index'
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{path[:60]}-{int(seconds * 1000)}ms"
+
+
+def prune(directory, max_files):
+    """Delete the oldest profiles beyond max_files"""
+    entries = sorted(os.scandir(directory), key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[max_files:]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+class ProfilingMiddleware:
+    """Profile selected requests with cProfile and/or tracemalloc"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not enabled():
+            return self.get_response(request)
+        mode = requested_mode(request)
+        # cProfile and tracemalloc are process-wide; never profile two requests at once
+        if mode is None or not _active.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request, mode)
+        finally:
+            _active.release()
+
+    def profile(self, request, mode):
+        profiler = cProfile.Profile() if mode in ('cpu', 'all') else None
+        started_tracing = mode in ('memory', 'all') and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(getattr(settings, 'ANALYZER_PROFILING_TRACEMALLOC_FRAMES', 10))
+
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            seconds = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot() if mode in ('memory', 'all') else None
+            if started_tracing:
+                tracemalloc.stop()
+
+        directory = get_profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        name = profile_name(request, seconds)
+        if profiler is not None:
+            profiler.dump_stats(os.path.join(directory, name + CPU_SUFFIX))
+        if snapshot is not None:
+            snapshot.dump(os.path.join(directory, name + MEMORY_SUFFIX))
+        prune(directory, getattr(settings, 'ANALYZER_PROFILING_MAX_FILES', 200))
+
+        response[HEADER] = name
+        return response
+
+
+def list_profiles():
+    """[{'name', 'kind', 'size', 'modified'}] of the stored profiles, newest first"""
+    directory = get_profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in os.scandir(directory):
+        for kind, suffix in (('cpu', CPU_SUFFIX), ('memory', MEMORY_SUFFIX)):
+            if entry.name.endswith(suffix):
+                stat = entry.stat()
+                profiles.append({'name': entry.name, 'kind': kind, 'size': stat.st_size, 'modified': stat.st_mtime})
+    return sorted(profiles, key=lambda profile: profile['modified'], reverse=True)
+
+
+def profile_path(file_name):
+    """Path of a stored profile, or None for names that are not plain profile file names"""
+    if os.path.basename(file_name) != file_name or not file_name.endswith((CPU_SUFFIX, MEMORY_SUFFIX)):
+        return None
+    path = os.path.join(get_profile_dir(), file_name)
+    return path if os.path.isfile(path) else None
+
+
+def top_functions(path, limit=40, focus=FOCUS_MODULES):
+    """Functions of a cProfile dump by cumulative time, only from focus modules unless focus is empty"""
+    stats = pstats.Stats(path).stats
+    rows = []
+    for (file_name, line, function), (_primitive_calls, calls, total, cumulative, _callers) in stats.items():
+        if focus and not file_name.replace(os.sep, '/').endswith(focus):
+            continue
+        rows.append({
+            'function': function,
+            'location': f"{file_name}:{line}",
+            'calls': calls,
+            'total_seconds': round(total, 4),
+            'cumulative_seconds': round(cumulative, 4),
+        })
+    rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+    return rows[:limit]
+
+
+def top_allocations(path, limit=40):
+    """Source lines of a tracemalloc snapshot by allocated size"""
+    snapshot = tracemalloc.Snapshot.load(path)
+    return [
+        {'location': str(stat.traceback[0]), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+        for stat in snapshot.statistics('lineno')[:limit]
+    ]
@@ -0,0 +1,137 @@
+"""
+Token-budgeted compaction of resume and job description text for LLM prompts.
+
+Extracted text carries whitespace runs, page headers and footers repeated on
+every page, and duplicated lines, all of which cost input tokens without
+helping the model. compact_pair() strips that noise and, when the pair is
+still over ANALYZER_PROMPT_TOKEN_BUDGET, keeps whole sections in priority
+order (skills and experience first) until the budget is spent.
+"""
+import logging
+import re
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Close enough to OpenAI's tokenizers for English prose to budget with
+CHARS_PER_TOKEN = 4
+
+_SPACE_RE = re.compile(r'[^\S\n]+')
+_BOILERPLATE_RE = re.compile(
+    r'^(?:page\s*\d+(?:\s*(?:of|/)\s*\d+)?|\d{1,3}(?:\s*/\s*\d{1,3})?|-\s*\d+\s*-|curriculum vitae|resume|'
+    r'confidential|references (?:are )?available (?:up)?on request\.?)$',
+    re.IGNORECASE,
+)
+
+# Section kinds in the order they are kept when text has to be truncated
+SECTIONS = (
+    ('skills', ('skills', 'technical skills', 'core skills', 'technologies', 'tech stack', 'tools',
+                'competencies', 'core competencies')),
+    ('experience', ('experience', 'work experience', 'professional experience', 'employment',
+                    'employment history', 'work history', 'projects')),
+    ('requirements', ('requirements', 'qualifications', 'responsibilities', 'what you will do',
+                      "what you'll do", 'must have', 'nice to have', 'preferred qualifications')),
+    ('header', ()),  # Lines before the first heading: name and contact details
+    ('summary', ('summary', 'profile', 'objective', 'about', 'about me', 'about us', 'overview')),
+    ('education', ('education', 'certifications', 'certificates', 'training')),
+    ('other', ()),
+)
+_PRIORITY = {kind: rank for rank, (kind, _headings) in enumerate(SECTIONS)}
+_HEADINGS = {heading: kind for kind, headings in SECTIONS for heading in headings}
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def get_token_budget():
+    return getattr(settings, 'ANALYZER_PROMPT_TOKEN_BUDGET', 3000)
+
+
+def clean_lines(text):
+    """Whitespace-normalized lines without blanks, boilerplate or repeats"""
+    lines, seen = [], set()
+    for line in text.splitlines():
+        line = _SPACE_RE.sub(' ', line).strip()
+        key = line.lower()
+        if not line or key in seen or _BOILERPLATE_RE.match(line):
+            continue
+        seen.add(key)
+        lines.append(line)
+    return lines
+
+
+def section_kind(line):
+    """The section a heading line starts, or None if the line is not a heading"""
+    if len(line) > 40:
+        return None
+    return _HEADINGS.get(line.lower().strip(' :'))
+
+
+def split_sections(lines):
+    """[(kind, lines)] in document order; each heading stays with its section"""
+    sections = [('header', [])]
+    for line in lines:
+        kind = section_kind(line)
+        if kind is not None:
+            sections.append((kind, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(kind, section_lines) for kind, section_lines in sections if section_lines]
+
+
+def truncate_sections(lines, budget_tokens):
+    """Keep whole lines, highest-priority sections first, within the budget and in document order"""
+    sections = split_sections(lines)
+    remaining = budget_tokens * CHARS_PER_TOKEN
+    kept = [[] for _section in sections]
+    order = sorted(range(len(sections)), key=lambda index: _PRIORITY[sections[index][0]])
+    for index in order:
+        for line in sections[index][1]:
+            if len(line) + 1 > remaining:
+                # Cut a long line rather than drop it, unless too little is left to matter
+                if remaining >= 80:
+                    kept[index].append(line[:remaining - 1])
+                remaining = 0
+                break
+            kept[index].append(line)
+            remaining -= len(line) + 1
+        if remaining <= 0:
+            break
+    return [line for section_lines in kept for line in section_lines]
+
+
+def compact_text(text, budget_tokens=None):
+    """text without noise, truncated by section to budget_tokens if given"""
+    lines = clean_lines(text)
+    if budget_tokens is not None:
+        lines = truncate_sections(lines, budget_tokens)
+    return '\n'.join(lines)
+
+
+def compact_pair(resume_text, job_text, budget_tokens=None):
+    """
+    Compact a resume and job description to share one token budget. The job
+    description gets at least 40% of it when both are long, and whatever the
+    resume does not need otherwise.
+    """
+    budget = get_token_budget() if budget_tokens is None else budget_tokens
+    resume_lines, job_lines = clean_lines(resume_text), clean_lines(job_text)
+    resume_tokens = estimate_tokens('\n'.join(resume_lines))
+    job_tokens = estimate_tokens('\n'.join(job_lines))
+
+    if resume_tokens + job_tokens > budget:
+        job_budget = min(job_tokens, max(budget * 2 // 5, budget - resume_tokens))
+        resume_lines = truncate_sections(resume_lines, budget - job_budget)
+        job_lines = truncate_sections(job_lines, job_budget)
+    compact_resume, compact_job = '\n'.join(resume_lines), '\n'.join(job_lines)
+
+    logger.info(
+        "Prompt compaction: %d -> %d tokens (resume %d -> %d, job %d -> %d)",
+        estimate_tokens(resume_text) + estimate_tokens(job_text),
+        estimate_tokens(compact_resume) + estimate_tokens(compact_job),
+        estimate_tokens(resume_text), estimate_tokens(compact_resume),
+        estimate_tokens(job_text), estimate_tokens(compact_job),
+    )
+    return compact_resume, compact_job
@@ -0,0 +1,174 @@
+"""
+Rendered PDF reports, cached on disk.
+
+xhtml2pdf rendering costs seconds of CPU and recruiters download the same
+report repeatedly, so every PDF is kept in a size-bounded DiskLRUCache keyed by
+analysis id, resume position and REPORT_TEMPLATE_VERSION. Stored analyses never
+change, so that key doubles as the ETag. With ANALYZER_PRERENDER_REPORTS the
+reports are rendered in a background thread as soon as an analysis is stored,
+and comparisons can be downloaded as one zip streamed while it is built.
+"""
+import io
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.utils.text import get_valid_filename
+from xhtml2pdf import pisa
+
+from . import metrics
+from .cache import content_key
+from .disk_cache import DiskLRUCache
+
+# Bump whenever results_pdf.html or the report context changes
+REPORT_TEMPLATE_VERSION = 'report-v1'
+
+_lock = threading.Lock()
+_store = None
+_prerender_pool = None
+
+
+def report_key(analysis_id, position=None):
+    """Cache key and ETag of the report for an analysis, or one resume of a comparison"""
+    return content_key(REPORT_TEMPLATE_VERSION, str(analysis_id), '' if position is None else str(position))
+
+
+def get_report_store():
+    """The process-wide report store, or None when ANALYZER_REPORT_CACHE_MAX_BYTES is 0"""
+    global _store
+    max_bytes = getattr(settings, 'ANALYZER_REPORT_CACHE_MAX_BYTES', 256 * 2**20)
+    if not max_bytes:
+        return None
+    with _lock:
+        if _store is None:
+            directory = getattr(settings, 'ANALYZER_REPORT_CACHE_DIR',
+                                os.path.join(settings.BASE_DIR, 'cache', 'reports'))
+            _store = DiskLRUCache(directory, max_bytes)
+        return _store
+
+
+def report_context(analysis_id, stored_result, position=None):
+    # Imported here because views imports this module
+    from .views import prepare_chart_data
+
+    if position is None:
+        analysis = stored_result.get('analysis', {})
+        chart_data = stored_result['chart_data']
+    else:
+        analysis = stored_result['analyses'][position]
+        chart_data = prepare_chart_data(analysis)
+    return {
+        'job_description': stored_result['job_description'],
+        'analysis': analysis,
+        'chart_data': chart_data,
+        'analysis_id': analysis_id,
+    }
+
+
+def render_report(context):
+    """PDF bytes of results_pdf.html for the context, or None if xhtml2pdf fails"""
+    with metrics.timer('pdf_render'):
+        html = get_template('analyzer/results_pdf.html').render(context)
+        result = io.BytesIO()
+        pdf = pisa.CreatePDF(io.BytesIO(html.encode("UTF-8")), dest=result)
+    return None if pdf.err else result.getvalue()
+
+
+def open_report(analysis_id, stored_result, position=None):
+    """A binary file object with the report, rendering it on a cache miss, or None if rendering fails"""
+    store = get_report_store()
+    key = report_key(analysis_id, position)
+    if store is not None:
+        path = store.get_path(key)
+        if path is not None:
+            try:
+                return open(path, 'rb')
+            except FileNotFoundError:  # Evicted by another process in between
+                pass
+
+    pdf = render_report(report_context(analysis_id, stored_result, position))
+    if pdf is None:
+        return None
+    if store is not None:
+        store.write(key, pdf)
+    return io.BytesIO(pdf)
+
+
+def report_positions(stored_result):
+    """Positions to render: None for a single analysis, every resume for a comparison"""
+    if 'analyses' in stored_result:
+        return list(range(len(stored_result['analyses'])))
+    return [None]
+
+
+def prerender(analysis_id, stored_result):
+    """Render every report of an analysis that is not cached yet"""
+    store = get_report_store()
+    if store is None:
+        return
+    for position in report_positions(stored_result):
+        if store.get_path(report_key(analysis_id, position)) is None:
+            pdf = render_report(report_context(analysis_id, stored_result, position))
+            if pdf is not None:
+                store.write(report_key(analysis_id, position), pdf)
+
+
+def schedule_prerender(analysis_id, stored_result):
+    """Pre-render the reports in a background thread when ANALYZER_PRERENDER_REPORTS is on"""
+    global _prerender_pool
+    if not getattr(settings, 'ANALYZER_PRERENDER_REPORTS', False) or get_report_store() is None:
+        return
+    with _lock:
+        if _prerender_pool is None:
+            # One thread: rendering is CPU bound and should not compete with requests
+            _prerender_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='analyzer-reports')
+    _prerender_pool.submit(prerender, analysis_id, stored_result)
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only sink for zipfile that hands out what was written so far"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_reports_zip(analysis_id, stored_result, chunk_size=64 * 1024):
+    """
+    Yield a zip of every resume's report in a comparison as it is built. The
+    sink cannot seek, so zipfile writes sizes after each entry and nothing has
+    to be buffered beyond the current chunk.
+    """
+    sink = _ZipStream()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+        for position, analysis in enumerate(stored_result['analyses']):
+            report = open_report(analysis_id, stored_result, position)
+            if report is None:
+                continue
+            file_name = os.path.splitext(analysis.get('file_name') or 'resume')[0]
+            entry_name = f"{position + 1:02d}_{get_valid_filename(file_name) or 'resume'}.pdf"
+            with report, archive.open(entry_name, 'w') as entry:
+                for chunk in iter(lambda: report.read(chunk_size), b''):
+                    entry.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
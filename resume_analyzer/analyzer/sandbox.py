@@ -0,0 +1,247 @@
+"""
+Sandboxed text extraction for untrusted uploads.
+
+PDF and DOCX parsing runs in a multiprocessing pool whose workers have a
+memory limit, and every file gets a wall-clock budget. When a file overruns
+it, the pool is terminated and replaced, so one pathological PDF costs one
+timeout instead of a stuck or bloated web worker. Oversized uploads and PDFs
+with too many pages are rejected before any text is extracted. When a long
+PDF needs the slow pdfminer fallback, its pages are split into ranges that
+the workers extract side by side. Every failure is an ExtractionError whose
+code maps to an HTTP status.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+
+from . import metrics
+from .nlp_processor import detect_format, read_docx_text
+from .pdf_backends import BACKENDS, fast_extract, page_ranges, pdfminer_pages
+
+
+class ExtractionError(Exception):
+    """An upload whose text could not be extracted, with a machine-readable code"""
+
+    TOO_LARGE = 'too_large'
+    TOO_MANY_PAGES = 'too_many_pages'
+    TIMEOUT = 'timeout'
+    MEMORY_LIMIT = 'memory_limit'
+    FAILED = 'failed'
+
+    STATUS = {
+        TOO_LARGE: 413,
+        TOO_MANY_PAGES: 422,
+        TIMEOUT: 422,
+        MEMORY_LIMIT: 422,
+        FAILED: 422,
+    }
+
+    def __init__(self, code, message):
+        # Both go to args so the error survives pickling out of a worker
+        super().__init__(code, message)
+        self.code = code
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+    @property
+    def status(self):
+        return self.STATUS.get(self.code, 422)
+
+
+def max_upload_bytes():
+    return getattr(settings, 'ANALYZER_MAX_UPLOAD_BYTES', 10 * 2**20)
+
+
+def check_upload_size(size):
+    """Raise ExtractionError for uploads over ANALYZER_MAX_UPLOAD_BYTES"""
+    limit = max_upload_bytes()
+    if size > limit:
+        raise ExtractionError(
+            ExtractionError.TOO_LARGE,
+            f"The file is {size / 2**20:.1f} MB; the upload limit is {limit / 2**20:.0f} MB",
+        )
+
+
+def _limit_memory(max_bytes):
+    """Pool initializer capping how much more memory the worker may map"""
+    import resource
+    # A forked worker already maps everything the web process loaded (spaCy
+    # vectors included), so the limit is on top of that rather than absolute
+    with open('/proc/self/statm') as statm:
+        mapped = int(statm.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    resource.setrlimit(resource.RLIMIT_AS, (mapped + max_bytes, mapped + max_bytes))
+
+
+class PdfminerPages:
+    """parse_document's answer for a long PDF whose pdfminer fallback the caller should split"""
+
+    def __init__(self, page_count):
+        self.page_count = page_count
+
+
+def parse_document(data, max_pages, split_pages=0):
+    """
+    Text of a PDF/DOCX file, or None for unsupported formats; runs in a sandbox
+    worker. With split_pages, a PDF of at least that many pages that needs the
+    pdfminer fallback is returned as PdfminerPages instead of being extracted.
+    """
+    try:
+        file_format = detect_format(data[:1024])
+        if file_format == 'pdf':
+            text, pages = fast_extract(data, max_pages)
+            if pages is None:
+                pages = BACKENDS['pdfminer'].page_count(data)
+            if pages > max_pages:
+                raise ExtractionError(
+                    ExtractionError.TOO_MANY_PAGES, f"The PDF has {pages} pages; the limit is {max_pages}"
+                )
+            if text is not None:
+                return text
+            if split_pages and pages >= split_pages:
+                return PdfminerPages(pages)
+            return pdfminer_pages(data)
+        if file_format == 'docx':
+            return read_docx_text(BytesIO(data))
+        return None
+    except ExtractionError:
+        raise
+    except MemoryError:
+        raise ExtractionError(ExtractionError.MEMORY_LIMIT, 'The file needs more memory than extraction may use')
+    except Exception as e:
+        raise ExtractionError(ExtractionError.FAILED, f"The file could not be read: {e}")
+
+
+def parse_pdf_pages(data, page_numbers):
+    """pdfminer text of some pages of a PDF; runs in a sandbox worker"""
+    try:
+        return pdfminer_pages(data, page_numbers)
+    except MemoryError:
+        raise ExtractionError(ExtractionError.MEMORY_LIMIT, 'The file needs more memory than extraction may use')
+    except Exception as e:
+        raise ExtractionError(ExtractionError.FAILED, f"The file could not be read: {e}")
+
+
+class Sandbox:
+    """A restartable pool of memory-limited extraction workers"""
+
+    def __init__(self, processes, memory_limit, timeout, max_tasks_per_child=None):
+        self.processes = processes
+        self.memory_limit = memory_limit
+        self.timeout = timeout
+        self.max_tasks_per_child = max_tasks_per_child
+        self._pool = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _current(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(
+                    self.processes, initializer=_limit_memory, initargs=(self.memory_limit,),
+                    maxtasksperchild=self.max_tasks_per_child,
+                )
+            return self._pool, self._generation
+
+    def restart(self, generation):
+        """Kill the pool if it is still the one that ran the given generation's tasks"""
+        with self._lock:
+            if generation != self._generation or self._pool is None:
+                return
+            pool, self._pool = self._pool, None
+            self._generation += 1
+        pool.terminate()
+
+    def call(self, func, *args):
+        """func(*args) in a worker, raising ExtractionError on failure or timeout"""
+        for attempt in range(2):
+            pool, generation = self._current()
+            pending = pool.apply_async(func, args)
+            deadline = time.monotonic() + self.timeout
+            # Wait in slices so a restart caused by another file is noticed promptly
+            while not pending.ready() and self._generation == generation:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.restart(generation)
+                    raise ExtractionError(
+                        ExtractionError.TIMEOUT, f"Extraction took longer than {self.timeout}s"
+                    )
+                pending.wait(min(remaining, 0.5))
+
+            if pending.ready():
+                try:
+                    return pending.get()
+                except ExtractionError:
+                    raise
+                except Exception as e:
+                    raise ExtractionError(ExtractionError.FAILED, f"The file could not be read: {e}")
+            # Another file's timeout terminated this task along with the pool; retry once
+
+        raise ExtractionError(ExtractionError.FAILED, 'The extraction worker was restarted')
+
+    def map(self, func, arg_tuples):
+        """[func(*args) for each args tuple], run side by side in the workers"""
+        with ThreadPoolExecutor(max_workers=len(arg_tuples)) as threads:
+            return list(threads.map(lambda args: self.call(func, *args), arg_tuples))
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.terminate()
+
+
+_sandbox = None
+_sandbox_lock = threading.Lock()
+
+
+def get_sandbox():
+    """
+    The process-wide sandbox, or None to extract in this process: when
+    ANALYZER_EXTRACTION_SANDBOX or ANALYZER_EXTRACTION_WORKERS disables it, or
+    inside a daemonic process, which may not start a pool of its own
+    """
+    from .execution import extraction_workers
+
+    global _sandbox
+    if (not getattr(settings, 'ANALYZER_EXTRACTION_SANDBOX', True) or extraction_workers() <= 0
+            or multiprocessing.current_process().daemon):
+        return None
+    with _sandbox_lock:
+        if _sandbox is None:
+            _sandbox = Sandbox(
+                extraction_workers(),
+                memory_limit=getattr(settings, 'ANALYZER_EXTRACTION_MEMORY_LIMIT', 1024 * 2**20),
+                timeout=getattr(settings, 'ANALYZER_EXTRACTION_TIMEOUT', 30),
+                max_tasks_per_child=getattr(settings, 'ANALYZER_EXTRACTION_MAX_TASKS_PER_CHILD', 100),
+            )
+        return _sandbox
+
+
+def extract(data):
+    """
+    Text of PDF/DOCX file bytes, or None for unsupported formats. Raises
+    ExtractionError when the file is too large, too long, too slow or unreadable.
+    """
+    check_upload_size(len(data))
+    if detect_format(data[:1024]) is None:
+        return None
+
+    max_pages = getattr(settings, 'ANALYZER_PDF_MAX_PAGES', 50)
+    sandbox = get_sandbox()
+    with metrics.timer('extraction'):
+        if sandbox is None:
+            return parse_document(data, max_pages)
+        split_pages = getattr(settings, 'ANALYZER_PDF_PARALLEL_PAGES', 8) if sandbox.processes > 1 else 0
+        result = sandbox.call(parse_document, data, max_pages, split_pages)
+        if isinstance(result, PdfminerPages):
+            # pdfminer ends every page with a form feed, so the ranges join with nothing in between
+            ranges = page_ranges(result.page_count, sandbox.processes)
+            result = ''.join(sandbox.map(parse_pdf_pages, [(data, pages) for pages in ranges]))
+        return result
@@ -0,0 +1,228 @@
+"""
+Scoring backends for resume/job matching, selected with ANALYZER_SCORING_BACKEND.
+
+'llm' asks the chat model for the whole analysis. 'local' runs the spaCy and
+TF-IDF engine in nlp_processor: CPU only, milliseconds per pair and no API
+spend. 'hybrid' keeps the local engine's reproducible scores and skill lists
+and uses the LLM only for the summary and recommendations. Every backend
+returns the keys in RESULT_DEFAULTS, so views, charts and stored results work
+the same whichever one ran.
+"""
+import asyncio
+import copy
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from . import llm, metrics, nlp_processor, prompts
+
+logger = logging.getLogger(__name__)
+
+BACKEND_LOCAL = 'local'
+BACKEND_LLM = 'llm'
+BACKEND_HYBRID = 'hybrid'
+BACKENDS = (BACKEND_LOCAL, BACKEND_LLM, BACKEND_HYBRID)
+
+# The common result schema, with the value used when a backend omits a key
+RESULT_DEFAULTS = {
+    'match_percentage': 0,
+    'matched_skills': [],
+    'missing_skills': [],
+    'skill_match_percentage': 0,
+    'semantic_match_percentage': 0,
+    'summary': '',
+    'recommendations': [],
+    'contact_info': {},
+}
+
+
+def get_backend():
+    backend = getattr(settings, 'ANALYZER_SCORING_BACKEND', BACKEND_LLM)
+    if backend not in BACKENDS:
+        raise ImproperlyConfigured(
+            f"ANALYZER_SCORING_BACKEND must be one of {', '.join(BACKENDS)}, not {backend!r}"
+        )
+    return backend
+
+
+def conform(analysis):
+    """Fill in every key of the common result schema that an analysis lacks"""
+    for key, default in RESULT_DEFAULTS.items():
+        if key not in analysis:
+            analysis[key] = copy.copy(default)
+    return analysis
+
+
+def contract_errors(analysis):
+    """Ways an analysis breaks the common result schema; empty when it conforms"""
+    errors = []
+    for key, default in RESULT_DEFAULTS.items():
+        if key not in analysis:
+            errors.append(f"missing {key}")
+            continue
+        expected = (int, float) if isinstance(default, int) else type(default)
+        if not isinstance(analysis[key], expected) or isinstance(analysis[key], bool):
+            errors.append(f"{key} is {type(analysis[key]).__name__}")
+    return errors
+
+
+def analysis_messages(resume_text, job_text):
+    """Chat messages asking the LLM to analyze a resume/job pair"""
+    # Strip extraction noise and keep the pair within the prompt token budget
+    resume_text, job_text = prompts.compact_pair(resume_text, job_text)
+
+    prompt = f"""
+    You are an AI that evaluates how well a resume matches a job description.
+    Analyze the given resume and job description to provide a comprehensive match analysis.
+    
+    Requirements for JSON response:
+    - match_percentage: Overall match score (0-100%)
+    - matched_skills: List of skills found in the resume
+    - missing_skills: List of skills not found in the resume
+    - skill_match_percentage: Percentage of required skills matched
+    - semantic_match_percentage: Content relevance percentage
+    - summary: Brief overview of the match
+    - recommendations: List of suggestions to improve resume
+    - contact_info: Dictionary with name, email, phone (if available)
+
+    Format your response as a valid JSON object.
+
+    Resume:
+    {resume_text}
+
+    Job Description:
+    {job_text}
+    """
+    return [
+        {"role": "system", "content": "You are an AI resume-job matching expert. Always respond in a valid JSON format."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def parse_analysis_response(result):
+    """Turn the LLM's analysis reply into an analysis dict with every required key"""
+    # Try to parse the JSON, with error handling
+    try:
+        # Parse the JSON, without any leading/trailing code block markers
+        with metrics.timer('json_parse'):
+            analysis = json.loads(llm.strip_code_fence(result))
+        
+        # Ensure all required keys exist
+        return conform(analysis)
+    
+    except json.JSONDecodeError as json_error:
+        # Log the start of the response for debugging; a whole reply would flood the log
+        logger.warning("Could not parse the LLM analysis response (%s): %.500r", json_error, result)
+        return {
+            "error": f"Error parsing OpenAI API response: {json_error}",
+            "raw_response": result,
+            "match_percentage": 0,
+            "matched_skills": [],
+            "missing_skills": [],
+            "skill_match_percentage": 0,
+            "semantic_match_percentage": 0,
+            "summary": "Unable to parse analysis results.",
+            "recommendations": [],
+            "contact_info": {}
+        }
+
+
+def llm_analysis(resume_text, job_text):
+    """Analyze a resume/job pair with the LLM"""
+    try:
+        result = llm.chat_completion(analysis_messages(resume_text, job_text), temperature=0.5)
+    except Exception as e:
+        # Handle any other unexpected errors
+        return failed_analysis(f"OpenAI API error: {str(e)}")
+    return parse_analysis_response(result)
+
+
+def failed_analysis(error):
+    """Analysis placeholder for a resume that could not be analyzed"""
+    return {
+        "error": error,
+        "match_percentage": 0,
+        "matched_skills": [],
+        "missing_skills": [],
+        "skill_match_percentage": 0,
+        "semantic_match_percentage": 0,
+        "summary": "An unexpected error occurred during analysis.",
+        "recommendations": [],
+        "contact_info": {}
+    }
+
+
+
+def local_summary(analysis):
+    """A short summary of a local engine result, like the one the LLM writes"""
+    match = analysis['match_percentage']
+    strength = 'Strong' if match >= 75 else 'Moderate' if match >= 50 else 'Weak'
+    matched, missing = analysis['matched_skills'], analysis['missing_skills']
+    summary = [f"{strength} match ({match:.0f}%)."]
+    if matched or missing:
+        summary.append(f"The resume covers {len(matched)} of the {len(matched) + len(missing)} skills the job asks for")
+        summary[-1] += f"; it is missing {', '.join(missing[:5])}." if missing else "."
+    summary.append(f"Overall content similarity is {analysis['semantic_match_percentage']:.0f}%.")
+    return ' '.join(summary)
+
+
+def local_analysis(resume_text, job_text):
+    """Analyze a resume/job pair with the local NLP engine"""
+    analysis = nlp_processor.analyze_resume_job_match(resume_text, job_text)
+    analysis['summary'] = local_summary(analysis)
+    return conform(analysis)
+
+
+def merge_narrative(analysis, narrative):
+    """Hybrid result: local scores and skills with the LLM's summary and recommendations"""
+    if 'error' in narrative:
+        # Keep the local summary; the caller should not cache this result
+        analysis['llm_error'] = narrative['error']
+        return analysis
+    analysis['summary'] = narrative['summary'] or analysis['summary']
+    analysis['recommendations'] = narrative['recommendations'] or analysis['recommendations']
+    # The LLM reads contact details more reliably than NER does
+    if isinstance(narrative['contact_info'], dict):
+        analysis['contact_info'] = {
+            **analysis['contact_info'], **{key: value for key, value in narrative['contact_info'].items() if value}
+        }
+    return analysis
+
+
+def analyze(resume_text, job_text, backend=None):
+    """Analyze a resume/job pair with the given or configured backend"""
+    backend = backend or get_backend()
+    if backend == BACKEND_LOCAL:
+        analysis = local_analysis(resume_text, job_text)
+    elif backend == BACKEND_LLM:
+        analysis = llm_analysis(resume_text, job_text)
+    else:
+        analysis = merge_narrative(local_analysis(resume_text, job_text), llm_analysis(resume_text, job_text))
+    analysis['scoring_backend'] = backend
+    return analysis
+
+
+async def allm_analysis(resume_text, job_text):
+    """llm_analysis without blocking the event loop"""
+    try:
+        result = await llm.achat_completion(analysis_messages(resume_text, job_text), temperature=0.5)
+    except Exception as e:
+        return failed_analysis(f"OpenAI API error: {str(e)}")
+    return parse_analysis_response(result)
+
+
+async def aanalyze(resume_text, job_text, backend=None):
+    """Async analyze; the local engine runs in a thread, alongside the LLM call for hybrid"""
+    backend = backend or get_backend()
+    if backend == BACKEND_LOCAL:
+        analysis = await asyncio.to_thread(local_analysis, resume_text, job_text)
+    elif backend == BACKEND_LLM:
+        analysis = await allm_analysis(resume_text, job_text)
+    else:
+        analysis = merge_narrative(*await asyncio.gather(
+            asyncio.to_thread(local_analysis, resume_text, job_text), allm_analysis(resume_text, job_text)
+        ))
+    analysis['scoring_backend'] = backend
+    return analysis
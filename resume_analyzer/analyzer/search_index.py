@@ -0,0 +1,428 @@
+"""
+Inverted index and BM25 search over stored resumes.
+
+Each Resume is indexed by the terms of its normalized_text and by its
+skills, as "skill:<name>" terms. Postings live in segments: CSR-style numpy
+arrays (term -> rows and term frequencies) saved as .npz files under
+ANALYZER_SEARCH_INDEX_DIR and listed in manifest.json. New resumes are
+appended as a new segment and deleted or replaced ones are tombstoned, and
+small segments are merged once there are more than MAX_SEGMENTS, so updates
+never rewrite the whole index. Processes reload the manifest when it
+changes, so web workers see what `manage.py ingest_resumes` adds.
+"""
+import fcntl
+import json
+import math
+import os
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+SKILL_PREFIX = 'skill:'
+MANIFEST_FILE = 'manifest.json'
+LOCK_FILE = '.lock'
+
+# Merge small segments once there are more than this many
+MAX_SEGMENTS = 8
+
+# Okapi BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def get_index_dir():
+    return getattr(settings, 'ANALYZER_SEARCH_INDEX_DIR', os.path.join(settings.BASE_DIR, 'search_index'))
+
+
+def document_terms(normalized_text, skills):
+    """(term frequencies, document length) of a resume; skills do not count towards the length"""
+    tokens = normalized_text.split()
+    counts = Counter(tokens)
+    for skill in skills:
+        counts[SKILL_PREFIX + skill] = 1
+    return counts, len(tokens)
+
+
+class Segment:
+    """
+    An immutable batch of indexed resumes. Postings of vocab[t] are
+    rows[indptr[t]:indptr[t + 1]] with frequencies tfs[...]; a row is a
+    position in resume_ids and lengths.
+    """
+
+    def __init__(self, vocab, indptr, rows, tfs, resume_ids, lengths):
+        self.vocab = vocab
+        self.term_index = {term: position for position, term in enumerate(vocab)}
+        self.indptr = indptr
+        self.rows = rows
+        self.tfs = tfs
+        self.resume_ids = resume_ids
+        self.lengths = lengths
+
+    def __len__(self):
+        return len(self.resume_ids)
+
+    @classmethod
+    def build(cls, documents):
+        """Segment of [(resume id, normalized text, skills)]"""
+        postings = defaultdict(list)
+        resume_ids, lengths = [], []
+        for row, (resume_id, normalized_text, skills) in enumerate(documents):
+            counts, length = document_terms(normalized_text, skills)
+            resume_ids.append(resume_id)
+            lengths.append(length)
+            for term, tf in counts.items():
+                postings[term].append((row, tf))
+
+        vocab = sorted(postings)
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(postings[term]) for term in vocab])
+        pairs = [pair for term in vocab for pair in postings[term]]
+        rows = np.array([row for row, _tf in pairs], dtype=np.int32)
+        tfs = np.array([tf for _row, tf in pairs], dtype=np.float32)
+        return cls(vocab, indptr, rows, tfs, np.array(resume_ids, dtype=np.int64),
+                   np.array(lengths, dtype=np.float32))
+
+    @classmethod
+    def merge(cls, segments, dead_masks):
+        """One segment with the live rows of several, built from their arrays without re-tokenizing"""
+        vocab = sorted(set().union(*(segment.vocab for segment in segments)))
+        global_terms = {term: position for position, term in enumerate(vocab)}
+        term_parts, row_parts, tf_parts, id_parts, length_parts = [], [], [], [], []
+        offset = 0
+        for segment, dead in zip(segments, dead_masks):
+            alive = ~dead
+            new_rows = np.cumsum(alive) - 1 + offset  # Only read for live rows
+            local_to_global = np.array([global_terms[term] for term in segment.vocab], dtype=np.int64)
+            posting_terms = np.repeat(local_to_global, np.diff(segment.indptr))
+            keep = alive[segment.rows]
+            term_parts.append(posting_terms[keep])
+            row_parts.append(new_rows[segment.rows[keep]].astype(np.int32))
+            tf_parts.append(segment.tfs[keep])
+            id_parts.append(segment.resume_ids[alive])
+            length_parts.append(segment.lengths[alive])
+            offset += int(alive.sum())
+
+        terms, rows = np.concatenate(term_parts), np.concatenate(row_parts)
+        order = np.lexsort((rows, terms))
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(terms, minlength=len(vocab)))
+        # Terms whose documents were all deleted keep an empty posting list until the next rebuild
+        return cls(vocab, indptr, rows[order], np.concatenate(tf_parts)[order],
+                   np.concatenate(id_parts), np.concatenate(length_parts))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            vocab = arrays['vocab'].tobytes().decode('utf-8').split('\n') if arrays['vocab'].size else []
+            return cls(vocab, arrays['indptr'], arrays['rows'], arrays['tfs'],
+                       arrays['resume_ids'], arrays['lengths'])
+
+    def save(self, path):
+        # Terms never contain newlines, so the vocabulary is stored as one byte string
+        vocab = np.frombuffer('\n'.join(self.vocab).encode('utf-8'), dtype=np.uint8)
+        temp_path = path + '.tmp.npz'
+        np.savez(temp_path, vocab=vocab, indptr=self.indptr, rows=self.rows, tfs=self.tfs,
+                 resume_ids=self.resume_ids, lengths=self.lengths)
+        os.replace(temp_path, path)
+
+    def postings(self, term):
+        """(rows, term frequencies) of a term, or None if no resume in the segment has it"""
+        position = self.term_index.get(term)
+        if position is None:
+            return None
+        start, end = self.indptr[position], self.indptr[position + 1]
+        return self.rows[start:end], self.tfs[start:end]
+
+
+def _segment_version(name):
+    return int(name.split('-')[1].split('.')[0])
+
+
+class SearchIndex:
+    """The segments in a directory, their tombstones, and BM25 search over them"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or get_index_dir()
+        self._segments = {}  # name -> Segment
+        self._dead = {}  # name -> boolean mask of tombstoned rows
+        self._manifest_stamp = None
+        self._lock = threading.RLock()
+
+    # Manifest: {'version': n, 'segments': [names], 'deleted': {resume id: version deleted at}}
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path()) as manifest_file:
+                return json.load(manifest_file)
+        except FileNotFoundError:
+            return {'version': 0, 'segments': [], 'deleted': {}}
+
+    def _write_manifest(self, manifest):
+        temp_path = self._manifest_path() + '.tmp'
+        with open(temp_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, separators=(',', ':'))
+        os.replace(temp_path, self._manifest_path())
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialize writers across processes, then refresh to the latest manifest"""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(os.path.join(self.directory, LOCK_FILE), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield self._load(self._read_manifest())
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def refresh(self):
+        """Reload the manifest if another process changed it; cheap when it did not"""
+        try:
+            stat = os.stat(self._manifest_path())
+            stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            stamp = None
+        with self._lock:
+            if stamp == self._manifest_stamp:
+                return
+            for attempt in range(3):
+                try:
+                    self._load(self._read_manifest())
+                    break
+                except FileNotFoundError:
+                    # A writer merged segments away after we read the manifest; read it again
+                    if attempt == 2:
+                        raise
+            self._manifest_stamp = stamp
+
+    def _load(self, manifest):
+        deleted_ids = np.array([int(resume_id) for resume_id in manifest['deleted']], dtype=np.int64)
+        deleted_at = np.array(list(manifest['deleted'].values()), dtype=np.int64)
+        segments, dead = {}, {}
+        for name in manifest['segments']:
+            segment = self._segments.get(name) or Segment.load(os.path.join(self.directory, name))
+            segments[name] = segment
+            # A tombstone kills the rows of segments written before it
+            killed = deleted_ids[deleted_at >= _segment_version(name)]
+            dead[name] = np.isin(segment.resume_ids, killed)
+        self._segments, self._dead = segments, dead
+        return manifest
+
+    def __len__(self):
+        self.refresh()
+        return sum(int((~dead).sum()) for dead in self._dead.values())
+
+    def indexed_ids(self):
+        """Live resume ids"""
+        self.refresh()
+        return {int(resume_id) for name, segment in self._segments.items()
+                for resume_id in segment.resume_ids[~self._dead[name]]}
+
+    def add(self, documents):
+        """
+        Index [(resume id, normalized text, skills)] as a new segment. Ids that
+        are already indexed are replaced.
+        """
+        documents = list(documents)
+        if not documents:
+            return
+        with self._write_lock() as manifest:
+            ids = np.array([resume_id for resume_id, _text, _skills in documents], dtype=np.int64)
+            version = manifest['version'] + 1
+            for name, segment in self._segments.items():
+                for resume_id in segment.resume_ids[np.isin(segment.resume_ids, ids) & ~self._dead[name]]:
+                    manifest['deleted'][str(resume_id)] = manifest['version']
+
+            name = f'segment-{version:08d}.npz'
+            Segment.build(documents).save(os.path.join(self.directory, name))
+            manifest['version'] = version
+            manifest['segments'].append(name)
+            merged_away = self._merge_small_segments(manifest)
+            self._write_manifest(manifest)
+            self._remove_files(merged_away)
+
+    def delete(self, resume_ids):
+        """Tombstone resumes; their postings are dropped when their segment is next merged"""
+        resume_ids = [int(resume_id) for resume_id in resume_ids]
+        if not resume_ids:
+            return
+        with self._write_lock() as manifest:
+            manifest['version'] += 1
+            for resume_id in resume_ids:
+                manifest['deleted'][str(resume_id)] = manifest['version']
+            self._write_manifest(manifest)
+
+    def rebuild(self, batches):
+        """Replace the whole index with batches of [(resume id, normalized text, skills)]"""
+        with self._write_lock() as manifest:
+            old_segments = manifest['segments']
+            manifest = {'version': manifest['version'], 'segments': [], 'deleted': {}}
+            for documents in batches:
+                manifest['version'] += 1
+                name = f"segment-{manifest['version']:08d}.npz"
+                Segment.build(documents).save(os.path.join(self.directory, name))
+                manifest['segments'].append(name)
+                # Nothing reads the new segments yet, so merged ones can go at once
+                self._remove_files(self._merge_small_segments(manifest))
+            self._write_manifest(manifest)
+            self._remove_files(set(old_segments) - set(manifest['segments']))
+
+    def _merge_small_segments(self, manifest):
+        """
+        Merge every segment but the largest into one when there are too many.
+        The largest one is included once the others outgrow it, so merge cost
+        stays proportional to what is added. Returns the names of the merged
+        segments, whose files the caller removes once the manifest is written.
+        """
+        if len(manifest['segments']) <= MAX_SEGMENTS:
+            return []
+        self._load(manifest)
+        names = sorted(manifest['segments'], key=lambda name: len(self._segments[name]))
+        if len(self._segments[names[-1]]) <= sum(len(self._segments[name]) for name in names[:-1]):
+            merged_names = names
+        else:
+            merged_names = names[:-1]
+
+        merged = Segment.merge([self._segments[name] for name in merged_names],
+                               [self._dead[name] for name in merged_names])
+        manifest['version'] += 1
+        merged_name = f"segment-{manifest['version']:08d}.npz"
+        merged.save(os.path.join(self.directory, merged_name))
+        manifest['segments'] = [name for name in manifest['segments'] if name not in merged_names] + [merged_name]
+        # The merged segment has a newer version than every tombstone, so older
+        # tombstones only matter for segments written before them
+        oldest = min(_segment_version(name) for name in manifest['segments'])
+        manifest['deleted'] = {
+            resume_id: deleted_at for resume_id, deleted_at in manifest['deleted'].items() if deleted_at >= oldest
+        }
+        self._load(manifest)
+        return merged_names
+
+    def _remove_files(self, names):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def search(self, terms, required_skills=(), top_k=10):
+        """
+        [(resume id, BM25 score)] of the top_k resumes for the query terms,
+        best first. With required_skills only resumes having all of them are
+        returned; otherwise only resumes matching at least one term.
+        """
+        self.refresh()
+        with self._lock:
+            segments = [(segment, ~self._dead[name]) for name, segment in self._segments.items()]
+        total = sum(int(alive.sum()) for _segment, alive in segments)
+        if not total or top_k <= 0:
+            return []
+        average_length = max(
+            sum(float(segment.lengths[alive].sum()) for segment, alive in segments) / total, 1.0
+        )
+
+        # Document frequencies count tombstoned rows until they are merged away, as in Lucene
+        terms = set(terms)
+        document_frequency = Counter()
+        for segment, _alive in segments:
+            for term in terms:
+                postings = segment.postings(term)
+                if postings is not None:
+                    document_frequency[term] += len(postings[0])
+        idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+        ids, scores = [], []
+        for segment, alive in segments:
+            candidates = alive.copy()
+            for skill in required_skills:
+                postings = segment.postings(SKILL_PREFIX + skill)
+                has_skill = np.zeros(len(segment), dtype=bool)
+                if postings is not None:
+                    has_skill[postings[0]] = True
+                candidates &= has_skill
+            if not candidates.any():
+                continue
+
+            segment_scores = np.zeros(len(segment), dtype=np.float32)
+            length_norm = K1 * (1 - B + B * segment.lengths / average_length)
+            for term, weight in idf.items():
+                postings = segment.postings(term)
+                if postings is None:
+                    continue
+                rows, tfs = postings
+                # Rows are unique within a posting list, so fancy-index addition is safe
+                segment_scores[rows] += weight * tfs * (K1 + 1) / (tfs + length_norm[rows])
+            if not required_skills:
+                candidates &= segment_scores > 0
+
+            rows = np.flatnonzero(candidates)
+            if len(rows) > top_k:
+                rows = rows[np.argpartition(-segment_scores[rows], top_k - 1)[:top_k]]
+            ids.append(segment.resume_ids[rows])
+            scores.append(segment_scores[rows])
+
+        if not ids:
+            return []
+        ids, scores = np.concatenate(ids), np.concatenate(scores)
+        best = np.argsort(-scores, kind='stable')[:top_k]
+        return [(int(ids[i]), float(scores[i])) for i in best]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """The process-wide index over ANALYZER_SEARCH_INDEX_DIR"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
+
+
+def resume_document(resume):
+    """(resume id, normalized text, skills) of a Resume, as the index stores it"""
+    return resume.pk, resume.normalized_text, resume.skills
+
+
+def index_resumes(resumes):
+    get_search_index().add(resume_document(resume) for resume in resumes)
+
+
+def query_terms(job_text):
+    """Index terms of a job description: its normalized words and its skills"""
+    from .nlp_processor import DocumentAnalysis
+
+    job = DocumentAnalysis(job_text)
+    return set(job.normalized_text.split()) | {SKILL_PREFIX + skill for skill in job.skills}
+
+
+def canonical_skills(skills):
+    """Taxonomy names for skills given by name or alias"""
+    from .skills import get_skill_matcher
+
+    matcher = get_skill_matcher()
+    return [matcher.canonical(skill) or skill.strip().lower() for skill in skills if skill.strip()]
+
+
+def search_resumes(job_text, top_k=10, required_skills=()):
+    """[(resume id, BM25 score)] of the stored resumes best matching a job description"""
+    return get_search_index().search(query_terms(job_text), canonical_skills(required_skills), top_k)
+
+
+def on_resume_saved(sender, instance, raw=False, **kwargs):
+    """post_save receiver: (re)index the resume; loaddata (raw) saves are left to rebuild_search_index"""
+    if not raw and getattr(settings, 'ANALYZER_SEARCH_INDEX_SIGNALS', True):
+        index_resumes([instance])
+
+
+def on_resume_deleted(sender, instance, **kwargs):
+    if getattr(settings, 'ANALYZER_SEARCH_INDEX_SIGNALS', True):
+        get_search_index().delete([instance.pk])
@@ -0,0 +1,125 @@
+"""
+Skills taxonomy and a single-pass skill matcher.
+
+The taxonomy is a JSON object mapping each canonical skill to a list of
+aliases, e.g. {"kubernetes": ["k8s"]}. It is compiled once into a token trie,
+so matching a document costs the same whether the taxonomy holds fifty
+skills or fifty thousand.
+"""
+import json
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(__file__), 'data', 'skills.json')
+
+# Words and individual symbols, so "node.js" and "c++" tokenize the same way in
+# the taxonomy and in the text. Word tokens behave like the old \b...\b regexes.
+TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+_END = None  # Trie key marking the end of a term; tokens are never None
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def tokenize_with_tails(text):
+    """
+    Tokens of text, and the positions of tokens that end a dotted name such
+    as the "js" of "node.js": a word right after a "." that touches the word
+    before it.
+    """
+    tokens, tails = [], set()
+    previous_end, dot_end = None, None
+    for match in TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        if match.start() == dot_end:
+            tails.add(len(tokens))
+        dot_end = match.end() if token == '.' and match.start() == previous_end and tokens else None
+        previous_end = match.end()
+        tokens.append(token)
+    return tokens, tails
+
+
+class SkillMatcher:
+    """Match every taxonomy term in a text in one pass and normalize aliases"""
+
+    def __init__(self, taxonomy):
+        self.skills = list(taxonomy)
+        self._order = {skill: i for i, skill in enumerate(self.skills)}
+        self._terms = {}
+        self._trie = {}
+        for canonical, aliases in taxonomy.items():
+            for term in [canonical, *aliases]:
+                self._add(term, canonical)
+
+    def __len__(self):
+        return len(self._terms)
+
+    def _add(self, term, canonical):
+        tokens = tokenize(term)
+        if not tokens:
+            return
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[_END] = canonical
+        self._terms[' '.join(tokens)] = canonical
+
+    def canonical(self, term):
+        """Canonical skill for a term or alias, or None if it is not in the taxonomy"""
+        return self._terms.get(' '.join(tokenize(term)))
+
+    def find(self, text):
+        """
+        Canonical skills mentioned in text, in taxonomy order. A single word
+        ending a dotted name is not a match on its own, so "node.js" does not
+        mention the "js" alias of javascript.
+        """
+        tokens, tails = tokenize_with_tails(text)
+        trie = self._trie
+        found = set()
+        for start in range(len(tokens)):
+            node = trie.get(tokens[start])
+            position = start + 1
+            while node is not None:
+                canonical = node.get(_END)
+                if canonical is not None and not (position == start + 1 and start in tails):
+                    found.add(canonical)
+                if position == len(tokens):
+                    break
+                node = node.get(tokens[position])
+                position += 1
+        return sorted(found, key=self._order.__getitem__)
+
+
+def load_taxonomy(path):
+    """Read a skills taxonomy file"""
+    with open(path, encoding='utf-8') as taxonomy_file:
+        taxonomy = json.load(taxonomy_file)
+    return {skill.lower(): [alias.lower() for alias in aliases] for skill, aliases in taxonomy.items()}
+
+
+def get_taxonomy_path():
+    try:
+        return getattr(settings, 'ANALYZER_SKILLS_TAXONOMY', None) or DEFAULT_TAXONOMY_PATH
+    except ImproperlyConfigured:
+        return DEFAULT_TAXONOMY_PATH
+
+
+_lock = threading.Lock()
+_matcher = None
+
+
+def get_skill_matcher():
+    """The process-wide matcher, compiled from the taxonomy file on first use"""
+    global _matcher
+    if _matcher is None:
+        with _lock:
+            if _matcher is None:
+                _matcher = SkillMatcher(load_taxonomy(get_taxonomy_path()))
+    return _matcher
@@ -0,0 +1,120 @@
+"""
+Persistent storage for analysis results.
+
+Results are stored as compact JSON in the StoredAnalysis table, so they
+survive restarts and are visible to every worker process. A small in-process
+LRU front cache saves the database round trip for results that are viewed,
+downloaded and questioned repeatedly.
+"""
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import StoredAnalysis
+
+DEFAULT_TTL = timedelta(days=7)
+
+
+def _ttl():
+    seconds = getattr(settings, 'ANALYZER_RESULT_TTL', None)
+    return timedelta(seconds=seconds) if seconds else DEFAULT_TTL
+
+
+def _front_cache_size():
+    return getattr(settings, 'ANALYZER_RESULT_CACHE_SIZE', 256)
+
+
+def dumps(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+class _FrontCache:
+    """Bounded LRU of id -> (kind, expires_at, payload JSON)"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        max_size = _front_cache_size()
+        if max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_front_cache = _FrontCache()
+
+
+def _parse_id(analysis_id):
+    try:
+        return uuid.UUID(str(analysis_id))
+    except ValueError:
+        return None
+
+
+def save_analysis(data, kind=StoredAnalysis.KIND_SINGLE):
+    """Store a result and return its id as a string"""
+    payload = dumps(data)
+    stored = StoredAnalysis.objects.create(kind=kind, payload=payload, expires_at=timezone.now() + _ttl())
+    _front_cache.put(stored.id, (stored.kind, stored.expires_at, payload))
+    return str(stored.id)
+
+
+def load_analysis(analysis_id, kind=None):
+    """
+    Return a fresh copy of a stored result, or None if it does not exist, has
+    expired or is of a different kind. Accepts a UUID or its string form.
+    """
+    key = _parse_id(analysis_id)
+    if key is None:
+        return None
+
+    entry = _front_cache.get(key)
+    if entry is None:
+        stored = StoredAnalysis.objects.filter(pk=key).only('kind', 'expires_at', 'payload').first()
+        if stored is None:
+            return None
+        entry = (stored.kind, stored.expires_at, stored.payload)
+        _front_cache.put(key, entry)
+
+    stored_kind, expires_at, payload = entry
+    if expires_at <= timezone.now():
+        _front_cache.discard(key)
+        return None
+    if kind is not None and stored_kind != kind:
+        return None
+
+    data = json.loads(payload)
+    data['kind'] = stored_kind
+    return data
+
+
+def purge_expired():
+    """Delete expired results, returning how many were removed"""
+    deleted, _ = StoredAnalysis.objects.filter(expires_at__lte=timezone.now()).delete()
+    _front_cache.clear()
+    return deleted
@@ -1,3 +1,709 @@
-from django.test import TestCase
+import json
+import tempfile
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import bot, sandbox, scoring, search_index, views
+from .benchmarks import SAMPLE_JOB, SAMPLE_RESUME, synthetic_pdf
+from .cache import DiskLRUCacheBackend
+from .corpus import generate_corpus
+from .disk_cache import DiskLRUCache
+from .llm_stub import STUB_ANALYSIS, STUB_ANSWER, STUB_INSIGHTS, StubLLMServer
+from .models import StoredAnalysis
+from .nlp_processor import TextNormalizer, extract_text_from_docx, extract_text_from_pdf
+from .pdf_backends import page_ranges, pdfminer_pages
+from .search_index import SKILL_PREFIX, SearchIndex
+from .sandbox import ExtractionError, PdfminerPages, Sandbox, parse_document
+from .tfidf_index import TfidfIndex
+from .storage import load_analysis, save_analysis
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-default'},
+    'analysis': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-analysis'},
+}
+
+# Extract in the test process with no cache on disk, and keep background work out of the way
+TEST_SETTINGS = {
+    'CACHES': TEST_CACHES,
+    'OPENAI_API_KEY': 'stub',
+    'ANALYZER_SCORING_BACKEND': 'llm',
+    'ANALYZER_EXTRACTION_WORKERS': 0,
+    'ANALYZER_EXTRACTION_CACHE_MAX_BYTES': 0,
+    'ANALYZER_BACKGROUND_JOBS': False,
+    'ANALYZER_PRERENDER_REPORTS': False,
+    'ANALYZER_LLM_TIMEOUT': 5,
+}
+
+# Stub latency that overruns TIMEOUT_SETTINGS
+SLOW_LATENCY = 1.0
+TIMEOUT_SETTINGS = {'ANALYZER_LLM_TIMEOUT': 0.25}
+
+
+def resume_uploads(count, pages=1, seed=0):
+    """(job description, [uploaded PDF resumes]) from the synthetic corpus"""
+    corpus = generate_corpus(count, pages=(pages,), formats=('pdf',), seed=seed)
+    return corpus['job'], [
+        SimpleUploadedFile(resume['file_name'], resume['data'], content_type='application/pdf')
+        for resume in corpus['resumes']
+    ]
+
+
+def sse_events(body):
+    """[(event name, data)] of a server-sent event stream"""
+    events = []
+    for block in body.decode('utf-8').split('\n\n'):
+        if not block.strip():
+            continue
+        event, data = 'message', None
+        for line in block.splitlines():
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: '):
+                data = json.loads(line[len('data: '):])
+        events.append((event, data))
+    return events
+
+
+def stored_single_analysis():
+    """Store a single-resume result for the bot to answer questions about, returning its id"""
+    return save_analysis({
+        'job_description': 'Backend engineer with Python, Django and SQL.',
+        'analysis': dict(STUB_ANALYSIS),
+        'chart_data': {},
+    })
+
+
+class StubLLMTestCase(TestCase):
+    """Runs against a local StubLLMServer, reset to answer at once before every test"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = StubLLMServer().start()
+        cls.addClassCleanup(cls.stub.stop)
+
+    def setUp(self):
+        self.stub.configure(latency=0.0, chunk_delay=0.0, status=200)
+        settings_override = override_settings(ANALYZER_LLM_BASE_URL=self.stub.base_url, **TEST_SETTINGS)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Locmem caches outlive the override, so start every test empty
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+
+
+class AsyncViewTests(StubLLMTestCase):
+    """The async/ views against the stub LLM"""
+
+    async def latest_result(self, kind):
+        stored = await StoredAnalysis.objects.filter(kind=kind).order_by('-created_at').afirst()
+        return await sync_to_async(load_analysis)(stored.pk)
+
+    async def post_resume(self, pages=1):
+        job, (resume,) = resume_uploads(1, pages=pages)
+        return await self.async_client.post(
+            reverse('async_analyze'), {'resume': resume, 'job_description': job}
+        )
+
+    async def test_upload_and_analyze(self):
+        response = await self.post_resume()
+        self.assertEqual(response.status_code, 200)
+        analysis = (await self.latest_result(StoredAnalysis.KIND_SINGLE))['analysis']
+        self.assertNotIn('error', analysis)
+        self.assertEqual(analysis['match_percentage'], STUB_ANALYSIS['match_percentage'])
+        self.assertEqual(analysis['matched_skills'], STUB_ANALYSIS['matched_skills'])
+
+    async def test_upload_llm_timeout(self):
+        self.stub.configure(latency=SLOW_LATENCY)
+        with override_settings(**TIMEOUT_SETTINGS):
+            response = await self.post_resume()
+        self.assertEqual(response.status_code, 200)
+        analysis = (await self.latest_result(StoredAnalysis.KIND_SINGLE))['analysis']
+        self.assertTrue(analysis['error'].startswith('OpenAI API error'))
+        self.assertEqual(analysis['match_percentage'], 0)
+
+    async def test_upload_llm_error(self):
+        self.stub.configure(status=500)
+        response = await self.post_resume()
+        self.assertEqual(response.status_code, 200)
+        analysis = (await self.latest_result(StoredAnalysis.KIND_SINGLE))['analysis']
+        self.assertTrue(analysis['error'].startswith('OpenAI API error'))
+
+    async def test_upload_extraction_failure(self):
+        with override_settings(ANALYZER_PDF_MAX_PAGES=1):
+            response = await self.post_resume(pages=2)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()['code'], 'too_many_pages')
+        # Users see the message only, not the exception type
+        self.assertEqual(response.json()['error'], 'The PDF has 2 pages; the limit is 1')
+        self.assertFalse(await StoredAnalysis.objects.aexists())
+
+    async def post_comparison(self, resumes, job):
+        return await self.async_client.post(
+            reverse('async_compare_resumes'), {'resumes': resumes, 'job_description': job}
+        )
+
+    async def test_compare_resumes(self):
+        job, resumes = resume_uploads(3)
+        response = await self.post_comparison(resumes, job)
+        self.assertEqual(response.status_code, 200)
+        result = await self.latest_result(StoredAnalysis.KIND_COMPARISON)
+        self.assertEqual(len(result['analyses']), 3)
+        self.assertTrue(all('error' not in analysis for analysis in result['analyses']))
+        self.assertEqual(result['comparative_insights']['overall_comparison'], STUB_INSIGHTS['overall_comparison'])
+
+    async def test_compare_llm_timeout(self):
+        job, resumes = resume_uploads(2)
+        self.stub.configure(latency=SLOW_LATENCY)
+        with override_settings(**TIMEOUT_SETTINGS):
+            response = await self.post_comparison(resumes, job)
+        self.assertEqual(response.status_code, 200)
+        result = await self.latest_result(StoredAnalysis.KIND_COMPARISON)
+        self.assertTrue(all(analysis['error'].startswith('OpenAI API error') for analysis in result['analyses']))
+        self.assertIn('error', result['comparative_insights'])
+
+    async def test_compare_llm_error(self):
+        job, resumes = resume_uploads(2)
+        self.stub.configure(status=500)
+        response = await self.post_comparison(resumes, job)
+        self.assertEqual(response.status_code, 200)
+        result = await self.latest_result(StoredAnalysis.KIND_COMPARISON)
+        self.assertTrue(all('error' in analysis for analysis in result['analyses']))
+        self.assertIn('error', result['comparative_insights'])
+
+    async def test_compare_extraction_failure(self):
+        job, resumes = resume_uploads(2, seed=1)
+        _job, (long_resume,) = resume_uploads(1, pages=2, seed=2)
+        long_resume.name = 'long_resume.pdf'
+        with override_settings(ANALYZER_PDF_MAX_PAGES=1):
+            response = await self.post_comparison(resumes + [long_resume], job)
+        # One unreadable file does not abort the comparison
+        self.assertEqual(response.status_code, 200)
+        analyses = {analysis['file_name']: analysis
+                    for analysis in (await self.latest_result(StoredAnalysis.KIND_COMPARISON))['analyses']}
+        self.assertEqual(analyses[long_resume.name]['error'],
+                         'Could not extract text: The PDF has 2 pages; the limit is 1')
+        self.assertTrue(all('error' not in analyses[resume.name] for resume in resumes))
+
+    async def ask(self, analysis_id, question, client=None, stream=False):
+        path = reverse('async_bot_question_stream' if stream else 'async_bot_question')
+        return await (client or self.async_client).post(
+            path, {'analysis_id': analysis_id, 'question': question}, content_type='application/json'
+        )
+
+    async def test_bot_question(self):
+        analysis_id = await sync_to_async(stored_single_analysis)()
+        response = await self.ask(analysis_id, 'Is the candidate a good fit?')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'response': STUB_ANSWER, 'cached': False})
+
+        # Another session asking the same standalone question is answered from the cache
+        self.stub.configure(status=500)
+        response = await self.ask(analysis_id, 'Is the candidate a good fit?', client=AsyncClient())
+        self.assertEqual(response.json(), {'response': STUB_ANSWER, 'cached': True})
+
+    async def test_bot_question_llm_timeout(self):
+        analysis_id = await sync_to_async(stored_single_analysis)()
+        self.stub.configure(latency=SLOW_LATENCY)
+        with override_settings(**TIMEOUT_SETTINGS):
+            response = await self.ask(analysis_id, 'Is the candidate a good fit?')
+        self.assertEqual(response.status_code, 500)
+        self.assertTrue(response.json()['error'].startswith('OpenAI API error'))
+
+    async def test_bot_question_llm_error(self):
+        analysis_id = await sync_to_async(stored_single_analysis)()
+        self.stub.configure(status=500)
+        response = await self.ask(analysis_id, 'Is the candidate a good fit?')
+        self.assertEqual(response.status_code, 500)
+        self.assertTrue(response.json()['error'].startswith('OpenAI API error'))
+
+    async def test_bot_question_unknown_analysis(self):
+        response = await self.ask('00000000-0000-0000-0000-000000000000', 'Is the candidate a good fit?')
+        self.assertEqual(response.status_code, 404)
+
+    async def stream(self, analysis_id, question, client=None):
+        response = await self.ask(analysis_id, question, client=client, stream=True)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return sse_events(b''.join([chunk async for chunk in response.streaming_content]))
+
+    async def test_bot_question_stream(self):
+        analysis_id = await sync_to_async(stored_single_analysis)()
+        events = await self.stream(analysis_id, 'Is the candidate a good fit?')
+        self.assertEqual(''.join(data['token'] for event, data in events if event == 'message'), STUB_ANSWER)
+        self.assertEqual(events[-1][0], 'done')
+        self.assertFalse(events[-1][1]['cached'])
+
+        session = await self.async_client.asession()
+        history = await sync_to_async(bot.get_history)(session, analysis_id)
+        self.assertEqual(history, [('Is the candidate a good fit?', STUB_ANSWER)])
+
+    async def test_bot_question_stream_llm_error(self):
+        analysis_id = await sync_to_async(stored_single_analysis)()
+        self.stub.configure(status=500)
+        events = await self.stream(analysis_id, 'Is the candidate a good fit?')
+        self.assertEqual([event for event, _data in events], ['error'])
+        self.assertTrue(events[0][1]['error'].startswith('OpenAI API error'))
+
+    async def test_bot_question_stream_llm_timeout(self):
+        analysis_id = await sync_to_async(stored_single_analysis)()
+        self.stub.configure(latency=SLOW_LATENCY)
+        with override_settings(**TIMEOUT_SETTINGS):
+            events = await self.stream(analysis_id, 'Is the candidate a good fit?')
+        self.assertEqual([event for event, _data in events], ['error'])
+
+
+class ScoringContractTests(StubLLMTestCase):
+    """Every scoring backend returns the common result schema, also when the LLM fails"""
+
+    def analyze(self, backend):
+        analysis = scoring.analyze(SAMPLE_RESUME, SAMPLE_JOB, backend)
+        self.assertEqual(scoring.contract_errors(analysis), [])
+        self.assertEqual(analysis['scoring_backend'], backend)
+        return analysis
+
+    def test_local(self):
+        analysis = self.analyze(scoring.BACKEND_LOCAL)
+        self.assertIn('python', analysis['matched_skills'])
+        self.assertGreater(analysis['match_percentage'], 0)
+
+    def test_llm(self):
+        analysis = self.analyze(scoring.BACKEND_LLM)
+        self.assertNotIn('error', analysis)
+        self.assertEqual(analysis['summary'], STUB_ANALYSIS['summary'])
+
+    def test_hybrid(self):
+        local = self.analyze(scoring.BACKEND_LOCAL)
+        analysis = self.analyze(scoring.BACKEND_HYBRID)
+        # Scores and skills are the local engine's, the narrative the LLM's
+        self.assertEqual(analysis['match_percentage'], local['match_percentage'])
+        self.assertEqual(analysis['matched_skills'], local['matched_skills'])
+        self.assertEqual(analysis['summary'], STUB_ANALYSIS['summary'])
+        self.assertNotIn('llm_error', analysis)
+
+    def test_async_backends(self):
+        for backend in scoring.BACKENDS:
+            with self.subTest(backend=backend):
+                analysis = async_to_sync(scoring.aanalyze)(SAMPLE_RESUME, SAMPLE_JOB, backend)
+                self.assertEqual(scoring.contract_errors(analysis), [])
+
+    def test_llm_failure(self):
+        self.stub.configure(status=500)
+        analysis = self.analyze(scoring.BACKEND_LLM)
+        self.assertTrue(analysis['error'].startswith('OpenAI API error'))
+        self.assertEqual(analysis['match_percentage'], 0)
+
+    def test_unparseable_response_is_logged_truncated(self):
+        with self.assertLogs('analyzer.scoring', 'WARNING') as logs:
+            analysis = scoring.parse_analysis_response('not json ' * 1000)
+        self.assertEqual(scoring.contract_errors(analysis), [])
+        self.assertIn('error', analysis)
+        self.assertLess(len(logs.output[0]), 1000)
+
+    def test_hybrid_falls_back_to_local_when_the_llm_fails(self):
+        local = self.analyze(scoring.BACKEND_LOCAL)
+        self.stub.configure(status=500)
+        analysis = self.analyze(scoring.BACKEND_HYBRID)
+        self.assertTrue(analysis['llm_error'].startswith('OpenAI API error'))
+        self.assertEqual(analysis['match_percentage'], local['match_percentage'])
+        self.assertEqual(analysis['summary'], local['summary'])
+        # A fallback result must not be cached as if the LLM had answered
+        self.assertFalse(views.cacheable(analysis))
+
+
+class BotStreamTests(StubLLMTestCase):
+    """views.bot_question_stream consuming a stub that streams its answer in chunks"""
+
+    def setUp(self):
+        super().setUp()
+        self.stub.configure(chunk_delay=0.01)
+        self.analysis_id = stored_single_analysis()
+
+    def stream(self, question, client=None):
+        response = (client or self.client).post(
+            reverse('bot_question_stream'), {'analysis_id': self.analysis_id, 'question': question},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return sse_events(b''.join(response.streaming_content))
+
+    def test_tokens_then_done(self):
+        events = self.stream('Is the candidate a good fit?')
+        tokens = [data['token'] for event, data in events if event == 'message']
+        # One event per streamed chunk, not the whole answer at once
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual(''.join(tokens), STUB_ANSWER)
+        self.assertEqual([event for event, _data in events[-1:]], ['done'])
+        self.assertFalse(events[-1][1]['cached'])
+        self.assertGreaterEqual(events[-1][1]['total_ms'], events[-1][1]['ttft_ms'])
+
+    def test_history_is_saved(self):
+        self.stream('Is the candidate a good fit?')
+        self.stream('Why?')
+        history = bot.get_history(self.client.session, self.analysis_id)
+        self.assertEqual(history, [('Is the candidate a good fit?', STUB_ANSWER), ('Why?', STUB_ANSWER)])
+
+    def test_error_event(self):
+        self.stub.configure(status=500)
+        events = self.stream('Is the candidate a good fit?')
+        self.assertEqual([event for event, _data in events], ['error'])
+        self.assertTrue(events[0][1]['error'].startswith('OpenAI API error'))
+        # A failed answer is neither remembered nor added to the history
+        self.assertEqual(bot.get_history(self.client.session, self.analysis_id), [])
+
+    def test_cached_answer_is_one_token_event(self):
+        self.stream('Is the candidate a good fit?')
+        # The stub would fail now, so this answer can only come from the cache
+        self.stub.configure(status=500)
+        events = self.stream('Is the candidate a good fit?', client=Client())
+        self.assertEqual(events, [('message', {'token': STUB_ANSWER}), ('done', events[-1][1])])
+        self.assertTrue(events[-1][1]['cached'])
+
+    def test_unknown_analysis(self):
+        response = self.client.post(
+            reverse('bot_question_stream'),
+            {'analysis_id': '00000000-0000-0000-0000-000000000000', 'question': 'Is the candidate a good fit?'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BotAnswerCacheTests(TestCase):
+    analysis_id = '00000000-0000-0000-0000-000000000001'
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        bot.remember_answer(self.analysis_id, 'Is the candidate senior enough for this role?', STUB_ANSWER)
+
+    def test_standalone_repeat(self):
+        self.assertEqual(bot.lookup_answer(self.analysis_id, 'is the candidate senior enough for this role'),
+                         STUB_ANSWER)
+
+    def test_follow_ups_are_not_looked_up(self):
+        history = [('What are the main gaps?', 'Kubernetes.')]
+        self.assertIsNone(bot.lookup_answer(self.analysis_id, 'Is the candidate senior enough for this role?',
+                                            history))
+
+    def test_similar_vectors_with_different_words(self):
+        self.assertIsNone(bot.lookup_answer(self.analysis_id, 'Is the candidate junior enough for this role?'))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReportETagTests(TestCase):
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        self.comparison_id = save_analysis({
+            'job_description': 'Backend engineer with Python, Django and SQL.',
+            'analyses': [dict(STUB_ANALYSIS)],
+        }, kind=StoredAnalysis.KIND_COMPARISON)
+
+    def test_stored_analysis_has_an_etag(self):
+        analysis_id = stored_single_analysis()
+        self.assertIsNotNone(views.report_etag(None, analysis_id))
+        self.assertIsNotNone(views.report_etag(None, self.comparison_id, 0))
+
+    def test_missing_analysis_has_no_etag(self):
+        self.assertIsNone(views.report_etag(None, '00000000-0000-0000-0000-000000000001'))
+
+    @override_settings(ANALYZER_RESULT_TTL=-1)
+    def test_expired_analysis_has_no_etag(self):
+        self.assertIsNone(views.report_etag(None, stored_single_analysis()))
+
+    def test_comparison_without_position_is_not_a_report(self):
+        self.assertIsNone(views.report_etag(None, self.comparison_id))
+        response = self.client.get(reverse('download_pdf', args=[self.comparison_id]),
+                                   HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.get('Content-Type'), 'application/pdf')
+
+
+class RankResumesApiTests(TestCase):
+    def test_requires_staff(self):
+        response = self.client.post(reverse('rank_resumes_api'), {
+            'job_description': SAMPLE_JOB,
+            'resumes': SimpleUploadedFile('resume.txt', SAMPLE_RESUME.encode(), content_type='text/plain'),
+        })
+        self.assertEqual(response.status_code, 403)
+
+
+class SearchResumesApiTests(TestCase):
+    def search(self, **data):
+        return self.client.post(reverse('search_resumes_api'), {'job_description': SAMPLE_JOB, **data})
+
+    def test_requires_staff(self):
+        self.assertEqual(self.search().status_code, 403)
+        self.client.force_login(User.objects.create_user('recruiter'))
+        self.assertEqual(self.search().status_code, 403)
+
+    @override_settings(ANALYZER_SEARCH_MAX_TOP_K=100)
+    def test_top_k_is_bounded(self):
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        with mock.patch.object(search_index, 'get_search_index') as get_index:
+            get_index.return_value.search.return_value = []
+            self.assertEqual(self.search(top_k=1000000).status_code, 200)
+            self.assertEqual(get_index.return_value.search.call_args.args[2], 100)
+            self.assertEqual(self.search(top_k=0).status_code, 400)
+
+
+class TextNormalizerTests(SimpleTestCase):
+    def setUp(self):
+        self.normalizer = TextNormalizer(stop_words=(), lemmatizer=mock.Mock(lemmatize=lambda token: token))
+
+    def test_tokenize_matches_word_tokenize(self):
+        # Expected tokens are word_tokenize's output on the cleaned text
+        self.assertEqual(self.normalizer.tokenize("We cannot ship, gonna need 3 more devs."),
+                         ['we', 'can', 'not', 'ship', 'gon', 'na', 'need', 'more', 'devs'])
+        self.assertEqual(self.normalizer.tokenize("I wanna. A wannabe wanna"),
+                         ['i', 'wan', 'na', 'a', 'wannabe', 'wan', 'na'])
+
+
+class TfidfIndexTests(SimpleTestCase):
+    corpus = [
+        'python django developer rest api postgresql',
+        'java spring engineer microservice kafka',
+        'data scientist python machine learning sql',
+        'frontend developer react javascript css',
+    ]
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.index = TfidfIndex.fit(self.corpus, temp_dir.name)
+        self.index.save()
+
+    def assertRowsEqual(self, actual, expected):
+        self.assertEqual(actual.shape, expected.shape)
+        self.assertAlmostEqual(abs(actual - expected).sum(), 0.0)
+
+    def test_stored_rows_are_reused(self):
+        self.index.add([7, 9], self.corpus[:2])
+        job = self.corpus[2]
+        # Indexed ids use their stored rows whatever text is passed; others are transformed
+        vectors = self.index.vectors([9, None, 7], ['ignored', job, 'ignored'])
+        self.assertRowsEqual(vectors, self.index.transform([self.corpus[1], job, self.corpus[0]]))
+        scores = (vectors @ self.index.transform([job]).T).toarray().ravel()
+        self.assertEqual(int(scores.argmax()), 1)
+
+    def test_add_replaces_and_delete_removes(self):
+        self.index.add([1, 2], self.corpus[:2])
+        self.index.add([1], [self.corpus[3]])
+        self.assertEqual(sorted(self.index.ids.tolist()), [1, 2])
+        self.assertRowsEqual(self.index.vectors([1], ['']), self.index.transform([self.corpus[3]]))
+        self.index.delete([2])
+        self.assertEqual(self.index.ids.tolist(), [1])
+        self.assertRowsEqual(self.index.vectors([2], [self.corpus[2]]), self.index.transform([self.corpus[2]]))
+
+    def test_other_processes_see_updates(self):
+        reader = TfidfIndex.load(self.index.directory)
+        self.assertEqual(len(reader), 0)
+        self.index.add([1, 2, 3], self.corpus[:3])
+        self.assertEqual(len(reader), 3)
+        self.index.delete([3])
+        self.assertRowsEqual(reader.vectors([1, 2], ['', '']), self.index.transform(self.corpus[:2]))
+
+    def test_reindex(self):
+        self.index.add([1], self.corpus[:1])
+        self.index.reindex([5, 6], self.corpus[2:])
+        self.index.save()
+        reader = TfidfIndex.load(self.index.directory)
+        self.assertEqual(reader.ids.tolist(), [5, 6])
+        self.assertRowsEqual(reader.matrix, self.index.transform(self.corpus[2:]))
+
+
+class DiskLRUCacheBackendTests(SimpleTestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache = DiskLRUCacheBackend(temp_dir.name, {'TIMEOUT': 60, 'OPTIONS': {'MAX_BYTES': 4096}})
+
+    def test_copy_on_read(self):
+        self.cache.set('key', {'skills': ['python']})
+        value = self.cache.get('key')
+        value['skills'].append('java')
+        self.assertEqual(self.cache.get('key'), {'skills': ['python']})
+        self.assertTrue(self.cache.delete('key'))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expiry(self):
+        self.cache.set('key', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        # Stored a long time ago with the 60 second default timeout
+        with mock.patch('time.time', return_value=0):
+            self.cache.set('key', 'value')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'again'))
+        self.assertFalse(self.cache.add('key', 'ignored'))
+        self.assertEqual(self.cache.get('key'), 'again')
+
+    def test_evicts_least_recently_used_by_size(self):
+        for number in range(8):
+            self.cache.set(f'entry-{number}', b'x' * 1000)
+            # Keep the first entry recently used
+            self.assertIsNotNone(self.cache.get('entry-0'))
+        self.assertLessEqual(self.cache.store.size(), 4096)
+        self.assertIsNotNone(self.cache.get('entry-0'))
+        self.assertIsNone(self.cache.get('entry-1'))
+
+
+class ExtractionWrapperTests(SimpleTestCase):
+    def test_unreadable_files_raise(self):
+        for extract in (extract_text_from_pdf, extract_text_from_docx):
+            with self.subTest(extract.__name__), self.assertLogs('analyzer.nlp_processor', 'WARNING'):
+                with self.assertRaises(ExtractionError) as raised:
+                    extract(BytesIO(b'not a document'))
+                self.assertEqual(raised.exception.code, ExtractionError.FAILED)
+
+
+class PdfPageSplitTests(SimpleTestCase):
+    def test_page_ranges_join_to_the_whole_document(self):
+        data = synthetic_pdf(SAMPLE_RESUME, 10)
+        ranges = page_ranges(10, 3)
+        self.assertEqual(ranges, [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+        self.assertEqual(''.join(pdfminer_pages(data, pages) for pages in ranges), pdfminer_pages(data))
+
+    def test_long_pdfs_needing_pdfminer_are_split(self):
+        data = synthetic_pdf(SAMPLE_RESUME, 10)
+        with mock.patch.object(sandbox, 'fast_extract', return_value=(None, 10)):
+            self.assertEqual(parse_document(data, 50, split_pages=8).page_count, 10)
+            self.assertNotIsInstance(parse_document(data, 50, split_pages=12), PdfminerPages)
+            with self.assertRaises(ExtractionError):
+                parse_document(data, 5, split_pages=8)
+
+    def test_sandbox_map_keeps_order(self):
+        pool = Sandbox(2, memory_limit=512 * 2**20, timeout=30)
+        self.addCleanup(pool.close)
+        self.assertEqual(pool.map(pow, [(2, 3), (3, 2), (5, 1)]), [8, 9, 5])
+
+
+@override_settings(ANALYZER_METRICS_ENABLED=True, ANALYZER_METRICS_TOKEN='scrape-token',
+                   ANALYZER_EXTRACTION_CACHE_MAX_BYTES=0, ANALYZER_REPORT_CACHE_MAX_BYTES=0)
+class MetricsEndpointTests(TestCase):
+    def test_requires_staff_or_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'analyzer_stage_seconds', response.content)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_store_sizes_do_not_rescan_every_scrape(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        store, other_process = DiskLRUCache(temp_dir.name, 2**20), DiskLRUCache(temp_dir.name, 2**20)
+        store.write('a' * 64, b'x' * 100)
+        self.assertEqual(store.approx_size(), 100)
+        other_process.write('b' * 64, b'x' * 50)
+        with mock.patch.object(store, 'size', wraps=store.size) as size:
+            self.assertEqual(store.approx_size(), 100)
+            size.assert_not_called()
+            self.assertEqual(store.approx_size(max_age=0), 150)
+
+
+class SearchIndexTests(SimpleTestCase):
+    """SearchIndex on a temporary ANALYZER_SEARCH_INDEX_DIR"""
+
+    documents = [
+        (1, 'python django developer rest api', ['python', 'django']),
+        (2, 'java spring engineer microservice', ['java']),
+        (3, 'python data engineer spark pipeline', ['python', 'spark']),
+        (4, 'frontend developer react javascript', ['react']),
+    ]
+    query = {'python', 'engineer', SKILL_PREFIX + 'python'}
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        settings_override = override_settings(ANALYZER_SEARCH_INDEX_DIR=temp_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.index = SearchIndex()
+
+    def ids(self, hits):
+        return [resume_id for resume_id, _score in hits]
+
+    def fresh_index(self, documents):
+        """A separate index built in one batch, to compare scores with"""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        index = SearchIndex(temp_dir.name)
+        index.rebuild([documents])
+        return index
+
+    def assertSameHits(self, actual, expected):
+        self.assertEqual(self.ids(actual), self.ids(expected))
+        for (_id, actual_score), (_id, expected_score) in zip(actual, expected):
+            self.assertAlmostEqual(actual_score, expected_score, places=4)
+
+    def test_add_then_search(self):
+        self.index.add(self.documents)
+        self.assertEqual(len(self.index), 4)
+        hits = self.index.search(self.query)
+        # Resume 3 matches every term; 2 only "engineer"; 4 nothing
+        self.assertEqual(self.ids(hits), [3, 1, 2])
+        self.assertEqual(self.ids(self.index.search(self.query, required_skills=['django'])), [1])
+        self.assertEqual(self.ids(self.index.search(self.query, top_k=1)), [3])
+        self.assertSameHits(hits, self.fresh_index(self.documents).search(self.query))
+
+    def test_replace_an_id(self):
+        self.index.add(self.documents)
+        self.index.add([(3, 'frontend developer vue javascript', ['vue'])])
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.ids(self.index.search(self.query)), [1, 2])
+        self.assertEqual(self.ids(self.index.search({'vue'})), [3])
+
+    def test_delete_an_id(self):
+        self.index.add(self.documents)
+        self.index.delete([3])
+        self.assertEqual(len(self.index), 3)
+        self.assertNotIn(3, self.ids(self.index.search(self.query, top_k=10)))
+        self.assertEqual(self.index.indexed_ids(), {1, 2, 4})
+        # A deleted id added again is live in its new segment only
+        self.index.add([(3, 'python engineer', ['python'])])
+        self.assertEqual(self.index.indexed_ids(), {1, 2, 3, 4})
+        self.assertEqual(self.ids(self.index.search({'spark'})), [])
+
+    def test_merge_drops_deleted_rows_and_keeps_scores(self):
+        documents = [(resume_id, f'python engineer project{resume_id % 3} word{resume_id}', ['python'])
+                     for resume_id in range(1, search_index.MAX_SEGMENTS + 4)]
+        for document in documents:
+            self.index.add([document])
+            if document[0] == 3:
+                self.index.delete([2])
+            if document[0] == 5:
+                self.index.add([(4, 'java engineer', ['java'])])
+        manifest = self.index._read_manifest()
+        self.assertLessEqual(len(manifest['segments']), search_index.MAX_SEGMENTS)
+        # Every segment older than the tombstones was merged away, and so were the tombstones
+        self.assertEqual(manifest['deleted'], {})
+
+        live = [document for document in documents if document[0] not in (2, 4)] + [(4, 'java engineer', ['java'])]
+        self.assertEqual(self.index.indexed_ids(), {resume_id for resume_id, _text, _skills in live})
+        hits = self.index.search(self.query, top_k=50)
+        self.assertNotIn(2, self.ids(hits))
+        self.assertSameHits(hits, self.fresh_index(live).search(self.query, top_k=50))
+        self.assertEqual(self.ids(self.index.search({'java'})), [4])
+
+    def test_other_instances_pick_up_changes(self):
+        reader = SearchIndex()
+        self.assertEqual(reader.search(self.query), [])
+        self.index.add(self.documents)
+        self.assertEqual(self.ids(reader.search(self.query)), [3, 1, 2])
+        self.index.delete([1])
+        self.assertEqual(self.ids(reader.search(self.query)), [3, 2])
+        # Merges remove segment files the reader has loaded
+        for resume_id in range(10, 10 + search_index.MAX_SEGMENTS):
+            self.index.add([(resume_id, 'python engineer', ['python'])])
+        reader.refresh()
+        self.assertEqual(reader.indexed_ids(), self.index.indexed_ids())
+        self.assertSameHits(reader.search(self.query, top_k=50), self.index.search(self.query, top_k=50))
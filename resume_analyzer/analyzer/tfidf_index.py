@@ -0,0 +1,225 @@
+"""
+Corpus-level TF-IDF model and sparse index of stored resumes.
+
+The vectorizer is fitted once on a reference corpus of resumes and job
+descriptions (`manage.py rebuild_tfidf`), saved to disk and loaded once per
+process, so similarity scores use corpus IDF weights instead of weights fitted
+on the two documents being compared. Stored resumes are transformed once, as
+they are ingested, into a CSR matrix of L2-normalized rows keyed by Resume.pk,
+so scoring one job description against every stored resume is a single sparse
+matrix-vector product. Processes reload the files when another process changes
+them, so web workers see what `manage.py ingest_resumes` adds.
+"""
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from django.conf import settings
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+VECTORIZER_FILE = 'vectorizer.joblib'
+MATRIX_FILE = 'resumes.npz'
+LOCK_FILE = '.lock'
+
+
+def build_vectorizer():
+    """Vectorizer settings shared by the corpus model and the per-pair fallback"""
+    return TfidfVectorizer(ngram_range=(1, 2), stop_words='english')
+
+
+def get_index_dir():
+    return getattr(settings, 'ANALYZER_TFIDF_DIR', os.path.join(settings.BASE_DIR, 'tfidf'))
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class TfidfIndex:
+    """A vectorizer fitted on the reference corpus plus the CSR matrix of stored resumes"""
+
+    def __init__(self, vectorizer, directory=None):
+        self.vectorizer = vectorizer
+        self.directory = directory or get_index_dir()
+        self.matrix = self._empty_matrix()
+        self.ids = np.zeros(0, dtype=np.int64)
+        self._rows = {}  # resume id -> row of matrix
+        self._stamps = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def fit(cls, corpus, directory=None):
+        """Fit a new model on preprocessed reference texts; it has no resumes indexed"""
+        vectorizer = build_vectorizer()
+        vectorizer.fit(corpus)
+        return cls(vectorizer, directory)
+
+    @classmethod
+    def load(cls, directory=None):
+        """Load a saved model and its resumes, or return None if none has been fitted yet"""
+        index = cls(None, directory)
+        if index._stamp()[0] is None:
+            return None
+        index.refresh()
+        return index
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _stamp(self):
+        return _file_stamp(self._path(VECTORIZER_FILE)), _file_stamp(self._path(MATRIX_FILE))
+
+    def _empty_matrix(self):
+        width = len(self.vectorizer.vocabulary_) if self.vectorizer is not None else 0
+        return sp.csr_matrix((0, width), dtype=np.float64)
+
+    def _set_matrix(self, matrix, ids):
+        self.matrix = matrix
+        self.ids = ids
+        self._rows = {int(resume_id): row for row, resume_id in enumerate(ids)}
+
+    def refresh(self):
+        """Reload the model and resumes if another process rewrote them; cheap when it did not"""
+        stamps = self._stamp()
+        with self._lock:
+            if stamps == self._stamps:
+                return
+            if stamps[0] != (self._stamps or (None, None))[0]:
+                self.vectorizer = joblib.load(self._path(VECTORIZER_FILE))
+            matrix, ids = self._empty_matrix(), np.zeros(0, dtype=np.int64)
+            if stamps[1] is not None:
+                with np.load(self._path(MATRIX_FILE)) as arrays:
+                    # A matrix from a model that is being replaced is reindexed right after
+                    if arrays['shape'][1] == matrix.shape[1]:
+                        matrix = sp.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                                               shape=tuple(arrays['shape']))
+                        ids = arrays['ids']
+            self._set_matrix(matrix, ids)
+            self._stamps = stamps
+
+    def save(self):
+        """Write the model and the resume matrix"""
+        with self._write_lock(reload=False):
+            joblib.dump(self.vectorizer, self._path(VECTORIZER_FILE))
+            self._write_matrix()
+
+    @contextmanager
+    def _write_lock(self, reload=True):
+        """Serialize writers across processes, then refresh to the latest files"""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(self._path(LOCK_FILE), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if reload:
+                    self.refresh()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_matrix(self):
+        temp_path = self._path(MATRIX_FILE + '.tmp.npz')
+        np.savez(temp_path, data=self.matrix.data, indices=self.matrix.indices, indptr=self.matrix.indptr,
+                 shape=np.array(self.matrix.shape), ids=self.ids)
+        os.replace(temp_path, self._path(MATRIX_FILE))
+        self._stamps = self._stamp()
+
+    def transform(self, texts):
+        return self.vectorizer.transform(texts).tocsr()
+
+    def similarity(self, text_a, text_b):
+        """Cosine similarity of two preprocessed texts under the corpus IDF weights"""
+        vectors = self.transform([text_a, text_b])
+        # Rows are L2-normalized, so the dot product is the cosine
+        return float(vectors[0].multiply(vectors[1]).sum())
+
+    def __len__(self):
+        self.refresh()
+        return len(self.ids)
+
+    def reindex(self, ids, texts):
+        """Replace the indexed resumes with preprocessed texts keyed by Resume.pk; save() writes them"""
+        with self._lock:
+            self._set_matrix(self.transform(texts) if texts else self._empty_matrix(),
+                             np.array(ids, dtype=np.int64))
+
+    def add(self, ids, texts):
+        """Index resumes by Resume.pk, replacing ids that are already indexed"""
+        if not ids:
+            return
+        with self._write_lock():
+            keep = np.flatnonzero(~np.isin(self.ids, np.array(ids, dtype=np.int64)))
+            self._set_matrix(sp.vstack([self.matrix[keep], self.transform(texts)], format='csr'),
+                             np.concatenate([self.ids[keep], np.array(ids, dtype=np.int64)]))
+            self._write_matrix()
+
+    def delete(self, ids):
+        ids = np.array(ids, dtype=np.int64)
+        with self._write_lock():
+            keep = np.flatnonzero(~np.isin(self.ids, ids))
+            if len(keep) == len(self.ids):
+                return
+            self._set_matrix(self.matrix[keep], self.ids[keep])
+            self._write_matrix()
+
+    def vectors(self, ids, texts):
+        """
+        One row per resume: the stored vector of each indexed id, and the
+        transformed text for the rest (ids that are None or not indexed)
+        """
+        self.refresh()
+        with self._lock:
+            matrix, rows = self.matrix, self._rows
+        positions = [rows.get(resume_id) for resume_id in ids]
+        stored = [i for i, row in enumerate(positions) if row is not None]
+        missing = [i for i, row in enumerate(positions) if row is None]
+        if not missing:
+            return matrix[positions]
+        if not stored:
+            return self.transform(texts)
+        stacked = sp.vstack([matrix[[positions[i] for i in stored]], self.transform([texts[i] for i in missing])],
+                            format='csr')
+        return stacked[np.argsort(stored + missing)]
+
+
+_lock = threading.Lock()
+_index = None
+_loaded = False
+
+
+def get_tfidf_index():
+    """The process-wide saved model, or None when no model has been fitted"""
+    global _index, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                _index = TfidfIndex.load()
+                _loaded = True
+    return _index
+
+
+def index_resumes(resumes):
+    """Add Resume rows to the saved index; a no-op until a model has been fitted"""
+    index = get_tfidf_index()
+    if index is not None:
+        resumes = list(resumes)
+        index.add([resume.pk for resume in resumes], [resume.normalized_text for resume in resumes])
+
+
+def on_resume_saved(sender, instance, raw=False, **kwargs):
+    """post_save receiver: (re)index the resume; loaddata (raw) saves are left to rebuild_tfidf --reindex-only"""
+    if not raw and getattr(settings, 'ANALYZER_SEARCH_INDEX_SIGNALS', True):
+        index_resumes([instance])
+
+
+def on_resume_deleted(sender, instance, **kwargs):
+    index = get_tfidf_index()
+    if index is not None and getattr(settings, 'ANALYZER_SEARCH_INDEX_SIGNALS', True):
+        index.delete([instance.pk])
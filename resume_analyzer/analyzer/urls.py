@@ -1,11 +1,25 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path("", views.index, name="index"),
     path("analyze/", views.upload_and_analyze, name="analyze"),
     path("results/<uuid:analysis_id>/", views.view_result, name="view_result"),
+    path("jobs/<uuid:job_id>/", views.job_status, name="job_status"),
     path("download/<uuid:analysis_id>/", views.download_pdf, name="download_pdf"),
+    path("download/<uuid:analysis_id>/<int:position>/", views.download_pdf, name="download_report"),
+    path("download/<uuid:analysis_id>/all/", views.download_all_pdfs, name="download_all_pdfs"),
     path("bot-question/", views.bot_question, name="bot_question"),
+    path("bot-question/stream/", views.bot_question_stream, name="bot_question_stream"),
     path("compare/", views.compare_resumes, name="compare_resumes"),  # Fixed incorrect function reference
+    path("api/rank/", views.rank_resumes_api, name="rank_resumes_api"),
+    path("api/search/", views.search_resumes_api, name="search_resumes_api"),
+    path("metrics", views.prometheus_metrics, name="metrics"),
+    path("profiles/", views.profile_list, name="profile_list"),
+    path("profiles/<str:file_name>/", views.profile_detail, name="profile_detail"),
+    # Async variants for the ASGI entry point (resume_analyzer.asgi)
+    path("async/analyze/", async_views.upload_and_analyze, name="async_analyze"),
+    path("async/bot-question/", async_views.bot_question, name="async_bot_question"),
+    path("async/bot-question/stream/", async_views.bot_question_stream, name="async_bot_question_stream"),
+    path("async/compare/", async_views.compare_resumes, name="async_compare_resumes"),
 ]
@@ -1,27 +1,89 @@
-import os
+import functools
 import json
-import uuid
-from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
-from tempfile import NamedTemporaryFile
-from django.template.loader import get_template
-from xhtml2pdf import pisa
-from .nlp_processor import extract_text_from_pdf, extract_text_from_docx
-import openai
-from functools import lru_cache
-
-
-analysis_results = {}
-
-openai.api_key = "..."
+import logging
+import time
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import redirect, render
+from django.utils.crypto import constant_time_compare
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_POST
+from .nlp_processor import DocumentAnalysis, rank_resumes, top_k_indices
+from . import (bot, execution, extraction_cache, jobs, llm, metrics, profiling, prompts, reports, sandbox, scoring,
+               search_index)
+from .cache import analysis_cache, analysis_cache_key
+from .llm import LLM_MODEL
+from .models import AnalysisJob, Resume, StoredAnalysis
+from .sandbox import ExtractionError
+from .scoring import failed_analysis
+from .storage import load_analysis, save_analysis
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the analysis prompt or its parsing changes so cached results are not reused
+ANALYSIS_CACHE_VERSION = f"{LLM_MODEL}/analysis-v2"
 
 def index(request):
     """Home page view"""
     return render(request, 'analyzer/index.html')
 
-@lru_cache(maxsize=100)  # Cache up to 100 results to optimize API calls
+def extract_uploaded_text(resume_file):
+    """
+    Extract the text of an uploaded PDF/DOCX resume straight from Django's
+    in-memory or spooled upload, or return None for unsupported formats.
+    Files seen before are served from the extraction cache. Raises
+    ExtractionError for files that are too large, too long or unreadable.
+    """
+    sandbox.check_upload_size(resume_file.size)
+    return extraction_cache.extract_text(resume_file.read())
+
+def extraction_error_response(code, message):
+    """JSON error response for an upload whose text could not be extracted"""
+    return JsonResponse({'error': message, 'code': code}, status=ExtractionError.STATUS.get(code, 422))
+
+def analysis_cache_version(backend):
+    return f"{ANALYSIS_CACHE_VERSION}/{backend}"
+
+def cacheable(analysis):
+    """Don't pin failed API calls in the cache, including a hybrid result's LLM half"""
+    return 'error' not in analysis and 'llm_error' not in analysis
+
 def analyze_resume_job_match_cached(resume_text, job_text):
-    return analyze_resume_job_match(resume_text, job_text)
+    """
+    Analyze a resume/job pair with the configured scoring backend through the
+    shared analysis cache. Every call returns a private copy, so callers may
+    add keys without corrupting the cache.
+    """
+    backend = scoring.get_backend()
+    key = analysis_cache_key(resume_text, job_text, analysis_cache_version(backend))
+    analysis = analysis_cache.get(key)
+    if analysis is None:
+        analysis = scoring.analyze(resume_text, job_text, backend)
+        if cacheable(analysis):
+            analysis_cache.set(key, analysis)
+    return analysis
+
+def store_single_analysis(job_description_text, analysis):
+    """Store a single-resume result and return the template context for it"""
+    # Prepare interactive chart data for Chart.js
+    chart_data = prepare_chart_data(analysis)
+
+    # Store the result so any worker can serve it later
+    stored_result = {
+        'job_description': job_description_text,
+        'analysis': analysis,
+        'chart_data': chart_data
+    }
+    analysis_id = save_analysis(stored_result)
+    reports.schedule_prerender(analysis_id, stored_result)
+
+    return {
+        'job_description': job_description_text,
+        'analysis': analysis,
+        'chart_data': chart_data,
+        'analysis_id': analysis_id
+    }
 
 def upload_and_analyze(request):
     """Handle file uploads and analysis using OpenAI API, and prepare interactive chart data."""
@@ -34,143 +96,26 @@ def upload_and_analyze(request):
         if not job_description_text:
             return JsonResponse({'error': 'No job description provided'}, status=400)
 
-        # Save uploaded file temporarily
-        suffix = ".pdf" if resume_file.name.lower().endswith('.pdf') else ".docx"
-        with NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            for chunk in resume_file.chunks():
-                temp_file.write(chunk)
-            temp_file_path = temp_file.name
-
-        # Extract text based on file type
-        if temp_file_path.endswith('.pdf'):
-            resume_text = extract_text_from_pdf(temp_file_path)
-        elif temp_file_path.endswith('.docx') or temp_file_path.endswith('.doc'):
-            resume_text = extract_text_from_docx(temp_file_path)
-        else:
-            os.remove(temp_file_path)
+        try:
+            if jobs.background_enabled(request):
+                sandbox.check_upload_size(resume_file.size)
+                job = jobs.enqueue_analysis(StoredAnalysis.KIND_SINGLE, job_description_text, [resume_file])
+                return redirect('job_status', job_id=job.id)
+
+            resume_text = extract_uploaded_text(resume_file)
+        except ExtractionError as e:
+            return extraction_error_response(e.code, e.message)
+        if resume_text is None:
             return JsonResponse({'error': 'Unsupported file format. Please use PDF or DOCX'}, status=400)
 
-        # Delete temporary file after processing
-        os.remove(temp_file_path)
-
-        # Analyze the match using OpenAI API
+        # Analyze the match with the configured scoring backend
         analysis  = analyze_resume_job_match_cached(resume_text, job_description_text)
 
-        # Prepare interactive chart data for Chart.js
-        chart_data = prepare_chart_data(analysis)
-
-        # Generate a unique ID for this analysis
-        analysis_id = str(uuid.uuid4())
-
-        # Store the result in memory
-        analysis_results[analysis_id] = {
-            'job_description': job_description_text,
-            'analysis': analysis,
-            'chart_data': chart_data
-        }
-
-        context = {
-            'job_description': job_description_text,
-            'analysis': analysis,
-            'chart_data': chart_data,
-            'analysis_id': analysis_id
-        }
-
+        context = store_single_analysis(job_description_text, analysis)
         return render(request, 'analyzer/results.html', context)
 
     return render(request, 'analyzer/index.html')
 
-def analyze_resume_job_match(resume_text, job_text):
-    
-    prompt = f"""
-    You are an AI that evaluates how well a resume matches a job description.
-    Analyze the given resume and job description to provide a comprehensive match analysis.
-    
-    Requirements for JSON response:
-    - match_percentage: Overall match score (0-100%)
-    - matched_skills: List of skills found in the resume
-    - missing_skills: List of skills not found in the resume
-    - skill_match_percentage: Percentage of required skills matched
-    - semantic_match_percentage: Content relevance percentage
-    - summary: Brief overview of the match
-    - recommendations: List of suggestions to improve resume
-    - contact_info: Dictionary with name, email, phone (if available)
-
-    Format your response as a valid JSON object.
-
-    Resume:
-    {resume_text}
-
-    Job Description:
-    {job_text}
-    """
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "You are an AI resume-job matching expert. Always respond in a valid JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5
-        )
-        
-        # Extract the content from the response
-        result = response["choices"][0]["message"]["content"].strip()
-        
-        # Try to parse the JSON, with error handling
-        try:
-            # Remove any leading/trailing code block markers
-            if result.startswith('```json'):
-                result = result[7:]
-            if result.endswith('```'):
-                result = result[:-3]
-            
-            # Parse the JSON
-            analysis = json.loads(result)
-            
-            # Ensure all required keys exist
-            required_keys = [
-                'match_percentage', 'matched_skills', 'missing_skills', 
-                'skill_match_percentage', 'semantic_match_percentage', 
-                'summary', 'recommendations', 'contact_info'
-            ]
-            for key in required_keys:
-                if key not in analysis:
-                    analysis[key] = [] if 'skills' in key or key == 'recommendations' else '' if key == 'summary' else 0
-            
-            return analysis
-        
-        except json.JSONDecodeError as json_error:
-            # Log the actual response for debugging
-            print(f"JSON Parsing Error: {json_error}")
-            print(f"Problematic Response: {result}")
-            return {
-                "error": f"Error parsing OpenAI API response: {json_error}",
-                "raw_response": result,
-                "match_percentage": 0,
-                "matched_skills": [],
-                "missing_skills": [],
-                "skill_match_percentage": 0,
-                "semantic_match_percentage": 0,
-                "summary": "Unable to parse analysis results.",
-                "recommendations": [],
-                "contact_info": {}
-            }
-    
-    except Exception as e:
-        # Handle any other unexpected errors
-        return {
-            "error": f"OpenAI API error: {str(e)}",
-            "match_percentage": 0,
-            "matched_skills": [],
-            "missing_skills": [],
-            "skill_match_percentage": 0,
-            "semantic_match_percentage": 0,
-            "summary": "An unexpected error occurred during analysis.",
-            "recommendations": [],
-            "contact_info": {}
-        }
-
 def prepare_chart_data(analysis):
     """
     Prepare chart data for interactive Chart.js rendering.
@@ -195,11 +140,21 @@ def prepare_chart_data(analysis):
     }
 
 def view_result(request, analysis_id):
-    """View a specific analysis result from in-memory storage"""
-    if analysis_id not in analysis_results:
+    """View a specific analysis result from the result store"""
+    stored_result = load_analysis(analysis_id)
+    if stored_result is None:
         return render(request, 'analyzer/index.html')
 
-    stored_result = analysis_results[analysis_id]
+    if stored_result['kind'] == StoredAnalysis.KIND_COMPARISON:
+        context = {
+            'job_description': stored_result['job_description'],
+            'analyses': stored_result['analyses'],
+            'comparative_insights': stored_result['comparative_insights'],
+            'chart_data': json.dumps(stored_result['chart_data']),
+            'analysis_id': analysis_id
+        }
+        return render(request, 'analyzer/compare_results.html', context)
+
     context = {
         'job_description': stored_result['job_description'],
         'analysis': stored_result['analysis'],
@@ -208,29 +163,63 @@ def view_result(request, analysis_id):
     }
     return render(request, 'analyzer/results.html', context)
 
-def download_pdf(request, analysis_id):
-    """Download analysis result as a PDF file"""
-    if analysis_id not in analysis_results:
+def job_status(request, job_id):
+    """Progress of a background analysis; redirects to the result once it is done"""
+    job = AnalysisJob.objects.filter(pk=job_id).first()
+    wants_json = request.GET.get('format') == 'json' or 'application/json' in request.headers.get('Accept', '')
+    if job is None:
+        if wants_json:
+            return JsonResponse({'error': 'Job not found'}, status=404)
         return render(request, 'analyzer/index.html')
 
-    stored_result = analysis_results[analysis_id]
-    context = {
-        'job_description': stored_result['job_description'],
-        'analysis': stored_result['analysis'],
-        'chart_data': stored_result['chart_data'],
-        'analysis_id': analysis_id
-    }
+    status = jobs.job_status_data(job)
+    if wants_json:
+        return JsonResponse(status)
+    if status['result_url']:
+        return redirect(status['result_url'])
+    return render(request, 'analyzer/job_status.html', {'job': job, 'status': status})
+
+def report_kind(position):
+    """Single-resume reports come from single analyses, positioned ones from comparisons"""
+    return StoredAnalysis.KIND_SINGLE if position is None else StoredAnalysis.KIND_COMPARISON
 
-    template = get_template('analyzer/results_pdf.html')
-    html = template.render(context)
-    from io import BytesIO
-    result = BytesIO()
-    pdf = pisa.CreatePDF(BytesIO(html.encode("UTF-8")), dest=result)
-    if not pdf.err:
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="resume_analysis_{analysis_id}.pdf"'
-        return response
-    return HttpResponse("Error generating PDF", status=400)
+def report_etag(request, analysis_id, position=None):
+    """
+    Stored analyses never change, so the report's cache key is a valid ETag.
+    Missing or expired analyses have none, so they never get a 304.
+    """
+    if load_analysis(analysis_id, kind=report_kind(position)) is None:
+        return None
+    return reports.report_key(analysis_id, position)
+
+@condition(etag_func=report_etag)
+def download_pdf(request, analysis_id, position=None):
+    """
+    Download analysis result as a PDF file, or the report of one resume of a
+    comparison. Rendered PDFs are cached, and repeat downloads get a 304.
+    """
+    stored_result = load_analysis(analysis_id, kind=report_kind(position))
+    if stored_result is None:
+        return render(request, 'analyzer/index.html')
+    if position is not None and position >= len(stored_result.get('analyses', [])):
+        raise Http404('No such resume in this comparison')
+
+    report = reports.open_report(analysis_id, stored_result, position)
+    if report is None:
+        return HttpResponse("Error generating PDF", status=400)
+    suffix = '' if position is None else f'_{position + 1}'
+    return FileResponse(report, as_attachment=True, filename=f"resume_analysis_{analysis_id}{suffix}.pdf",
+                        content_type='application/pdf')
+
+def download_all_pdfs(request, analysis_id):
+    """Every report of a comparison in one zip, streamed while it is built"""
+    stored_result = load_analysis(analysis_id, kind=StoredAnalysis.KIND_COMPARISON)
+    if stored_result is None:
+        raise Http404('Comparison not found')
+    response = StreamingHttpResponse(reports.stream_reports_zip(analysis_id, stored_result),
+                                     content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="resume_reports_{analysis_id}.zip"'
+    return response
 
 def bot_question(request):
     """
@@ -243,59 +232,131 @@ def bot_question(request):
             question = data.get('question')
 
             # Retrieve the stored analysis
-            if analysis_id not in analysis_results:
+            stored_result = load_analysis(analysis_id, kind=StoredAnalysis.KIND_SINGLE)
+            if stored_result is None:
                 return JsonResponse({'error': 'Analysis not found'}, status=404)
 
-            stored_result = analysis_results[analysis_id]
-            job_description = stored_result['job_description']
-            analysis = stored_result['analysis']
-
-            # Prepare detailed prompt for OpenAI
-            prompt = f"""
-            You are an AI HR assistant helping to evaluate a job candidate's resume.
-
-            Context:
-            - Job Description: {job_description}
-            - Resume Analysis:
-              * Overall Match: {analysis.get('match_percentage', 0)}%
-              * Skills Match: {analysis.get('skill_match_percentage', 0)}%
-              * Semantic Match: {analysis.get('semantic_match_percentage', 0)}%
-              * Matched Skills: {', '.join(analysis.get('matched_skills', []))}
-              * Missing Skills: {', '.join(analysis.get('missing_skills', []))}
-
-            Candidate Question: {question}
-
-            Provide a short and concise, professional, and insightful response highlighting that helps an HR professional understand the candidate's fit.
-            """
-
-            try:
-                response = openai.ChatCompletion.create(
-                    model="gpt-4-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are an AI HR assistant providing expert insights on candidate evaluation."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=300,
-                    temperature=0.7
-                )
-                
-                bot_response = response['choices'][0]['message']['content'].strip()
-                
-                return JsonResponse({
-                    'response': bot_response
-                })
-            
-            except Exception as api_error:
-                return JsonResponse({
-                    'error': f'OpenAI API error: {str(api_error)}',
-                    'details': str(api_error)
-                }, status=500)
+            # Repeated and near-duplicate questions are answered from the cache
+            history = bot.get_history(request.session, analysis_id)
+            bot_response = bot.lookup_answer(analysis_id, question, history)
+            cached = bot_response is not None
+
+            if not cached:
+                try:
+                    bot_response = llm.chat_completion(
+                        bot.bot_messages(bot.get_context(analysis_id, stored_result), history, question),
+                        max_tokens=300, temperature=0.7
+                    )
+                except Exception as api_error:
+                    return JsonResponse({
+                        'error': f'OpenAI API error: {str(api_error)}',
+                        'details': str(api_error)
+                    }, status=500)
+                bot.remember_answer(analysis_id, question, bot_response, history)
+
+            bot.record_turn(request.session, analysis_id, question, bot_response)
+            return JsonResponse({
+                'response': bot_response,
+                'cached': cached
+            })
         
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
     
     return JsonResponse({'error': 'Invalid request method'}, status=405)
 
+def sse_event(data, event=None):
+    """One server-sent event with a JSON payload"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep nginx from buffering the stream
+    return response
+
+class StreamTimer:
+    """Time to first token and total time of a streamed answer"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token = None
+
+    def token(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.start
+            logger.info("Bot answer time to first token: %.0f ms", self.first_token * 1000)
+
+    def done_event(self, cached=False):
+        return sse_event({
+            'ttft_ms': round((self.first_token or 0) * 1000, 1),
+            'total_ms': round((time.perf_counter() - self.start) * 1000, 1),
+            'cached': cached,
+        }, event='done')
+
+def stream_answer(pieces, on_complete=None):
+    """
+    SSE events for an answer: a token event per piece, then done with the
+    timings, or error. on_complete(answer) runs once the whole answer is in.
+    """
+    timer = StreamTimer()
+    answer = []
+    try:
+        for piece in pieces:
+            timer.token()
+            answer.append(piece)
+            yield sse_event({'token': piece})
+    except Exception as api_error:
+        yield sse_event({'error': f'OpenAI API error: {str(api_error)}'}, event='error')
+        return
+    if on_complete:
+        on_complete(''.join(answer))
+    yield timer.done_event()
+
+def stream_cached_answer(answer):
+    """SSE events serving a memoized answer in one token event"""
+    timer = StreamTimer()
+    timer.token()
+    yield sse_event({'token': answer})
+    yield timer.done_event(cached=True)
+
+def bot_question_stream(request):
+    """bot_question answered as server-sent events, forwarding tokens as the LLM produces them"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    analysis_id, question = data.get('analysis_id'), data.get('question')
+    stored_result = load_analysis(analysis_id, kind=StoredAnalysis.KIND_SINGLE)
+    if stored_result is None:
+        return JsonResponse({'error': 'Analysis not found'}, status=404)
+
+    history = bot.get_history(request.session, analysis_id)
+    # The session middleware saves before the stream runs, so make sure it
+    # sets the cookie now and save the new turn explicitly at the end
+    request.session.modified = True
+
+    def finish(answer, remember=True):
+        if remember:
+            bot.remember_answer(analysis_id, question, answer, history)
+        bot.record_turn(request.session, analysis_id, question, answer)
+        request.session.save()
+
+    cached_answer = bot.lookup_answer(analysis_id, question, history)
+    if cached_answer is not None:
+        finish(cached_answer, remember=False)
+        return sse_response(stream_cached_answer(cached_answer))
+
+    messages = bot.bot_messages(bot.get_context(analysis_id, stored_result), history, question)
+    return sse_response(stream_answer(
+        llm.stream_chat_completion(messages, max_tokens=300, temperature=0.7), on_complete=finish
+    ))
+
 
 def prepare_comparison_chart_data(resume_analyses):
     """Prepare chart data for comparing multiple resumes"""
@@ -332,9 +393,13 @@ def prepare_comparison_chart_data(resume_analyses):
         unique_skills = matched_skills_set - other_skills
         unique_skills_by_resume.append(list(unique_skills))
     
+    # Resumes outside the cascade shortlist are charted with their local engine scores
+    scoring_backends = [analysis.get('scoring_backend', '') for analysis in resume_analyses]
+    
     # Return structured chart data as a serializable dictionary
     return {
         'labels': labels,
+        'scoring_backends': scoring_backends,
         'match_percentages': match_percentages,
         'skill_match_percentages': skill_match_percentages,
         'semantic_match_percentages': semantic_match_percentages,
@@ -344,6 +409,116 @@ def prepare_comparison_chart_data(resume_analyses):
         'unique_skills_by_resume': unique_skills_by_resume
     }
 
+def readable_extractions(extractions):
+    """(index, extraction) for every uploaded file except unsupported formats"""
+    return [
+        (idx, extraction) for idx, extraction in enumerate(extractions)
+        if not extraction.ok or extraction.value is not None
+    ]
+
+def prescreen(extracted, job_description_text):
+    """
+    First stage of the comparison cascade: score every readable resume with the
+    local engine and return {index: local analysis} for the ones outside the
+    top ANALYZER_CASCADE_TOP_K, which then skip the LLM. Empty when the cascade
+    is off or every resume fits in the shortlist.
+    """
+    top_k = getattr(settings, 'ANALYZER_CASCADE_TOP_K', 10)
+    readable = [(idx, extraction.value) for idx, extraction in extracted if extraction.ok]
+    if not top_k or len(readable) <= top_k or scoring.get_backend() == scoring.BACKEND_LOCAL:
+        return {}
+
+    screened_out = {}
+    for position, analysis in rank_resumes(job_description_text, [text for _idx, text in readable])[top_k:]:
+        analysis['summary'] = scoring.local_summary(analysis)
+        analysis['scoring_backend'] = scoring.BACKEND_LOCAL
+        analysis['prescreened_out'] = True
+        screened_out[readable[position][0]] = scoring.conform(analysis)
+    return screened_out
+
+def shortlisted(extracted, screened_out):
+    """(index, extraction) for the readable resumes that go on to the scoring backend"""
+    return [(idx, extraction) for idx, extraction in extracted if extraction.ok and idx not in screened_out]
+
+def sort_by_match(resume_analyses):
+    order = top_k_indices([analysis.get('match_percentage', 0) for analysis in resume_analyses])
+    return [resume_analyses[i] for i in order]
+
+def combine_resume_analyses(file_names, extracted, llm_results, screened_out=None):
+    """
+    Merge extraction and LLM results per file, sorted by match percentage.
+    llm_results cover the shortlisted files only; screened_out files keep their
+    local analysis and rank below every shortlisted one.
+    """
+    screened_out = screened_out or {}
+    llm_results = iter(llm_results)
+    resume_analyses = []
+    for idx, extraction in extracted:
+        if idx in screened_out:
+            analysis = screened_out[idx]
+            analysis_seconds = 0.0
+        elif extraction.ok:
+            llm_result = next(llm_results)
+            analysis = llm_result.value if llm_result.ok else failed_analysis(llm_result.error)
+            analysis_seconds = llm_result.seconds
+        else:
+            # One unreadable file should not abort the whole comparison
+            analysis = failed_analysis(f"Could not extract text: {extraction.error}")
+            analysis_seconds = 0.0
+
+        # Add resume file name, index and timing information
+        analysis['file_name'] = file_names[idx]
+        analysis['index'] = idx + 1
+        analysis['timing'] = {
+            'extraction_seconds': round(extraction.seconds, 3),
+            'analysis_seconds': round(analysis_seconds, 3),
+        }
+        resume_analyses.append(analysis)
+
+    # Sort analyses by match percentage (descending); local and LLM scores are not comparable
+    return (sort_by_match([analysis for analysis in resume_analyses if not analysis.get('prescreened_out')])
+            + sort_by_match([analysis for analysis in resume_analyses if analysis.get('prescreened_out')]))
+
+def insight_candidates(resume_analyses):
+    """The analyses worth sending to the insights call: everything except screened-out resumes"""
+    return [analysis for analysis in resume_analyses if not analysis.get('prescreened_out')]
+
+def comparison_form_error(resume_files, job_description_text):
+    """Validation error for the comparison form, or None"""
+    if not resume_files:
+        return 'No resume files provided'
+    if len(resume_files) < 2:
+        return 'Please upload at least two resumes for comparison'
+    if not job_description_text:
+        return 'No job description provided'
+    oversized = [resume_file.name for resume_file in resume_files if resume_file.size > sandbox.max_upload_bytes()]
+    if oversized:
+        return f"These files exceed the {sandbox.max_upload_bytes() / 2**20:.0f} MB upload limit: {', '.join(oversized)}"
+    return None
+
+def store_comparison(job_description_text, resume_analyses, comparative_insights):
+    """Store a comparison result and return the template context for it"""
+    # Generate chart data for comparison
+    comparison_chart_data = prepare_comparison_chart_data(resume_analyses)
+    
+    # Store the multi-resume result so any worker can serve it later
+    stored_result = {
+        'job_description': job_description_text,
+        'analyses': resume_analyses,
+        'comparative_insights': comparative_insights,
+        'chart_data': comparison_chart_data
+    }
+    analysis_id = save_analysis(stored_result, kind=StoredAnalysis.KIND_COMPARISON)
+    reports.schedule_prerender(analysis_id, stored_result)
+    
+    return {
+        'job_description': job_description_text,
+        'analyses': resume_analyses,
+        'comparative_insights': comparative_insights,
+        'chart_data': json.dumps(comparison_chart_data),  # JSON string for the template
+        'analysis_id': analysis_id
+    }
+
 def compare_resumes(request):
     """View for comparing multiple resumes against a job description"""
     if request.method == 'POST':
@@ -351,165 +526,265 @@ def compare_resumes(request):
         resume_files = request.FILES.getlist('resumes')
         job_description_text = request.POST.get('job_description', '')
         
-        if not resume_files:
-            return render(request, 'analyzer/compare_form.html', {'error': 'No resume files provided'})
+        error = comparison_form_error(resume_files, job_description_text)
+        if error:
+            return render(request, 'analyzer/compare_form.html', {'error': error})
         
-        if len(resume_files) < 2:
-            return render(request, 'analyzer/compare_form.html', {'error': 'Please upload at least two resumes for comparison'})
+        if jobs.background_enabled(request):
+            job = jobs.enqueue_analysis(StoredAnalysis.KIND_COMPARISON, job_description_text, resume_files)
+            return redirect('job_status', job_id=job.id)
         
-        if not job_description_text:
-            return render(request, 'analyzer/compare_form.html', {'error': 'No job description provided'})
-        
-        # Process each resume file
-        resume_analyses = []
-        for idx, resume_file in enumerate(resume_files):
-            # Save uploaded file temporarily
-            suffix = ".pdf" if resume_file.name.lower().endswith('.pdf') else ".docx"
-            with NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-                for chunk in resume_file.chunks():
-                    temp_file.write(chunk)
-                temp_file_path = temp_file.name
-            
-            # Extract text based on file type
-            if temp_file_path.endswith('.pdf'):
-                resume_text = extract_text_from_pdf(temp_file_path)
-            elif temp_file_path.endswith('.docx') or temp_file_path.endswith('.doc'):
-                resume_text = extract_text_from_docx(temp_file_path)
-            else:
-                os.remove(temp_file_path)
-                continue  # Skip unsupported file formats
-            
-            # Delete temporary file after processing
-            os.remove(temp_file_path)
-            
-            # Analyze the match using OpenAI API
-            analysis = analyze_resume_job_match_cached(resume_text, job_description_text)
-            
-            # Add resume file name and index information
-            analysis['file_name'] = resume_file.name
-            analysis['index'] = idx + 1
-            
-            resume_analyses.append(analysis)
-        
-        # Sort analyses by match percentage (descending)
-        resume_analyses.sort(key=lambda x: x.get('match_percentage', 0), reverse=True)
+        # Extract every file in the sandbox, then analyze them concurrently
+        extractions = extraction_cache.extract_many(
+            [resume_file.read() for resume_file in resume_files], execution.map_extraction
+        )
+
+        # Pre-screen locally so only the shortlist reaches the LLM
+        extracted = readable_extractions(extractions)
+        screened_out = prescreen(extracted, job_description_text)
+        llm_results = execution.map_llm(analyze_resume_job_match_cached, [
+            (extraction.value, job_description_text) for _idx, extraction in shortlisted(extracted, screened_out)
+        ])
+        resume_analyses = combine_resume_analyses(
+            [resume_file.name for resume_file in resume_files], extracted, llm_results, screened_out
+        )
         
         # Generate comparative insights using OpenAI
-        comparative_insights = generate_comparative_insights(resume_analyses, job_description_text)
-        
-        # Generate chart data for comparison
-        comparison_chart_data = prepare_comparison_chart_data(resume_analyses)
-        
-        # Generate a unique ID for this multi-resume analysis
-        analysis_id = str(uuid.uuid4())
-        
-        # Store the result in memory
-        analysis_results[analysis_id] = {
-            'job_description': job_description_text,
-            'analyses': resume_analyses,
-            'comparative_insights': comparative_insights,
-            'chart_data': comparison_chart_data
-        }
-        
-        # Convert chart_data to JSON string for template
-        import json
-        chart_data_json = json.dumps(comparison_chart_data)
-        
-        context = {
-            'job_description': job_description_text,
-            'analyses': resume_analyses,
-            'comparative_insights': comparative_insights,
-            'chart_data': chart_data_json,
-            'analysis_id': analysis_id
-        }
+        comparative_insights = generate_comparative_insights(
+            insight_candidates(resume_analyses), job_description_text
+        )
         
+        context = store_comparison(job_description_text, resume_analyses, comparative_insights)
         return render(request, 'analyzer/compare_results.html', context)
     
     return render(request, 'analyzer/compare_form.html')
 
-def generate_comparative_insights(resume_analyses, job_description):
-    """Generate comparative insights for multiple resumes using OpenAI"""
+def insights_messages(resume_analyses, job_description):
+    """Chat messages asking the LLM to compare analyzed resumes"""
+    # Prepare data for the prompt
+    resume_data = []
+    for idx, analysis in enumerate(resume_analyses):
+        resume_data.append({
+            "index": idx + 1,
+            "file_name": analysis.get('file_name', f"Resume {idx+1}"),
+            "match_percentage": analysis.get('match_percentage', 0),
+            "skill_match_percentage": analysis.get('skill_match_percentage', 0),
+            "matched_skills": analysis.get('matched_skills', []),
+            "missing_skills": analysis.get('missing_skills', [])
+        })
+    job_description = prompts.compact_text(job_description, prompts.get_token_budget() * 2 // 5)
+    
+    prompt = f"""
+    You are an AI HR assistant analyzing multiple resumes for a job opening.
+    
+    Job Description:
+    {job_description}
+    
+    Resume Analysis Results:
+    {json.dumps(resume_data, indent=2)}
+    
+    Please provide:
+    1. A comparative analysis highlighting the strengths and weaknesses of each candidate
+    2. Key differentiating factors between the candidates
+    3. How each candidate matches specific aspects of the job description
+    4. Suggestions for which candidate(s) should be prioritized for interviews and why
+    
+    Format your response as a valid JSON object with these keys:
+    - overall_comparison: Text summary comparing all candidates
+    - top_candidate_analysis: Analysis of why the top-ranked candidate stands out
+    - interview_recommendations: Ordered list of which candidates to interview first with rationale
+    - skill_distribution: Text describing how key skills are distributed across candidates
+    """
+    return [
+        {"role": "system", "content": "You are an AI HR assistant providing comparative analysis of job candidates. Always respond in valid JSON format."},
+        {"role": "user", "content": prompt}
+    ]
+
+def parse_insights_response(result):
+    """Turn the LLM's comparison reply into an insights dict with every required key"""
+    # Try to parse the JSON
     try:
-        # Prepare data for the prompt
-        resume_data = []
-        for idx, analysis in enumerate(resume_analyses):
-            resume_data.append({
-                "index": idx + 1,
-                "file_name": analysis.get('file_name', f"Resume {idx+1}"),
-                "match_percentage": analysis.get('match_percentage', 0),
-                "skill_match_percentage": analysis.get('skill_match_percentage', 0),
-                "matched_skills": analysis.get('matched_skills', []),
-                "missing_skills": analysis.get('missing_skills', [])
-            })
-        
-        prompt = f"""
-        You are an AI HR assistant analyzing multiple resumes for a job opening.
+        # Parse the JSON, without any code block markers
+        with metrics.timer('json_parse'):
+            insights = json.loads(llm.strip_code_fence(result))
         
-        Job Description:
-        {job_description}
+        # Ensure all required keys exist
+        required_keys = ['overall_comparison', 'top_candidate_analysis', 'interview_recommendations', 'skill_distribution']
+        for key in required_keys:
+            if key not in insights:
+                insights[key] = "Analysis not available for this section."
         
-        Resume Analysis Results:
-        {json.dumps(resume_data, indent=2)}
-        
-        Please provide:
-        1. A comparative analysis highlighting the strengths and weaknesses of each candidate
-        2. Key differentiating factors between the candidates
-        3. How each candidate matches specific aspects of the job description
-        4. Suggestions for which candidate(s) should be prioritized for interviews and why
-        
-        Format your response as a valid JSON object with these keys:
-        - overall_comparison: Text summary comparing all candidates
-        - top_candidate_analysis: Analysis of why the top-ranked candidate stands out
-        - interview_recommendations: Ordered list of which candidates to interview first with rationale
-        - skill_distribution: Text describing how key skills are distributed across candidates
-        """
-        
-        response = openai.ChatCompletion.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "You are an AI HR assistant providing comparative analysis of job candidates. Always respond in valid JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
-        )
-        
-        # Extract the content from the response
-        result = response["choices"][0]["message"]["content"].strip()
-        
-        # Try to parse the JSON
-        try:
-            # Remove any code block markers
-            if result.startswith('```json'):
-                result = result[7:]
-            if result.endswith('```'):
-                result = result[:-3]
-            
-            # Parse the JSON
-            insights = json.loads(result)
-            
-            # Ensure all required keys exist
-            required_keys = ['overall_comparison', 'top_candidate_analysis', 'interview_recommendations', 'skill_distribution']
-            for key in required_keys:
-                if key not in insights:
-                    insights[key] = "Analysis not available for this section."
-            
-            return insights
-        
-        except json.JSONDecodeError as json_error:
-            return {
-                "error": f"Error parsing OpenAI API response: {json_error}",
-                "overall_comparison": "Unable to generate comparative analysis.",
-                "top_candidate_analysis": "Analysis not available.",
-                "interview_recommendations": "Recommendations not available.",
-                "skill_distribution": "Skill distribution analysis not available."
-            }
+        return insights
     
-    except Exception as e:
+    except json.JSONDecodeError as json_error:
         return {
-            "error": f"OpenAI API error: {str(e)}",
-            "overall_comparison": "Unable to generate comparative analysis due to an error.",
-            "top_candidate_analysis": "Analysis not available due to an error.",
-            "interview_recommendations": "Recommendations not available due to an error.",
-            "skill_distribution": "Skill distribution analysis not available due to an error."
+            "error": f"Error parsing OpenAI API response: {json_error}",
+            "overall_comparison": "Unable to generate comparative analysis.",
+            "top_candidate_analysis": "Analysis not available.",
+            "interview_recommendations": "Recommendations not available.",
+            "skill_distribution": "Skill distribution analysis not available."
         }
 
+def failed_insights(error):
+    """Insights placeholder when the LLM call itself failed"""
+    return {
+        "error": f"OpenAI API error: {error}",
+        "overall_comparison": "Unable to generate comparative analysis due to an error.",
+        "top_candidate_analysis": "Analysis not available due to an error.",
+        "interview_recommendations": "Recommendations not available due to an error.",
+        "skill_distribution": "Skill distribution analysis not available due to an error."
+    }
+
+def generate_comparative_insights(resume_analyses, job_description):
+    """Generate comparative insights for multiple resumes using OpenAI"""
+    try:
+        result = llm.chat_completion(insights_messages(resume_analyses, job_description), temperature=0.7)
+    except Exception as e:
+        return failed_insights(str(e))
+    return parse_insights_response(result)
+
+def staff_api_required(view_func):
+    """Like staff_member_required, but answers JSON clients with a 403 instead of a login redirect"""
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not (request.user.is_active and request.user.is_staff):
+            return JsonResponse({'error': 'Staff login required'}, status=403)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+@csrf_exempt
+@require_POST
+@staff_api_required
+def rank_resumes_api(request):
+    """
+    JSON endpoint ranking uploaded resumes against a job description with the
+    local NLP engine. Staff only, since every call extracts and parses each
+    upload. Accepts multipart 'resumes' files and/or comma-separated
+    'resume_ids' of stored resumes, 'job_description' and an optional 'top_k'.
+    Stored resumes are scored with their indexed TF-IDF rows.
+    """
+    resume_files = request.FILES.getlist('resumes')
+    job_description_text = request.POST.get('job_description', '')
+    try:
+        resume_ids = [int(resume_id) for resume_id in request.POST.get('resume_ids', '').split(',')
+                      if resume_id.strip()]
+    except ValueError:
+        return JsonResponse({'error': 'resume_ids must be integers'}, status=400)
+    if not resume_files and not resume_ids:
+        return JsonResponse({'error': 'No resume files provided'}, status=400)
+    if not job_description_text:
+        return JsonResponse({'error': 'No job description provided'}, status=400)
+
+    try:
+        top_k = int(request.POST['top_k']) if request.POST.get('top_k') else None
+    except ValueError:
+        return JsonResponse({'error': 'top_k must be an integer'}, status=400)
+
+    file_names, resume_texts, errors = [], [], []
+    for resume_file in resume_files:
+        try:
+            resume_text = extract_uploaded_text(resume_file)
+        except ExtractionError as e:
+            errors.append({'file_name': resume_file.name, 'error': e.message, 'code': e.code})
+            continue
+        if resume_text is not None:
+            file_names.append(resume_file.name)
+            resume_texts.append(resume_text)
+
+    stored = Resume.objects.in_bulk(resume_ids)
+    for resume_id in dict.fromkeys(resume_ids):
+        if resume_id not in stored:
+            errors.append({'resume_id': resume_id, 'error': 'No such resume', 'code': 'not_found'})
+            continue
+        file_names.append(stored[resume_id].file_name)
+        resume_texts.append(DocumentAnalysis.from_resume(stored[resume_id]))
+
+    ranked = rank_resumes(job_description_text, resume_texts, top_k=top_k)
+    results = []
+    for rank, (position, analysis) in enumerate(ranked, start=1):
+        analysis['file_name'] = file_names[position]
+        if isinstance(resume_texts[position], DocumentAnalysis):
+            analysis['resume_id'] = resume_texts[position].resume_id
+        analysis['rank'] = rank
+        results.append(analysis)
+
+    return JsonResponse({'count': len(resume_texts), 'results': results, 'errors': errors})
+
+@csrf_exempt
+@require_POST
+@staff_api_required
+def search_resumes_api(request):
+    """
+    JSON endpoint returning the stored resumes that best match a job
+    description by BM25 over the search index. Staff only, since the results
+    carry candidates' contact details. Accepts 'job_description', an optional
+    'top_k' (default 10, at most ANALYZER_SEARCH_MAX_TOP_K) and optional
+    comma-separated 'required_skills' every returned resume must have.
+    """
+    job_description_text = request.POST.get('job_description', '')
+    if not job_description_text:
+        return JsonResponse({'error': 'No job description provided'}, status=400)
+    try:
+        top_k = int(request.POST.get('top_k') or 10)
+    except ValueError:
+        return JsonResponse({'error': 'top_k must be an integer'}, status=400)
+    if top_k < 1:
+        return JsonResponse({'error': 'top_k must be at least 1'}, status=400)
+    top_k = min(top_k, getattr(settings, 'ANALYZER_SEARCH_MAX_TOP_K', 100))
+    required_skills = [skill for skill in request.POST.get('required_skills', '').split(',') if skill.strip()]
+
+    terms = search_index.query_terms(job_description_text)
+    required = search_index.canonical_skills(required_skills)
+    hits = search_index.get_search_index().search(terms, required, top_k)
+    resumes = Resume.objects.only('id', 'file_name', 'name', 'email', 'skills').in_bulk([pk for pk, _score in hits])
+    results = []
+    for pk, score in hits:
+        resume = resumes.get(pk)
+        if resume is None:  # Deleted since the index was read
+            continue
+        results.append({
+            'id': pk,
+            'rank': len(results) + 1,
+            'score': round(score, 4),
+            'file_name': resume.file_name,
+            'name': resume.name,
+            'email': resume.email,
+            'matched_skills': [skill for skill in resume.skills
+                               if search_index.SKILL_PREFIX + skill in terms or skill in required],
+        })
+    return JsonResponse({'required_skills': required, 'results': results})
+
+def metrics_allowed(request):
+    """Staff users, and scrapers sending ANALYZER_METRICS_TOKEN as a bearer token"""
+    token = getattr(settings, 'ANALYZER_METRICS_TOKEN', '')
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return request.user.is_active and request.user.is_staff
+
+def prometheus_metrics(request):
+    """Stage latencies, LLM token counts, cache hit rates and store sizes of this worker process"""
+    if not metrics.enabled():
+        raise Http404("Metrics are disabled")
+    if not metrics_allowed(request):
+        return HttpResponseForbidden("Staff login or metrics token required")
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@staff_member_required
+def profile_list(request):
+    """Stored request profiles, newest first"""
+    return render(request, 'analyzer/profiles.html', {'profiles': profiling.list_profiles()})
+
+@staff_member_required
+def profile_detail(request, file_name):
+    """Top functions of a CPU profile by cumulative time, or top allocations of a memory snapshot"""
+    path = profiling.profile_path(file_name)
+    if path is None:
+        raise Http404("Profile not found")
+    context = {'file_name': file_name, 'show_all': request.GET.get('all') == '1'}
+    if file_name.endswith(profiling.MEMORY_SUFFIX):
+        context['allocations'] = profiling.top_allocations(path)
+    else:
+        focus = () if context['show_all'] else profiling.FOCUS_MODULES
+        context['functions'] = profiling.top_functions(path, focus=focus)
+        context['focus'] = profiling.FOCUS_MODULES
+    return render(request, 'analyzer/profiles.html', context)
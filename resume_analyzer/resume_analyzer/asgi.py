@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'resume_analyzer.settings')
 
 application = get_asgi_application()
+
+# The server's event loop lives as long as the process, so LLM calls can share pooled HTTP clients
+from analyzer import llm  # noqa: E402
+
+llm.use_pooled_clients()
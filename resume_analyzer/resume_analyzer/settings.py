@@ -49,6 +49,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # After AuthenticationMiddleware so ?profile= can check for staff users
+    'analyzer.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'resume_analyzer.urls'
@@ -123,3 +125,155 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# NLP resources
+# spaCy models and NLTK corpora are loaded lazily and never downloaded at runtime.
+# For air-gapped hosts copy them into ANALYZER_NLP_DATA_DIR (NLTK layout, plus the
+# spaCy model directory named after ANALYZER_SPACY_MODEL).
+
+ANALYZER_NLP_DATA_DIR = os.environ.get('ANALYZER_NLP_DATA_DIR', os.path.join(BASE_DIR, 'nlp_data'))
+
+ANALYZER_SPACY_MODEL = os.environ.get('ANALYZER_SPACY_MODEL', 'en_core_web_md')
+
+# Load all NLP resources in AppConfig.ready (useful with gunicorn --preload)
+ANALYZER_WARMUP_ON_READY = os.environ.get('ANALYZER_WARMUP_ON_READY', '') == '1'
+
+# JSON file mapping each canonical skill to its aliases (defaults to analyzer/data/skills.json)
+ANALYZER_SKILLS_TAXONOMY = os.environ.get('ANALYZER_SKILLS_TAXONOMY') or None
+
+# Corpus TF-IDF model and the stored resumes' vectors, fitted with `manage.py rebuild_tfidf` and updated on ingestion
+ANALYZER_TFIDF_DIR = os.environ.get('ANALYZER_TFIDF_DIR', os.path.join(BASE_DIR, 'tfidf'))
+
+# BM25 index over the stored Resume table, updated on save/delete and rebuilt with `manage.py rebuild_search_index`
+ANALYZER_SEARCH_INDEX_DIR = os.environ.get('ANALYZER_SEARCH_INDEX_DIR', os.path.join(BASE_DIR, 'search_index'))
+
+# Most results search_resumes_api returns for one query
+ANALYZER_SEARCH_MAX_TOP_K = 100
+
+
+# Caches
+# The analysis cache is file based so it is shared by all workers on a host and
+# survives restarts. Entries expire after TIMEOUT seconds, and once the directory
+# grows past MAX_BYTES the least recently used entries are deleted.
+
+CACHE_DIR = os.environ.get('ANALYZER_CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analysis': {
+        'BACKEND': 'analyzer.cache.DiskLRUCacheBackend',
+        'LOCATION': os.path.join(CACHE_DIR, 'analysis'),
+        'TIMEOUT': 7 * 24 * 3600,
+        'OPTIONS': {
+            'MAX_BYTES': 256 * 2**20,
+        },
+    },
+}
+
+# Stored analysis results expire after this many seconds (`manage.py purge_analyses` deletes them)
+ANALYZER_RESULT_TTL = int(os.environ.get('ANALYZER_RESULT_TTL', 7 * 24 * 3600))
+
+# Per-process LRU of recently used results in front of the database (0 disables it)
+ANALYZER_RESULT_CACHE_SIZE = 256
+
+# Processes used to extract text from uploaded resumes (None: one per CPU, 0: in the request thread)
+ANALYZER_EXTRACTION_WORKERS = None
+
+# Maximum concurrent LLM calls per worker process
+ANALYZER_LLM_CONCURRENCY = 4
+
+
+# LLM
+# Any OpenAI-compatible endpoint works, e.g. `manage.py llm_stub` for local testing.
+
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
+
+ANALYZER_LLM_BASE_URL = os.environ.get('ANALYZER_LLM_BASE_URL', 'https://api.openai.com/v1')
+
+ANALYZER_LLM_TIMEOUT = 120
+
+# Size of the pooled async HTTP client used by the async views
+ANALYZER_LLM_MAX_CONNECTIONS = 100
+
+# Background analysis jobs (`manage.py run_analysis_workers`)
+# Queue every analysis instead of running it in the request; forms can also opt in per request
+ANALYZER_BACKGROUND_JOBS = os.environ.get('ANALYZER_BACKGROUND_JOBS', '') == '1'
+
+ANALYZER_JOB_UPLOAD_DIR = os.path.join(MEDIA_ROOT, 'job_uploads')
+
+# Running jobs older than this are assumed orphaned and requeued when workers start
+ANALYZER_JOB_TIMEOUT = 1800
+
+# Extracted resume text cache, keyed by file content (0 disables it)
+ANALYZER_EXTRACTION_CACHE_DIR = os.path.join(CACHE_DIR, 'extraction')
+
+ANALYZER_EXTRACTION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# PDF extraction: pypdf first, pdfminer when its text looks empty or garbled
+ANALYZER_PDF_FAST_BACKEND = 'pypdf'
+
+ANALYZER_PDF_MAX_PAGES = 50
+
+# pdfminer fallbacks of PDFs with at least this many pages are split into page ranges across the sandbox workers
+ANALYZER_PDF_PARALLEL_PAGES = 8
+
+# Extraction sandbox: uploads are parsed in memory-limited worker processes
+ANALYZER_EXTRACTION_SANDBOX = True
+
+# Per-file wall-clock budget; the worker pool is replaced when a file overruns it
+ANALYZER_EXTRACTION_TIMEOUT = 30
+
+# Memory each extraction worker may allocate on top of what it inherits
+ANALYZER_EXTRACTION_MEMORY_LIMIT = 1024 * 1024 * 1024
+
+ANALYZER_EXTRACTION_MAX_TASKS_PER_CHILD = 100
+
+# Larger uploads are rejected with 413; PDFs over ANALYZER_PDF_MAX_PAGES with 422
+ANALYZER_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+# Input tokens (estimated at 4 characters each) for the resume and job description in analysis prompts
+ANALYZER_PROMPT_TOKEN_BUDGET = 3000
+
+# Resume/job scoring: 'llm' (OpenAI analysis), 'local' (spaCy/TF-IDF engine, no API calls)
+# or 'hybrid' (local scores with an LLM-written summary and recommendations)
+ANALYZER_SCORING_BACKEND = os.environ.get('ANALYZER_SCORING_BACKEND', 'llm')
+
+# Comparisons score every resume locally and send only this many to the scoring backend (0 sends all)
+ANALYZER_CASCADE_TOP_K = 10
+
+# HR bot: follow-up turns kept per session, and how similar (cosine of spaCy vectors)
+# a question must be to one already answered to reuse its answer (None disables)
+ANALYZER_BOT_HISTORY_TURNS = 4
+
+ANALYZER_BOT_SIMILARITY_THRESHOLD = 0.95
+
+# Near-duplicate questions must also share this fraction of their content words
+# ("is he senior enough" and "is he junior enough" have nearly the same mean vector)
+ANALYZER_BOT_MIN_WORD_OVERLAP = 0.8
+
+# Rendered PDF reports, cached on disk (0 disables the cache)
+ANALYZER_REPORT_CACHE_DIR = os.path.join(CACHE_DIR, 'reports')
+
+ANALYZER_REPORT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Render reports in a background thread as soon as an analysis is stored
+ANALYZER_PRERENDER_REPORTS = os.environ.get('ANALYZER_PRERENDER_REPORTS', '') == '1'
+
+# Per-stage latency histograms and counters, served on /metrics in the Prometheus text format
+ANALYZER_METRICS_ENABLED = os.environ.get('ANALYZER_METRICS_ENABLED', '') == '1'
+
+# /metrics answers staff users and scrapers sending `Authorization: Bearer <token>`
+ANALYZER_METRICS_TOKEN = os.environ.get('ANALYZER_METRICS_TOKEN', '')
+
+# Request profiling: requests with a `manage.py profile_token` header, staff requests with
+# ?profile=cpu|memory|all, and this fraction of all traffic are profiled (see analyzer.profiling)
+ANALYZER_PROFILING_ENABLED = os.environ.get('ANALYZER_PROFILING_ENABLED', '') == '1'
+
+ANALYZER_PROFILING_SAMPLE_RATE = float(os.environ.get('ANALYZER_PROFILING_SAMPLE_RATE', 0))
+
+ANALYZER_PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+
+ANALYZER_PROFILING_MAX_FILES = 200